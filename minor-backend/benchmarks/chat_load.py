@@ -0,0 +1,286 @@
+"""End-to-end /ws load: N concurrent chat sockets, reporting throughput, latency percentiles and event-loop lag.
+
+Without --url the script starts the API server itself (uvicorn main:app) with
+MONGODB_URI=mongomock://, so no MongoDB server is needed; with --url it
+drives an instance that is already running. Every socket sends a message,
+waits for the whole reply (the end frame when streaming) and sends the next
+one until --seconds have passed. Messages are catalog patterns of intents
+drawn with the weights in --mix (every intent once by default) from a fixed
+seed, with a per-message suffix unless --repeat lets the response cache answer.
+
+Latency is measured by the clients from send to the last frame of the reply.
+Server-side turn latency and event-loop lag come from the difference of two
+/metrics scrapes (with --ops-token, or OPS_TOKEN; a started server gets a
+random one); their percentiles are histogram bucket bounds. Client loop
+lag is reported to show when the load generator itself is the bottleneck.
+
+Usage (from minor-backend/):
+    python benchmarks/chat_load.py --connections 100 --seconds 20
+    python benchmarks/chat_load.py --mix headache=3,diabetes=1 --stream-ratio 0.5 --codec msgpack
+    python benchmarks/chat_load.py --url ws://127.0.0.1:8000/ws --connections 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import secrets
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from insert_data import healthcare_data
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def percentiles(values, scale=1e3):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q):
+        return values[min(len(values) - 1, int(len(values) * q))] * scale
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": values[-1] * scale,
+            "mean": sum(values) / len(values) * scale}
+
+
+PATTERNS = {intent["tag"]: intent["patterns"] for intent in healthcare_data["intents"]}
+
+
+def parse_mix(spec):
+    """Intent weights from "tag=weight,..."; every intent with weight 1 when empty."""
+    if not spec:
+        return {tag: 1.0 for tag in PATTERNS}
+    weights = {}
+    for item in spec.split(","):
+        tag, _, weight = item.partition("=")
+        if tag not in PATTERNS:
+            raise SystemExit(f"Unknown intent in --mix: {tag}")
+        weights[tag] = float(weight or 1)
+    return weights
+
+
+def message_mix(weights, seed):
+    """Endless (query, intent) pairs: intents by weight, patterns uniform within an intent."""
+    tags = list(weights)
+    rng = random.Random(seed)
+    while True:
+        tag = rng.choices(tags, weights=[weights[t] for t in tags])[0]
+        yield rng.choice(PATTERNS[tag]), tag
+
+
+def scrape_histogram(metrics_url, token, name, label=None):
+    """Cumulative bucket counts of a /metrics histogram, summed over label sets matching label."""
+    request = urllib.request.Request(metrics_url, headers={"Authorization": f"Bearer {token}"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        text = response.read().decode()
+    buckets = {}
+    for line in text.splitlines():
+        if not line.startswith(name + "_bucket{") or (label and label not in line):
+            continue
+        labels, value = line.rsplit(" ", 1)
+        bound = labels.split('le="', 1)[1].split('"', 1)[0]
+        bound = float("inf") if bound == "+Inf" else float(bound)
+        buckets[bound] = buckets.get(bound, 0.0) + float(value)
+    return buckets
+
+
+def bucket_percentiles(before, after, scale=1e3):
+    """Upper bucket bounds holding p50/p95/p99 of what was observed between two scrapes."""
+    bounds = sorted(after)
+    counts = [after[bound] - before.get(bound, 0.0) for bound in bounds]
+    if not counts or not counts[-1]:
+        return {}
+    result = {"count": int(counts[-1])}
+    for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        bound = next(bound for bound, count in zip(bounds, counts) if count >= q * counts[-1])
+        result[name] = None if bound == float("inf") else bound * scale
+    return result
+
+
+async def probe_loop(interval, lags, stop):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def drive(args):
+    import websockets
+
+    if args.codec == "msgpack":
+        import msgpack
+        encode, decode = msgpack.packb, msgpack.unpackb
+        subprotocols = ["msgpack"]
+    else:
+        encode, decode = json.dumps, json.loads
+        subprotocols = None
+
+    mix = message_mix(parse_mix(args.mix), args.seed)
+    stream_rng = random.Random(args.seed)
+    latencies = []
+    stats = {"messages": 0, "error_frames": 0, "connect_failures": 0, "socket_failures": 0}
+    intents = {}
+    deadline = None
+    started = asyncio.Event()
+
+    async def client(index):
+        try:
+            socket = await websockets.connect(args.url, subprotocols=subprotocols, max_size=None)
+        except (OSError, websockets.exceptions.WebSocketException):
+            stats["connect_failures"] += 1
+            return
+        try:
+            await started.wait()
+            sequence = 0
+            while time.perf_counter() < deadline:
+                query, tag = next(mix)
+                if not args.repeat:
+                    query = f"{query} {index}-{sequence}"
+                message = {"message": query}
+                streaming = stream_rng.random() < args.stream_ratio
+                if streaming:
+                    message.update(stream=True, id=str(sequence))
+                sequence += 1
+                sent = time.perf_counter()
+                await socket.send(encode(message))
+                reply = decode(await socket.recv())
+                while streaming and "error" not in reply and reply.get("type") != "end":
+                    reply = decode(await socket.recv())
+                if "error" in reply:
+                    # Busy and internal errors are counted, not timed
+                    stats["error_frames"] += 1
+                    continue
+                latencies.append(time.perf_counter() - sent)
+                stats["messages"] += 1
+                intents[tag] = intents.get(tag, 0) + 1
+                if args.think_ms:
+                    await asyncio.sleep(args.think_ms / 1000)
+        except websockets.exceptions.WebSocketException:
+            stats["socket_failures"] += 1
+        finally:
+            await socket.close()
+
+    clients = []
+    for index in range(args.connections):
+        clients.append(asyncio.ensure_future(client(index)))
+        if args.ramp and index % args.ramp == args.ramp - 1:
+            # Open the sockets in waves rather than one SYN flood
+            await asyncio.sleep(0.05)
+    # Let every socket finish its handshake before the clock starts
+    await asyncio.sleep(args.settle)
+
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.ensure_future(probe_loop(args.probe_ms / 1000, lags, stop))
+    began = time.perf_counter()
+    deadline = began + args.seconds
+    started.set()
+    await asyncio.gather(*clients)
+    elapsed = time.perf_counter() - began
+    stop.set()
+    await probe
+
+    return {
+        **stats,
+        "messages_per_sec": stats["messages"] / elapsed,
+        "latency_ms": percentiles(latencies),
+        "client_loop_lag_ms": percentiles(lags),
+        "intents": dict(sorted(intents.items())),
+    }
+
+
+def start_server(args):
+    env = dict(os.environ, MONGODB_URI=os.getenv("MONGODB_URI", "mongomock://"), OPS_TOKEN=args.ops_token)
+    if args.no_cache:
+        env["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/api/ready", timeout=1):
+                return server
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    server.terminate()
+    server.wait()
+    raise TimeoutError("Server did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--mix", default="", help="intent=weight,... (default: every intent with weight 1)")
+    parser.add_argument("--stream-ratio", type=float, default=0.0, help="share of messages sent with stream: true")
+    parser.add_argument("--codec", choices=("json", "msgpack"), default="json")
+    parser.add_argument("--repeat", action="store_true", help="send bare patterns, so the response cache hits")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache of the started server")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a reply and the next message")
+    parser.add_argument("--ramp", type=int, default=100, help="sockets opened per 50ms wave (0 opens all at once)")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds between opening sockets and sending")
+    parser.add_argument("--probe-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="ws:// URL of a running server; default starts one")
+    parser.add_argument("--ops-token", default=os.getenv("OPS_TOKEN", ""), help="bearer token for /metrics")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    parse_mix(args.mix)
+    if args.url is None and not args.ops_token:
+        args.ops_token = secrets.token_urlsafe()
+    raise_fd_limit()
+    server = None
+    if args.url is None:
+        server = start_server(args)
+        args.url = f"ws://127.0.0.1:{args.port}/ws"
+    parts = urlsplit(args.url)
+    metrics_url = f"{'https' if parts.scheme == 'wss' else 'http'}://{parts.netloc}/metrics"
+    try:
+        turn_before = scrape_histogram(metrics_url, args.ops_token, "health_ai_ws_turn_seconds")
+        lag_before = scrape_histogram(metrics_url, args.ops_token, "health_ai_event_loop_lag_seconds")
+        result = asyncio.run(drive(args))
+        turn_after = scrape_histogram(metrics_url, args.ops_token, "health_ai_ws_turn_seconds")
+        lag_after = scrape_histogram(metrics_url, args.ops_token, "health_ai_event_loop_lag_seconds")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps({
+        "benchmark": "chat_load",
+        "url": args.url,
+        "backend": os.getenv("MODEL_BACKEND", "rules") if server is not None else None,
+        "connections": args.connections,
+        "seconds": args.seconds,
+        "codec": args.codec,
+        "stream_ratio": args.stream_ratio,
+        "mix": args.mix or "uniform",
+        "cpus": os.cpu_count(),
+        **result,
+        "server": {
+            "turn_ms": bucket_percentiles(turn_before, turn_after),
+            "loop_lag_ms": bucket_percentiles(lag_before, lag_after),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
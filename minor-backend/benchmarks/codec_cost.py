@@ -0,0 +1,72 @@
+"""Per-message cost of encoding chat replies and decoding client messages on /ws.
+
+The reply is the longest catalog response with its intent and a confidence,
+the message /ws sends most. "stdlib" is json.dumps/json.loads, what the
+handler used before utils.codec; "json" and "msgpack" are the codecs a
+connection can negotiate; "*_frames" encode through ResponseFrames, which
+only appends the confidence to a prefix encoded once at startup.
+
+Usage (from minor-backend/):
+    python benchmarks/codec_cost.py --messages 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insert_data import healthcare_data
+from utils.codec import CODECS, ResponseFrames
+
+
+def per_call_us(func, argument, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        func(argument)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    intents = healthcare_data["intents"]
+    intent, response = max(
+        ((item["tag"], text) for item in intents for text in item["responses"]),
+        key=lambda pair: len(pair[1]),
+    )
+    reply = {"response": response, "intent": intent, "confidence": 0.8734}
+    request = {"message": "what are the symptoms of diabetes", "type": "message"}
+    frames = ResponseFrames()
+    frames.add_catalog(intents)
+
+    results = {
+        "stdlib": {
+            "encode_us": per_call_us(json.dumps, reply, args.messages),
+            "decode_us": per_call_us(json.loads, json.dumps(request), args.messages),
+            "reply_bytes": len(json.dumps(reply).encode()),
+        }
+    }
+    for name, codec in CODECS.items():
+        encoded = codec.encode(reply)
+        assert frames.encode(codec, reply) == encoded
+        results[name] = {
+            "encode_us": per_call_us(codec.encode, reply, args.messages),
+            "decode_us": per_call_us(codec.decode, codec.encode(request), args.messages),
+            "reply_bytes": len(encoded.encode() if isinstance(encoded, str) else encoded),
+        }
+        results[f"{name}_frames"] = {
+            "encode_us": per_call_us(lambda result: frames.encode(codec, result), reply, args.messages),
+        }
+    print(json.dumps({
+        "messages": args.messages,
+        "response_chars": len(response),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare latency and accuracy of the intent backends selectable with MODEL_BACKEND.
+
+The labelled evaluation set is derived from the intent catalog: every pattern
+with a dropped character, with a conversational prefix, and with a suffix,
+plus out-of-scope questions that should be answered with the "default" intent.
+Backends whose artifacts are missing (keras/numpy before setup.py) are skipped.
+
+Usage (from minor-backend/):
+    python benchmarks/compare_backends.py
+    python benchmarks/compare_backends.py --backends rules tfidf --batch-size 128
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import config
+from insert_data import healthcare_data
+
+BACKENDS = ("rules", "keras", "numpy", "tfidf", "retrieval")
+
+OUT_OF_SCOPE = [
+    "What is the capital of France",
+    "How do I cook pasta",
+    "Play some music",
+    "What's the weather tomorrow",
+    "Recommend a good movie",
+    "How to fix my car",
+    "Who won the football match",
+    "Book a flight to London",
+]
+
+
+def evaluation_set(seed=0):
+    rng = random.Random(seed)
+    examples = []
+    for intent in healthcare_data["intents"]:
+        for pattern in intent["patterns"]:
+            if len(pattern) > 4:
+                i = rng.randrange(1, len(pattern) - 1)
+                examples.append((pattern[:i] + pattern[i + 1:], intent["tag"]))
+            examples.append((f"Please, {pattern.lower()}?", intent["tag"]))
+            examples.append((f"{pattern} right now", intent["tag"]))
+    return examples, [(query, "default") for query in OUT_OF_SCOPE]
+
+
+def load_backend(name):
+    config.MODEL_BACKEND = name
+    import main
+    model = main.create_health_model()
+    model.predict("hello")
+    return model
+
+
+def evaluate(model, in_scope, out_of_scope, batch_size, rounds):
+    queries = [query for query, _ in in_scope + out_of_scope]
+    results = model.predict_batch(queries)
+    in_results, out_results = results[:len(in_scope)], results[len(in_scope):]
+
+    single = []
+    for query in queries[:200]:
+        started = time.perf_counter()
+        model.predict(query)
+        single.append(time.perf_counter() - started)
+
+    batch = (queries * (batch_size // len(queries) + 1))[:batch_size]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        model.predict_batch(batch)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "accuracy_in_scope": sum(r["intent"] == tag for r, (_, tag) in zip(in_results, in_scope)) / len(in_scope),
+        "reject_rate_out_of_scope": sum(r["intent"] == "default" for r in out_results) / len(out_results),
+        "mean_confidence_in_scope": statistics.mean(r["confidence"] for r in in_results),
+        "mean_confidence_out_of_scope": statistics.mean(r["confidence"] for r in out_results),
+        "single_p50_us": statistics.median(single) * 1e6,
+        "single_p95_us": sorted(single)[int(len(single) * 0.95)] * 1e6,
+        "batch_queries_per_sec": batch_size * rounds / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    in_scope, out_of_scope = evaluation_set()
+    summary = {"in_scope_examples": len(in_scope), "out_of_scope_examples": len(out_of_scope)}
+    for name in args.backends:
+        try:
+            model = load_backend(name)
+        except FileNotFoundError as e:
+            summary[name] = {"skipped": str(e)}
+            continue
+        summary[name] = evaluate(model, in_scope, out_of_scope, args.batch_size, args.rounds)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
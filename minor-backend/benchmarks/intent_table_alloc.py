@@ -0,0 +1,122 @@
+"""Per-call allocation count and latency of the post-classification lookup, before and after IntentTable.
+
+CPython keeps no running allocation count, so one call is run under a
+profile hook that takes a tracemalloc snapshot at every Python and C call
+and return inside it; the blocks each snapshot holds beyond the previous
+one are counted as allocations. Nothing is counted at Python call events,
+where the profiler itself allocates the frame object it hands the hook, and
+a block allocated and freed within a single C call is missed, so the counts
+are a lower bound.
+
+"Before" replays the lookups the models used to do on every request: rebuilding
+the reverse label map (Keras/NumPy models) and scanning the intent list plus
+``import random`` (rules model). Run from minor-backend/:
+    python benchmarks/intent_table_alloc.py
+"""
+import dis
+import json
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insert_data import healthcare_data
+from utils.intent_table import IntentTable
+
+
+def rules_lookup_before(intents, intent_tag):
+    matching_intent = None
+    for intent in intents:
+        if intent["tag"] == intent_tag:
+            matching_intent = intent
+            break
+    if matching_intent:
+        import random
+        return random.choice(matching_intent["responses"])
+    return None
+
+
+def rules_lookup_after(table, intent_tag):
+    intent_id = table.lookup(intent_tag)
+    if intent_id is not None:
+        return table.choose_response(intent_id)
+    return None
+
+
+def label_lookup_before(label_encoder, response_lookup, class_id):
+    reverse_label_encoder = {v: k for k, v in label_encoder.items()}
+    intent = reverse_label_encoder[class_id]
+    return intent, response_lookup.get(intent, "I'm not sure how to respond to that.")
+
+
+def label_lookup_after(table, class_id):
+    return table.tags[class_id], table.first_response(class_id) or "I'm not sure how to respond to that."
+
+
+def count_allocations(func, args):
+    """Blocks allocated during one call of func, summed over profile events."""
+    allocations = 0
+    previous = None
+
+    def profile(frame, event, arg):
+        nonlocal allocations, previous
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        if previous is not None and event != "call":
+            allocations += sum(max(0, stat.count_diff) for stat in snapshot.compare_to(previous, "traceback"))
+        previous = snapshot
+
+    # Leave out the snapshots and the hook itself
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    filters.extend(tracemalloc.Filter(False, __file__, line) for _, line in dis.findlinestarts(profile.__code__))
+
+    tracemalloc.start()
+    # Compiles the filters' patterns before anything is counted
+    tracemalloc.take_snapshot().filter_traces(filters)
+    sys.setprofile(profile)
+    try:
+        func(*args)
+    finally:
+        sys.setprofile(None)
+        tracemalloc.stop()
+    return allocations
+
+
+def measure(func, args, calls):
+    func(*args)
+    allocations = count_allocations(func, args)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        func(*args)
+    elapsed = time.perf_counter() - started
+    return {
+        "allocations_per_call": allocations,
+        "ns_per_call": elapsed / calls * 1e9,
+    }
+
+
+def main(calls=100000):
+    intents = healthcare_data["intents"]
+    last_tag = intents[-1]["tag"]
+    table = IntentTable.from_intents(intents)
+
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "label_encoder.pickle"), "rb") as handle:
+        data = pickle.load(handle)
+    label_encoder, response_lookup = data["label_encoder"], data["response_lookup"]
+    label_table = IntentTable.from_label_encoder(label_encoder, response_lookup)
+    class_id = len(label_encoder) - 1
+
+    results = {
+        "rules_before": measure(rules_lookup_before, (intents, last_tag), calls),
+        "rules_after": measure(rules_lookup_after, (table, last_tag), calls),
+        "label_before": measure(label_lookup_before, (label_encoder, response_lookup, class_id), calls),
+        "label_after": measure(label_lookup_after, (label_table, class_id), calls),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Event-loop lag during a burst of logins, with bcrypt inline versus in the PasswordHasher pool.
+
+A probe task asks the loop to wake it every --probe-ms milliseconds and
+records how late each wake-up is; that lateness is what every WebSocket on
+the worker waits on top of its own work. --logins verifications of a
+precomputed hash are started at once. "inline" verifies on the event loop
+the way /api/login used to; "pool" awaits PasswordHasher.verify.
+
+Usage (from minor-backend/):
+    python benchmarks/login_storm.py --logins 20 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.password_hasher import PasswordHasher, create_crypt_context
+
+PASSWORD = "correct horse battery staple"
+
+
+async def probe(interval, lags, stop):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def storm(mode, args, hashed):
+    context = create_crypt_context(args.rounds)
+    hasher = None
+    if mode == "pool":
+        hasher = PasswordHasher(rounds=args.rounds, max_workers=args.workers, max_pending=args.logins)
+        hasher.start()
+        # Start the worker processes before measuring
+        await asyncio.gather(*(hasher.verify(PASSWORD, hashed) for _ in range(args.workers)))
+
+    async def login():
+        if hasher is not None:
+            valid, _ = await hasher.verify(PASSWORD, hashed)
+        else:
+            valid = context.verify(PASSWORD, hashed)
+        assert valid
+
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(args.probe_ms / 1000, lags, stop))
+    await asyncio.sleep(args.probe_ms / 1000 * 5)
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    seconds = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    if hasher is not None:
+        hasher.shutdown()
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "logins_per_sec": args.logins / seconds,
+        "storm_seconds": seconds,
+        "loop_lag_ms": {
+            "p50": lags[len(lags) // 2] * 1e3,
+            "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1e3,
+            "max": lags[-1] * 1e3,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--probe-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    hashed = create_crypt_context(args.rounds).hash(PASSWORD)
+    results = [asyncio.run(storm(mode, args, hashed)) for mode in ("inline", "pool")]
+    print(json.dumps({
+        "logins": args.logins,
+        "rounds": args.rounds,
+        "workers": args.workers,
+        "cpus": os.cpu_count(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Microbenchmarks of the chat and auth hot paths, one JSON result per function.
+
+- classify_intent: HealthAssistantModel.classify_intent (the rules matcher)
+- predict_<backend>: predict of each model backend; backends whose trained
+  artifacts are missing are reported as skipped
+- bcrypt_hash / bcrypt_verify: the bcrypt context PasswordHasher's workers
+  use, at BCRYPT_ROUNDS
+- json_encode_* / json_decode_*: a chat reply and a client message through
+  the stdlib and the codecs /ws negotiates
+
+Queries are drawn from the catalog patterns with a fixed seed, so runs on
+different commits time the same inputs. Compare runs with
+benchmarks/suite.py --compare.
+
+Usage (from minor-backend/):
+    python benchmarks/micro.py
+    python benchmarks/micro.py --backends rules numpy --iterations 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import config
+from insert_data import healthcare_data
+
+BACKENDS = ("rules", "keras", "numpy", "tfidf", "retrieval")
+PASSWORD = "correct horse battery staple"
+
+
+def sample_queries(count, seed=0):
+    rng = random.Random(seed)
+    patterns = [pattern for intent in healthcare_data["intents"] for pattern in intent["patterns"]]
+    return [rng.choice(patterns) for _ in range(count)]
+
+
+def timed(func, args):
+    """Call func once per argument; per-call latency summary in microseconds."""
+    func(args[0])
+    durations = []
+    started = time.perf_counter()
+    for arg in args:
+        call_started = time.perf_counter()
+        func(arg)
+        durations.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    durations.sort()
+    return {
+        "iterations": len(args),
+        "ops_per_sec": len(args) / elapsed,
+        "mean_us": elapsed / len(args) * 1e6,
+        "p50_us": durations[len(durations) // 2] * 1e6,
+        "p99_us": durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1e6,
+    }
+
+
+def load_backend(name):
+    config.MODEL_BACKEND = name
+    import main
+    return main.create_health_model()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["rules", "keras", "numpy"])
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--model-iterations", type=int, default=500, help="for the keras/numpy/tfidf/retrieval backends")
+    parser.add_argument("--hash-iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = sample_queries(args.iterations)
+    results = {}
+
+    import main as server
+    from utils.codec import CODECS
+    from utils.password_hasher import create_crypt_context
+
+    rules = server.HealthAssistantModel()
+    results["classify_intent"] = timed(rules.classify_intent, queries)
+
+    skipped = {}
+    for backend in args.backends:
+        try:
+            model = load_backend(backend)
+        except Exception as e:
+            # keras and numpy need the artifacts setup.py trains
+            skipped[f"predict_{backend}"] = str(e)
+            continue
+        count = args.iterations if backend == "rules" else args.model_iterations
+        results[f"predict_{backend}"] = timed(model.predict, queries[:count])
+
+    crypt_context = create_crypt_context(config.BCRYPT_ROUNDS)
+    hashed = crypt_context.hash(PASSWORD)
+    results["bcrypt_hash"] = timed(crypt_context.hash, [PASSWORD] * args.hash_iterations)
+    results["bcrypt_verify"] = timed(lambda password: crypt_context.verify(password, hashed),
+                                     [PASSWORD] * args.hash_iterations)
+
+    replies = [rules.predict(query) for query in queries]
+    messages = [json.dumps({"message": query}) for query in queries]
+    results["json_encode_stdlib"] = timed(json.dumps, replies)
+    results["json_decode_stdlib"] = timed(json.loads, messages)
+    for name, codec in CODECS.items():
+        encoded = [codec.encode({"message": query}) for query in queries]
+        results[f"json_encode_{name}"] = timed(codec.encode, replies)
+        results[f"json_decode_{name}"] = timed(codec.decode, encoded)
+
+    print(json.dumps({
+        "benchmark": "micro",
+        "cpus": os.cpu_count(),
+        "bcrypt_rounds": config.BCRYPT_ROUNDS,
+        "results": results,
+        "skipped": skipped,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Load time, search latency and IVF recall of PatternIndex on a synthetic catalog.
+
+Patterns are random 3-7 word phrases drawn from the catalog vocabulary. Recall
+is the fraction of brute-force top-k results the IVF search also returns.
+
+Usage (from minor-backend/):
+    python benchmarks/pattern_index_scale.py --size 200000 --nlist 256 --nprobe 8
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insert_data import healthcare_data
+from utils.pattern_index import PatternIndex
+
+
+def synthetic_patterns(size, seed=0):
+    rng = random.Random(seed)
+    words = sorted({word for intent in healthcare_data["intents"] for p in intent["patterns"] for word in p.split()})
+    tags = [intent["tag"] for intent in healthcare_data["intents"]]
+    return [
+        (" ".join(rng.choice(words) for _ in range(rng.randint(3, 7))), rng.choice(tags))
+        for _ in range(size)
+    ]
+
+
+def timed_searches(index, queries, k, nprobe):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, k, nprobe))
+        latencies.append(time.perf_counter() - started)
+    return results, {
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95)] * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--nlist", type=int, default=128)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="pattern_index_")
+    try:
+        patterns = synthetic_patterns(args.size)
+        index = PatternIndex(directory)
+        started = time.perf_counter()
+        index.add(patterns)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = PatternIndex(directory)
+        load_ms = (time.perf_counter() - started) * 1e3
+
+        queries = [text for text, _ in random.Random(1).sample(patterns, args.queries)]
+        exact, brute = timed_searches(index, queries, args.k, args.nprobe)
+
+        started = time.perf_counter()
+        index.train_ivf(args.nlist)
+        ivf_train_seconds = time.perf_counter() - started
+        index.search(queries[0], args.k, args.nprobe)
+        approximate, ivf = timed_searches(index, queries, args.k, args.nprobe)
+        recall = statistics.mean(
+            len({h["text"] for h in a} & {h["text"] for h in e}) / max(len(e), 1)
+            for a, e in zip(approximate, exact)
+        )
+
+        print(json.dumps({
+            "size": args.size,
+            "index_bytes": sum(os.path.getsize(os.path.join(directory, n)) for n in os.listdir(directory)),
+            "build_seconds": build_seconds,
+            "load_ms": load_ms,
+            "brute_force": brute,
+            "ivf": dict(ivf, nlist=args.nlist, nprobe=args.nprobe, train_seconds=ivf_train_seconds,
+                        recall_at_k=recall),
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Memory per idle session in the session context store, and follow-up accuracy with and without it.
+
+Memory is what tracemalloc sees allocated for --sessions sessions that each
+recorded --turns turns, divided by the number of sessions (the session id
+string included). Accuracy replays short dialogues through the rules
+matcher: the follow-up question only names its topic through "it".
+
+Usage (from minor-backend/):
+    python benchmarks/session_context_memory.py --sessions 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insert_data import healthcare_data
+from utils.intent_matcher import IntentMatcher
+from utils.session_context import ContextResolver, SessionContextStore
+
+DIALOGUES = [
+    ("I have a fever", "how to control it", "fever"),
+    ("I have a fever", "what causes it", "fever"),
+    ("Tell me about diabetes", "how to prevent it", "diabetes"),
+    ("Tell me about diabetes", "how do I manage it", "diabetes"),
+    ("What causes hypertension", "how to control it", "hypertension"),
+    ("Tell me about anxiety", "how to prevent it", "anxiety"),
+    ("Tell me about anxiety", "what are its symptoms", "anxiety"),
+    ("I have a headache", "how to prevent them", "headache"),
+    ("My head hurts", "what causes it", "headache"),
+]
+
+
+def measure_memory(sessions, turns, window):
+    tags = [intent["tag"] for intent in healthcare_data["intents"]]
+    ids = [f"session-{n:08d}" for n in range(sessions)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = SessionContextStore(window=window, max_sessions=sessions)
+    started = time.perf_counter()
+    for turn in range(turns):
+        for n, session in enumerate(ids):
+            store.record(session, tags[(n + turn) % len(tags)], [tags[n % len(tags)]])
+    seconds = time.perf_counter() - started
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {
+        "bytes_per_session": used / sessions,
+        "record_us": seconds / (sessions * turns) * 1e6,
+    }
+
+
+def follow_up_accuracy():
+    intents = healthcare_data["intents"]
+    matcher = IntentMatcher(intents)
+    resolver = ContextResolver(intents)
+    without = with_context = 0
+    for n, (first, follow_up, expected) in enumerate(DIALOGUES):
+        store = SessionContextStore()
+        intent = matcher.match(first)
+        store.record("s", intent, resolver.entities(first) + [intent])
+        intent = matcher.match(follow_up)
+        without += intent == expected
+        with_context += (resolver.resolve(follow_up, intent, store.get("s")) or intent) == expected
+    return {
+        "dialogues": len(DIALOGUES),
+        "accuracy_without_context": without / len(DIALOGUES),
+        "accuracy_with_context": with_context / len(DIALOGUES),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--window", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "sessions": args.sessions,
+        "turns": args.turns,
+        "window": args.window,
+        "memory": measure_memory(args.sessions, args.turns, args.window),
+        "follow_ups": follow_up_accuracy(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measure API cold start: time to first HTTP response and time until the model is warm.
+
+Usage (from minor-backend/):
+    python benchmarks/startup_time.py --runs 5
+    MODEL_BACKEND=keras python benchmarks/startup_time.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def poll(url, until_ready, deadline):
+    """Return the time at which ``url`` first answers (or answers 200 if until_ready)."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return time.perf_counter()
+        except urllib.error.HTTPError:
+            # 503 while warming up still counts as a first response
+            if not until_ready:
+                return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"No response from {url}")
+
+
+def measure(port, timeout):
+    url = f"http://127.0.0.1:{port}/api/ready"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        first_response = poll(url, until_ready=False, deadline=deadline)
+        ready = poll(url, until_ready=True, deadline=deadline)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "time_to_first_response": first_response - started,
+        "time_to_ready": ready - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    runs = [measure(args.port, args.timeout) for _ in range(args.runs)]
+    summary = {
+        "backend": os.getenv("MODEL_BACKEND", "rules"),
+        "runs": runs,
+        "median_time_to_first_response": statistics.median(r["time_to_first_response"] for r in runs),
+        "median_time_to_ready": statistics.median(r["time_to_ready"] for r in runs),
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Run the benchmark suite and write one JSON document per run, for comparing commits.
+
+Each benchmark script runs in its own process and prints JSON; the suite
+collects their outputs under "benchmarks" with the commit, Python version
+and CPU count of the run. The default suite is micro.py and chat_load.py
+against a server it starts on the mongomock stand-in (requirements_dev.txt);
+--only picks a subset, and --args passes extra arguments to one of them.
+
+--compare reads an earlier result file and reports every latency (*_us,
+*_ms, p50/p95/p99/mean/max) and throughput (*per_sec) both runs measured,
+flagging changes for the worse beyond --threshold.
+
+Usage (from minor-backend/):
+    python benchmarks/suite.py --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py --only micro --args micro="--backends rules numpy"
+    python benchmarks/suite.py --compare results/base.json --output results/head.json
+"""
+import argparse
+import json
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUITE = {
+    "micro": ["benchmarks/micro.py"],
+    "chat_load": ["benchmarks/chat_load.py", "--connections", "50", "--seconds", "10"],
+    "chat_load_stream": ["benchmarks/chat_load.py", "--connections", "50", "--seconds", "10", "--stream-ratio", "1"],
+}
+
+LATENCY_KEYS = ("p50", "p95", "p99", "mean", "max")
+
+
+def git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(name, extra_args, timeout):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, *SUITE[name], *extra_args],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=timeout,
+        env=dict(os.environ, MONGODB_URI=os.getenv("MONGODB_URI", "mongomock://")),
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1:] or ["exit status %d" % completed.returncode]}
+    result = json.loads(completed.stdout)
+    result["wall_seconds"] = time.perf_counter() - started
+    return result
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def direction(key):
+    """+1 where higher is better, -1 where lower is better, 0 for counts and settings."""
+    last = key.rsplit(".", 1)[-1]
+    if last.endswith("per_sec"):
+        return 1
+    if last.endswith(("_us", "_ms")) or last in LATENCY_KEYS:
+        return -1
+    return 0
+
+
+def compare(before, after, threshold):
+    old = dict(flatten(before.get("benchmarks", {})))
+    changes = {}
+    for key, value in flatten(after.get("benchmarks", {})):
+        sign = direction(key)
+        if not sign or key not in old or not old[key]:
+            continue
+        change = value / old[key] - 1
+        changes[key] = {
+            "before": old[key],
+            "after": value,
+            "change": change,
+            "regression": sign * change < -threshold,
+        }
+    return {
+        "baseline_commit": before.get("commit"),
+        "threshold": threshold,
+        "regressions": sorted(key for key, item in changes.items() if item["regression"]),
+        "changes": changes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(SUITE), default=list(SUITE))
+    parser.add_argument("--args", action="append", default=[], metavar='NAME="ARGS"',
+                        help="extra arguments for one benchmark, e.g. chat_load=\"--connections 200\"")
+    parser.add_argument("--timeout", type=float, default=900.0, help="per benchmark, in seconds")
+    parser.add_argument("--output", help="also write the result to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    extra = {}
+    for item in args.args:
+        name, _, value = item.partition("=")
+        if name not in SUITE:
+            raise SystemExit(f"Unknown benchmark in --args: {name}")
+        extra[name] = shlex.split(value)
+
+    document = {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "backend": os.getenv("MODEL_BACKEND", "rules"),
+        "benchmarks": {name: run(name, extra.get(name, []), args.timeout) for name in args.only},
+    }
+    if args.compare:
+        with open(args.compare) as handle:
+            document["comparison"] = compare(json.load(handle), document, args.threshold)
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Cost of authenticating reconnecting WebSockets: full JWT decode versus TokenAuthority's cache.
+
+--clients distinct tokens are each presented --reconnects times, the way
+clients present their token again on every reconnect. "decode" is a jose
+decode with the secret string on every call, the way tokens were checked
+before TokenAuthority; "first_verify" is TokenAuthority's cache miss with its preloaded key
+object; "cached_verify" is every later reconnect.
+
+Usage (from minor-backend/):
+    python benchmarks/token_verify.py --clients 5000 --reconnects 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+
+from utils.auth import ALGORITHM, TokenAuthority
+
+
+def per_call_us(func, tokens):
+    started = time.perf_counter()
+    for token in tokens:
+        func(token)
+    return (time.perf_counter() - started) / len(tokens) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--reconnects", type=int, default=5)
+    args = parser.parse_args()
+
+    secret = "benchmark-secret"
+    authority = TokenAuthority({"bench": secret}, cache_size=args.clients)
+    tokens = [authority.issue({"sub": f"user{n}"}) for n in range(args.clients)]
+
+    decode_us = per_call_us(lambda token: jwt.decode(token, secret, algorithms=[ALGORITHM]), tokens)
+    first_us = per_call_us(authority.verify, tokens)
+    cached_us = per_call_us(authority.verify, tokens * args.reconnects)
+    print(json.dumps({
+        "clients": args.clients,
+        "reconnects": args.reconnects,
+        "decode_us": decode_us,
+        "first_verify_us": first_us,
+        "cached_verify_us": cached_us,
+        "authority": authority.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
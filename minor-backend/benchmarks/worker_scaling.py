@@ -0,0 +1,122 @@
+"""Chat throughput and memory of the API server at different worker counts.
+
+For every worker count the server is started with ``uvicorn --workers N``
+and the response cache disabled, then --clients WebSockets send messages
+back-to-back for --seconds. Memory is the summed PSS (proportional set
+size) of the worker processes, which counts pages shared between workers,
+such as memory-mapped weights, once in total rather than once per worker.
+
+Usage (from minor-backend/):
+    MODEL_BACKEND=numpy python benchmarks/worker_scaling.py --workers 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES = ["hi", "I have a fever", "chest pain", "What causes diabetes", "I feel sick", "Tell me about anxiety"]
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as handle:
+            return [int(child) for child in handle.read().split()]
+    except OSError:
+        return []
+
+
+def pss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as handle:
+            for line in handle:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def wait_ready(port, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise TimeoutError("Server did not become ready")
+
+
+async def drive(port, clients, seconds):
+    import websockets
+
+    counts = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    async def client(index):
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws") as socket:
+            i = index
+            while time.perf_counter() < deadline:
+                await socket.send(json.dumps({"message": f"{QUERIES[i % len(QUERIES)]} {i}"}))
+                await socket.recv()
+                counts[index] += 1
+                i += clients
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def measure(workers, args):
+    env = dict(os.environ, RESPONSE_CACHE_MAX_ENTRIES="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(args.port, args.timeout)
+        # Every worker warms up on its own; give the others a moment to catch up
+        time.sleep(args.warm_up)
+        throughput = asyncio.run(drive(args.port, args.clients, args.seconds))
+        # A single worker runs in the uvicorn process itself
+        worker_pids = children(server.pid) if workers > 1 else [server.pid]
+        return {
+            "workers": workers,
+            "messages_per_sec": throughput,
+            "worker_pss_bytes": sum(pss_bytes(pid) for pid in worker_pids),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--warm-up", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    results = [measure(workers, args) for workers in args.workers]
+    base = results[0]["messages_per_sec"] / results[0]["workers"]
+    for result in results:
+        result["scaling_efficiency"] = result["messages_per_sec"] / (base * result["workers"])
+    print(json.dumps({
+        "backend": os.getenv("MODEL_BACKEND", "rules"),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Open N WebSockets against a ConnectionManager server; report memory per connection and fan-out latency.
+
+The script starts itself with --serve in a subprocess: a minimal app with the
+same ConnectionManager as main.py, a /ws endpoint and a /broadcast trigger
+(kept out of main.py on purpose). Memory per connection is the growth of the
+server's RSS divided by N. Fan-out latency is the time from the server
+starting a broadcast to each client receiving it. --slow-clients adds sockets
+that stop reading, to check that they don't hold up delivery to the others;
+whatever the server buffers for them shows up in server_rss_after_bytes.
+
+Usage (from minor-backend/):
+    python benchmarks/ws_load.py --connections 5000 --rounds 10
+    python benchmarks/ws_load.py --connections 1000 --slow-clients 20 --payload-bytes 65536
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def serve(port, send_timeout):
+    import uvicorn
+    from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+    from utils.connection_manager import ConnectionManager
+
+    raise_fd_limit()
+    app = FastAPI()
+    manager = ConnectionManager(idle_timeout=0, send_timeout=send_timeout)
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        connection = await manager.connect(websocket)
+        try:
+            while True:
+                await websocket.receive_text()
+                connection.touch()
+        except WebSocketDisconnect:
+            manager.disconnect(connection.id)
+
+    @app.post("/broadcast")
+    async def broadcast(request: Request):
+        body = await request.json()
+        # sent_at comes first so clients can read it without parsing the payload
+        message = json.dumps({"sent_at": time.time(), "type": "broadcast", "payload": "x" * body["payload_bytes"]})
+        started = time.perf_counter()
+        result = await manager.broadcast(message)
+        result["seconds"] = time.perf_counter() - started
+        return result
+
+    @app.get("/stats")
+    async def stats():
+        return dict(manager.stats(), rss_bytes=rss_bytes(os.getpid()))
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def http(port, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+
+async def run_clients(args):
+    import websockets
+
+    loop = asyncio.get_running_loop()
+    url = f"ws://127.0.0.1:{args.port}/ws"
+    received = {}
+    sockets = []
+
+    async def reader(socket):
+        try:
+            async for raw in socket:
+                now = time.time()
+                sent_at = float(raw[len('{"sent_at": '):raw.index(",")])
+                received.setdefault(sent_at, []).append(now - sent_at)
+        except websockets.ConnectionClosed:
+            pass
+
+    baseline = await loop.run_in_executor(None, http, args.port, "/stats")
+    semaphore = asyncio.Semaphore(200)
+
+    async def open_socket():
+        async with semaphore:
+            return await websockets.connect(url, max_size=None, ping_interval=None)
+
+    started = time.perf_counter()
+    sockets = await asyncio.gather(*(open_socket() for _ in range(args.connections + args.slow_clients)))
+    connect_seconds = time.perf_counter() - started
+    readers = [asyncio.create_task(reader(socket)) for socket in sockets[:args.connections]]
+    for socket in sockets[args.connections:]:
+        # Slow clients stop reading: pause the transport so the kernel buffers fill up
+        socket.transport.pause_reading()
+
+    loaded = await loop.run_in_executor(None, http, args.port, "/stats")
+    rounds = []
+    for _ in range(args.rounds):
+        result = await loop.run_in_executor(None, http, args.port, "/broadcast", {"payload_bytes": args.payload_bytes})
+        await asyncio.sleep(args.settle)
+        rounds.append(result)
+
+    latencies = sorted(latency for values in received.values() for latency in values)
+    final = await loop.run_in_executor(None, http, args.port, "/stats")
+    for socket in sockets:
+        socket.transport.abort()
+    for task in readers:
+        task.cancel()
+
+    memory = None
+    if baseline["rss_bytes"] and loaded["rss_bytes"]:
+        memory = (loaded["rss_bytes"] - baseline["rss_bytes"]) / (args.connections + args.slow_clients)
+    return {
+        "connections": args.connections,
+        "slow_clients": args.slow_clients,
+        "connect_seconds": connect_seconds,
+        "server_rss_bytes": loaded["rss_bytes"],
+        "server_rss_after_bytes": final["rss_bytes"],
+        "memory_per_connection_bytes": memory,
+        "broadcast_rounds": len(rounds),
+        "broadcast_server_seconds_p50": statistics.median(r["seconds"] for r in rounds) if rounds else None,
+        "broadcast_failed": sum(r["failed"] for r in rounds),
+        "active_after": final["active"],
+        "deliveries": len(latencies),
+        "fanout_latency_ms": {
+            "p50": latencies[len(latencies) // 2] * 1e3,
+            "p99": latencies[int(len(latencies) * 0.99)] * 1e3,
+            "max": latencies[-1] * 1e3,
+        } if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--slow-clients", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--payload-bytes", type=int, default=64)
+    parser.add_argument("--send-timeout", type=float, default=1.0)
+    parser.add_argument("--settle", type=float, default=0.5, help="seconds to wait for deliveries after each round")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.send_timeout)
+        return
+
+    raise_fd_limit()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+         "--send-timeout", str(args.send_timeout)],
+    )
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                http(args.port, "/stats")
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+        print(json.dumps(asyncio.run(run_clients(args)), indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB; options set in the URI itself take precedence over the MONGODB_* settings below
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")  # "mongomock://" for an in-memory stand-in
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "20000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "0"))  # 0 waits indefinitely
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")  # e.g. "zstd,zlib"; empty sends uncompressed
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+MONGODB_SLOW_MS = float(os.getenv("MONGODB_SLOW_MS", "100"))  # log slower operations; 0 disables
+
+# Which intent model answers chat messages: "rules", "keras", "numpy", "tfidf" or "retrieval"
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "rules")
+NUMPY_MODEL_PATH = os.getenv("NUMPY_MODEL_PATH", "health_model.npz")
+# Below this cosine similarity the tfidf backend answers with the "default" intent
+TFIDF_REJECT_THRESHOLD = float(os.getenv("TFIDF_REJECT_THRESHOLD", "0.2"))
+# Nearest-pattern index for the "retrieval" backend, built from the catalog on first use
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "pattern_index")
+RETRIEVAL_REJECT_THRESHOLD = float(os.getenv("RETRIEVAL_REJECT_THRESHOLD", "0.4"))
+RETRIEVAL_NPROBE = int(os.getenv("RETRIEVAL_NPROBE", "4"))  # IVF lists scanned per query
+RETRIEVAL_REFRESH_SECONDS = float(os.getenv("RETRIEVAL_REFRESH_SECONDS", "1"))  # how often servers look for added patterns
+
+# Inference executor
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+INFERENCE_QUEUE_TIMEOUT = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "5"))
+
+# Micro-batching of concurrent predictions (a batch size of 1 disables it)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+
+# Versioned model registry; running servers follow its CURRENT version
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "5"))
+
+# Response cache in front of the model (0 entries disables it)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "0"))  # 0 means no expiry
+
+# Batched interaction logging to MongoDB
+INTERACTION_BUFFER_SIZE = int(os.getenv("INTERACTION_BUFFER_SIZE", "10000"))
+INTERACTION_BATCH_SIZE = int(os.getenv("INTERACTION_BATCH_SIZE", "500"))
+INTERACTION_FLUSH_SECONDS = float(os.getenv("INTERACTION_FLUSH_SECONDS", "1"))
+INTERACTION_DROP_POLICY = os.getenv("INTERACTION_DROP_POLICY", "drop_oldest")  # or "drop_newest"
+
+# WebSocket connections
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "600"))  # 0 never evicts idle sockets
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "0"))  # 0 disables {"type": "ping"} messages
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+WS_STREAM_CHUNK_CHARS = int(os.getenv("WS_STREAM_CHUNK_CHARS", "512"))  # longest chunk of a streamed reply
+WS_MAX_STREAMS = int(os.getenv("WS_MAX_STREAMS", "4"))  # streamed replies in flight per connection
+
+# Password hashing runs in its own process pool, off the event loop
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # hashes with another cost are upgraded at login
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "1"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+# Login attempts allowed per username per window
+LOGIN_RATE_LIMIT_ATTEMPTS = int(os.getenv("LOGIN_RATE_LIMIT_ATTEMPTS", "5"))
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = float(os.getenv("LOGIN_RATE_LIMIT_WINDOW_SECONDS", "60"))
+
+# Access tokens: JWT_KEYS is "kid:secret,kid:secret"; the first key signs, all of them verify
+JWT_KEYS = os.getenv("JWT_KEYS", "")  # empty uses the development secret in utils/auth.py
+JWT_EXPIRE_MINUTES = float(os.getenv("JWT_EXPIRE_MINUTES", "30"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))  # verified tokens remembered until they expire
+WS_REQUIRE_AUTH = os.getenv("WS_REQUIRE_AUTH", "false").lower() == "true"  # reject /ws without a token
+# Bearer token for /metrics and /api/inference/stats; empty keeps them closed
+OPS_TOKEN = os.getenv("OPS_TOKEN", "")
+
+# Server worker processes and how they share WebSocket broadcasts/sessions
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")  # "local" (single worker) or "mongo"
+
+# Per-session conversation context used to classify follow-up questions
+SESSION_CONTEXT_WINDOW = int(os.getenv("SESSION_CONTEXT_WINDOW", "5"))  # 0 disables the context store
+SESSION_CONTEXT_TTL_SECONDS = float(os.getenv("SESSION_CONTEXT_TTL_SECONDS", "1800"))
+SESSION_CONTEXT_MAX_SESSIONS = int(os.getenv("SESSION_CONTEXT_MAX_SESSIONS", "100000"))
+# Keep contexts of closed ?session= connections in MongoDB for reconnects
+SESSION_CONTEXT_SPILL = os.getenv("SESSION_CONTEXT_SPILL", "false").lower() == "true"
+
+# Logging; WebSocket messages are logged by size only, for this share of them
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # 0 logs none, 1 logs every message
+# How often /metrics samples event-loop lag (0 disables the probe)
+LOOP_LAG_PROBE_SECONDS = float(os.getenv("LOOP_LAG_PROBE_SECONDS", "0.1"))
@@ -1,38 +1,94 @@
-from pymongo import MongoClient
-from dotenv import load_dotenv
-import os
+import asyncio
+import logging
 from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
-from datetime import datetime
-from utils.auth import verify_password
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
 
-# Load environment variables
-load_dotenv()
+import config
+from utils.command_metrics import CommandLatencyListener
+from utils.metrics import REGISTRY
 
-# MongoDB connection
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+# Training data and chat interactions; users and sessions live in MongoDB.database_name
 DATABASE_NAME = "health_assistant"
 
-client = MongoClient(MONGODB_URI)
-db = client[DATABASE_NAME]
+logger = logging.getLogger(__name__)
+
+# Fields of a user document the API works with; leaves out _id and anything else stored
+USER_PROJECTION = {"_id": 0, "username": 1, "email": 1, "full_name": 1, "created_at": 1, "password": 1}
 
-# Collections
-training_data = db.training_data
-interactions = db.interactions
+def client_options(uri: str) -> Dict[str, Any]:
+    """Pool settings from config for every option the URI doesn't set itself."""
+    in_uri = {name.lower() for name in parse_qs(urlsplit(uri).query)}
+    options = {
+        "maxPoolSize": config.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGODB_MIN_POOL_SIZE,
+        "connectTimeoutMS": config.MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": config.MONGODB_SOCKET_TIMEOUT_MS or None,
+        "readPreference": config.MONGODB_READ_PREFERENCE,
+    }
+    if config.MONGODB_COMPRESSORS:
+        options["compressors"] = config.MONGODB_COMPRESSORS
+    return {name: value for name, value in options.items() if name.lower() not in in_uri}
 
 class MongoDB:
+    """The process's single MongoDB client and the operations built on it.
+
+    The API server uses it directly; offline scripts go through the
+    synchronous functions at the bottom of this module, which run the same
+    coroutines on a private event loop.
+    """
     client: Optional[AsyncIOMotorClient] = None
     database_name: str = "health_ai_db"
+    latency: Optional[CommandLatencyListener] = None
+    command_seconds = REGISTRY.histogram(
+        "health_ai_mongo_command_seconds", "MongoDB command latency by command and collection", ("operation",)
+    )
+    index_task: Optional[asyncio.Future] = None
+
+    @classmethod
+    async def connect_db(cls, ensure_indexes: bool = True):
+        if config.MONGODB_URI.startswith("mongomock://"):
+            # In-memory stand-in for tests and runs without a server (requirements_dev.txt)
+            from mongomock_motor import AsyncMongoMockClient
+            cls.client = AsyncMongoMockClient()
+        else:
+            cls.latency = CommandLatencyListener(slow_ms=config.MONGODB_SLOW_MS, histogram=cls.command_seconds)
+            cls.client = AsyncIOMotorClient(
+                config.MONGODB_URI, event_listeners=[cls.latency], **client_options(config.MONGODB_URI)
+            )
+        if ensure_indexes:
+            # In the background: with the server unreachable this would hold up
+            # startup for the whole server selection timeout
+            cls.index_task = asyncio.ensure_future(cls._ensure_indexes_logged())
+
+    @classmethod
+    async def _ensure_indexes_logged(cls):
+        try:
+            await cls.ensure_indexes()
+        except PyMongoError as e:
+            # Chat keeps working without the database; registration loses its uniqueness guarantee
+            logger.error(f"Creating user indexes failed: {e}")
 
     @classmethod
-    async def connect_db(cls):
-        cls.client = AsyncIOMotorClient("mongodb://localhost:27017")
+    async def ensure_indexes(cls):
+        """Unique username and email; a no-op when the indexes already exist."""
+        db = cls.get_db()
+        await db.users.create_index("username", name="username_unique", unique=True)
+        await db.users.create_index("email", name="email_unique", unique=True)
         
     @classmethod
     async def close_db(cls):
+        if cls.index_task is not None:
+            cls.index_task.cancel()
+            cls.index_task = None
         if cls.client is not None:
             cls.client.close()
+            cls.client = None
             
     @classmethod
     def get_db(cls):
@@ -41,45 +97,186 @@ class MongoDB:
         return cls.client[cls.database_name]
 
     @classmethod
-    async def get_user_by_email(cls, email: str):
+    def get_data_db(cls):
+        """Database holding training data and interactions."""
+        if cls.client is None:
+            raise Exception("Database not connected. Call connect_db first.")
+        return cls.client[DATABASE_NAME]
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Latency per operation since connect_db."""
+        return cls.latency.stats() if cls.latency is not None else {}
+
+    @classmethod
+    async def get_user_by_email(cls, email: str, projection: Optional[dict] = None):
         db = cls.get_db()
-        return await db.users.find_one({"email": email})
+        return await db.users.find_one({"email": email}, projection or USER_PROJECTION)
     
     @classmethod
-    async def get_user_by_username(cls, username: str):
+    async def get_user_by_username(cls, username: str, projection: Optional[dict] = None):
         db = cls.get_db()
-        return await db.users.find_one({"username": username})
+        return await db.users.find_one({"username": username}, projection or USER_PROJECTION)
     
     @classmethod
     async def create_user(cls, user_data: dict):
+        """Insert a user and return the stored document.
+
+        A taken username or email raises pymongo's DuplicateKeyError from
+        the unique indexes.
+        """
         db = cls.get_db()
         user_data["created_at"] = datetime.utcnow()
-        result = await db.users.insert_one(user_data)
-        return await db.users.find_one({"_id": result.inserted_id})
+        # insert_one adds the generated _id to user_data, which then is the stored document
+        await db.users.insert_one(user_data)
+        return user_data
+
+    @classmethod
+    async def insert_interactions(cls, interactions: list):
+        """Write a batch of chat interactions next to the training data."""
+        return await cls.get_data_db().interactions.insert_many(interactions, ordered=False)
+
+    @classmethod
+    async def ensure_session_context_indexes(cls, ttl_seconds: float):
+        """Spilled session contexts are removed by MongoDB after ttl_seconds."""
+        await cls.get_db().session_context.create_index("updated_at", expireAfterSeconds=int(ttl_seconds))
+
+    @classmethod
+    async def save_session_context(cls, session: str, context: dict):
+        await cls.get_db().session_context.replace_one(
+            {"_id": session}, dict(context, updated_at=datetime.utcnow()), upsert=True
+        )
+
+    @classmethod
+    async def load_session_context(cls, session: str):
+        return await cls.get_db().session_context.find_one({"_id": session}, {"_id": 0, "updated_at": 0})
 
     @classmethod
-    async def authenticate_user(cls, username: str, password: str):
+    async def authenticate_user(cls, username: str, password: str, hasher):
+        """Check credentials with a utils.password_hasher.PasswordHasher."""
         user = await cls.get_user_by_username(username)
         if not user:
             return None
-        if not verify_password(password, user["password"]):
+        valid, new_hash = await hasher.verify(password, user["password"])
+        if not valid:
             return None
+        if new_hash is not None:
+            # Stored with a different bcrypt cost than the configured one
+            await cls.get_db().users.update_one({"username": username}, {"$set": {"password": new_hash}})
+            user["password"] = new_hash
         return user
 
+    @classmethod
+    async def insert_training_data(cls, data: list):
+        return await cls.get_data_db().training_data.insert_many(data)
+
+    @classmethod
+    async def ensure_training_data_indexes(cls):
+        """Index the upsert key and the timestamps incremental retraining filters on"""
+        db = cls.get_data_db()
+        await db.training_data.create_index([("text", 1), ("intent", 1)], name="text_intent")
+        await db.training_data.create_index("updated_at", name="updated_at")
+        await db.interactions.create_index("corrected_at", name="corrected_at", sparse=True)
+
+    @classmethod
+    async def upsert_training_data(cls, data: list, ordered: bool = False):
+        """Insert or update training examples keyed by (text, intent)"""
+        operations = [
+            UpdateOne(
+                {"text": item["text"], "intent": item["intent"]},
+                {"$set": {"response": item.get("response", "")}, "$currentDate": {"updated_at": True}},
+                upsert=True
+            )
+            for item in data
+        ]
+        if not operations:
+            return None
+        return await cls.get_data_db().training_data.bulk_write(operations, ordered=ordered)
+
+    @classmethod
+    async def sample_training_data(cls, size: int):
+        """Return up to size randomly chosen training examples"""
+        if size <= 0:
+            return []
+        cursor = cls.get_data_db().training_data.aggregate([
+            {"$sample": {"size": size}},
+            {"$project": {"_id": 0}}
+        ])
+        return await cursor.to_list(length=None)
+
+    @classmethod
+    def training_data_cursor(cls, query=None, projection=None, batch_size=1000):
+        return cls.get_data_db().training_data.find(
+            query or {},
+            projection or {'_id': 0},
+            batch_size=batch_size
+        )
+
+    @classmethod
+    def corrected_interactions_cursor(cls, since=None, batch_size=1000):
+        """Interactions a reviewer relabelled with corrected_intent, optionally only after since, oldest first"""
+        query = {"corrected_intent": {"$exists": True}}
+        if since is not None:
+            query["corrected_at"] = {"$gt": since}
+        return cls.get_data_db().interactions.find(
+            query,
+            {"_id": 0, "query": 1, "corrected_intent": 1, "corrected_response": 1, "corrected_at": 1},
+            batch_size=batch_size
+        ).sort("corrected_at", 1)
+
+# Offline scripts (data import, training) are synchronous. They share one
+# event loop per process because a Motor client stays bound to the loop it
+# first ran on; the client is connected on first use.
+_script_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _connected_loop() -> asyncio.AbstractEventLoop:
+    global _script_loop
+    if _script_loop is None:
+        _script_loop = asyncio.new_event_loop()
+    if MongoDB.client is None:
+        _script_loop.run_until_complete(MongoDB.connect_db(ensure_indexes=False))
+    return _script_loop
+
+def run_sync(coroutine):
+    """Run a MongoDB coroutine to completion from synchronous code."""
+    return _connected_loop().run_until_complete(coroutine)
+
+def _iter_cursor(make_cursor, batch_size):
+    loop = _connected_loop()
+    cursor = make_cursor()
+    try:
+        while True:
+            batch = loop.run_until_complete(cursor.to_list(length=batch_size))
+            if not batch:
+                return
+            yield from batch
+    finally:
+        loop.run_until_complete(cursor.close())
+
 def insert_health_data(data):
     """Insert training data into MongoDB"""
-    return training_data.insert_many(data)
+    return run_sync(MongoDB.insert_training_data(data))
 
 def get_training_data():
     """Retrieve all training data"""
-    return list(training_data.find({}, {'_id': 0}))
-
-def log_interaction(user_id, query, response):
-    """Log user interaction with the model"""
-    interaction = {
-        'user_id': user_id,
-        'query': query,
-        'response': response,
-        'timestamp': datetime.utcnow()
-    }
-    return interactions.insert_one(interaction)
+    return list(iter_training_data())
+
+def iter_training_data(query=None, projection=None, batch_size=1000):
+    """Stream training data from a cursor, fetching batch_size documents per round-trip"""
+    return _iter_cursor(lambda: MongoDB.training_data_cursor(query, projection, batch_size), batch_size)
+
+def ensure_training_data_indexes():
+    """Index the upsert key and the timestamps incremental retraining filters on"""
+    return run_sync(MongoDB.ensure_training_data_indexes())
+
+def upsert_training_data(data, ordered=False):
+    """Insert or update training examples keyed by (text, intent)"""
+    return run_sync(MongoDB.upsert_training_data(data, ordered=ordered))
+
+def sample_training_data(size):
+    """Return up to size randomly chosen training examples"""
+    return run_sync(MongoDB.sample_training_data(size))
+
+def iter_corrected_interactions(since=None, batch_size=1000):
+    """Stream corrected interactions, see MongoDB.corrected_interactions_cursor"""
+    return _iter_cursor(lambda: MongoDB.corrected_interactions_cursor(since, batch_size), batch_size)
@@ -0,0 +1,10 @@
+from model import HealthAssistantModel
+
+def export():
+    model = HealthAssistantModel()
+    model.load_model()
+    model.export_numpy()
+    print(f"Exported NumPy weights to {model.numpy_weights_path}")
+
+if __name__ == "__main__":
+    export()
@@ -0,0 +1,192 @@
+"""Stream intent/utterance files into the training_data collection.
+
+Reads JSONL or CSV in chunks, drops duplicates within each chunk and upserts
+every chunk in one bulk write keyed by (text, intent), so re-imports never
+create duplicate rows. After each chunk the byte offset is written to a
+checkpoint file; re-running the same command resumes from there.
+
+JSONL lines are either training rows {"text", "intent", "response"} or catalog
+intents {"tag", "patterns", "responses"}. CSV files need text and intent
+columns and may have a response column. Lines that aren't JSON objects of
+either shape, and rows whose text, intent or response isn't a string, are
+skipped and counted as invalid.
+
+Usage:
+    python ingest.py corpus.jsonl
+    python ingest.py corpus.csv --chunk-size 5000 --ordered
+    python ingest.py corpus.jsonl --restart      # ignore an existing checkpoint
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _lines_from(handle, position):
+    """Yield decoded lines while keeping position[0] at the byte offset after the last line."""
+    while True:
+        line = handle.readline()
+        if not line:
+            return
+        position[0] = handle.tell()
+        yield line.decode("utf-8")
+
+
+def iter_records(path, fmt, start_offset=0):
+    """Yield (raw_record, byte_offset_after_record) pairs starting at start_offset.
+
+    A JSONL line that isn't valid JSON is yielded as None.
+    """
+    with open(path, "rb") as handle:
+        position = [0]
+        if fmt == "csv":
+            header = next(csv.reader([handle.readline().decode("utf-8-sig")]))
+            handle.seek(max(start_offset, handle.tell()))
+            for row in csv.DictReader(_lines_from(handle, position), fieldnames=header):
+                yield row, position[0]
+        else:
+            handle.seek(start_offset)
+            for line in _lines_from(handle, position):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record, position[0]
+
+
+def to_training_rows(record):
+    """Turn one raw record into training rows (an intent expands to one row per pattern).
+
+    Raises ValueError for a record that is neither shape.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    if "patterns" in record:
+        if not isinstance(record["patterns"], list) or not isinstance(record.get("responses") or [], list):
+            raise ValueError("patterns and responses must be lists")
+        responses = record.get("responses") or [""]
+        return [
+            {"text": pattern, "intent": record.get("tag"), "response": responses[0]}
+            for pattern in record["patterns"]
+        ]
+    return [{
+        "text": record.get("text"),
+        "intent": record.get("intent"),
+        "response": record.get("response") or "",
+    }]
+
+
+def valid_row(row):
+    """Whether text and intent are non-empty strings and response is a string."""
+    return (isinstance(row["text"], str) and isinstance(row["intent"], str)
+            and isinstance(row["response"], str) and row["text"].strip() and row["intent"].strip())
+
+
+def dedupe(rows):
+    """Keep the last valid row per (text, intent); returns (unique_rows, invalid_count)."""
+    unique = {}
+    invalid = 0
+    for row in rows:
+        if not valid_row(row):
+            invalid += 1
+            continue
+        text, intent = row["text"].strip(), row["intent"].strip()
+        unique[(text, intent)] = {"text": text, "intent": intent, "response": row["response"]}
+    return list(unique.values()), invalid
+
+
+def load_checkpoint(checkpoint_path, source_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as handle:
+        checkpoint = json.load(handle)
+    if checkpoint.get("source") != os.path.abspath(source_path):
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(checkpoint, handle)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def ingest(path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, ordered=False,
+           checkpoint_path=None, restart=False):
+    from database import ensure_training_data_indexes, upsert_training_data
+
+    fmt = fmt or detect_format(path)
+    checkpoint_path = checkpoint_path or path + ".checkpoint"
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, path)
+    stats = checkpoint["stats"] if checkpoint else {"records": 0, "rows": 0, "duplicates": 0, "upserted": 0, "modified": 0}
+    stats.setdefault("invalid", 0)
+    offset = checkpoint["offset"] if checkpoint else 0
+    if offset:
+        print(f"Resuming {path} at byte {offset}")
+
+    started = time.perf_counter()
+    ensure_training_data_indexes()
+
+    def flush(rows, end_offset):
+        unique, invalid = dedupe(rows)
+        stats["rows"] += len(rows)
+        stats["invalid"] += invalid
+        stats["duplicates"] += len(rows) - invalid - len(unique)
+        result = upsert_training_data(unique, ordered=ordered)
+        if result is not None:
+            stats["upserted"] += result.upserted_count
+            stats["modified"] += result.modified_count
+        save_checkpoint(checkpoint_path, {
+            "source": os.path.abspath(path),
+            "offset": end_offset,
+            "stats": stats,
+        })
+        print(f"{stats['records']} records, {stats['upserted']} new, {stats['modified']} updated, "
+              f"{stats['invalid']} invalid")
+
+    rows = []
+    end_offset = offset
+    for record, end_offset in iter_records(path, fmt, offset):
+        stats["records"] += 1
+        try:
+            rows.extend(to_training_rows(record))
+        except ValueError:
+            stats["invalid"] += 1
+            continue
+        if len(rows) >= chunk_size:
+            flush(rows, end_offset)
+            rows = []
+    if rows:
+        flush(rows, end_offset)
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream JSONL/CSV intent files into MongoDB.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--ordered", action="store_true", help="stop a chunk at the first write error")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    stats = ingest(args.path, args.format, args.chunk_size, args.ordered, args.checkpoint, args.restart)
+    print(f"Done: {json.dumps(stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,3 @@
-from database import insert_health_data
-
 healthcare_data = {
     "intents": [
         {
@@ -129,6 +127,8 @@ def prepare_training_data():
     return training_data
 
 def main():
+    from database import insert_health_data
+
     try:
         # Convert intents to training data format
         training_data = prepare_training_data()
@@ -1,22 +1,78 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+import asyncio
+import functools
+import hmac
 import json
+import os
 import logging
+import random
+import time
 import traceback
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from insert_data import healthcare_data
 from models.user import UserCreate, UserResponse, UserLogin, Token
+from models.notice import Notice
 from database import MongoDB
-from utils.auth import get_password_hash, create_access_token
-from datetime import timedelta
+from utils.auth import SECRET_KEY, TokenAuthority, parse_keys
+from utils.intent_matcher import IntentMatcher
+from utils.intent_table import IntentTable
+from utils.inference_executor import InferenceExecutor, InferenceOverloaded
+from utils.micro_batcher import MicroBatcher
+from utils.response_cache import ResponseCache
+from utils.interaction_sink import InteractionSink
+from utils.metrics import REGISTRY
+from utils.codec import CODECS, JSON, ResponseFrames, negotiate
+from utils.connection_manager import ConnectionManager
+from utils.password_hasher import HasherOverloaded, PasswordHasher
+from utils.response_stream import ResponseStreamer
+from utils.pattern_index import GenerationWatcher
+from utils.pubsub import LocalPubSub, MongoPubSub
+from utils.rate_limiter import KeyedRateLimiter
+from utils.session_context import ContextResolver, SessionContextStore
+from model_registry import ModelIntegrityError, ModelRegistry
+import config
+from jose import JWTError
+from pymongo.errors import DuplicateKeyError
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, 
+logging.basicConfig(level=config.LOG_LEVEL, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def log_sampled() -> bool:
+    """Whether to log this message, for LOG_SAMPLE_RATE of them."""
+    return config.LOG_SAMPLE_RATE > 0 and random.random() < config.LOG_SAMPLE_RATE
+
+# Hot-path metrics served on /metrics; gauges are registered next to what they read
+classification_seconds = REGISTRY.histogram(
+    "health_ai_classification_seconds", "Time to classify a chat message, by cache or model", ("source",)
+)
+inference_seconds = REGISTRY.histogram(
+    "health_ai_inference_seconds", "Model time per inference executor call", ("method",)
+)
+serialization_seconds = REGISTRY.histogram(
+    "health_ai_serialization_seconds", "Time to encode a WebSocket frame", ("codec",)
+)
+ws_turn_seconds = REGISTRY.histogram(
+    "health_ai_ws_turn_seconds", "From receiving a chat message to sending the last frame of its reply", ("mode",)
+)
+replies_by_intent = REGISTRY.counter("health_ai_replies_total", "Chat replies by intent", ("intent",))
+errors_by_cause = REGISTRY.counter("health_ai_errors_total", "Error replies and refused requests by cause", ("cause",))
+loop_lag_seconds = REGISTRY.histogram(
+    "health_ai_event_loop_lag_seconds", "How late the event loop woke a task sleeping LOOP_LAG_PROBE_SECONDS"
+)
+
+async def monitor_event_loop(interval: float):
+    """Sample how long every connection on this worker waits for the loop on top of its own work."""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        loop_lag_seconds.observe(max(0.0, time.perf_counter() - expected))
+
 app = FastAPI()
 
 # Mount static files
@@ -39,36 +95,137 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_db_client():
     await MongoDB.connect_db()
+    password_hasher.start()
+    interaction_sink.start()
+    app.state.pubsub = create_pubsub()
+    await app.state.pubsub.start()
+    manager.attach(app.state.pubsub)
+    manager.start()
+    if session_contexts is not None and config.SESSION_CONTEXT_SPILL:
+        asyncio.create_task(ensure_session_context_indexes())
+    failed_version = None
+    if config.MODEL_BACKEND in REGISTRY_BACKENDS:
+        # Checksumming the artifacts takes a while; keep it off the event loop
+        version, model_dir = await asyncio.get_running_loop().run_in_executor(None, resolve_registry_model)
+        if version is not None:
+            inference_executor.model_factory = functools.partial(create_health_model, model_dir)
+            inference_executor.version = version
+        # Don't retry a CURRENT that failed verification until it changes
+        current = model_registry.current_version()
+        if current != version:
+            failed_version = current
+    inference_executor.start()
+    # Load the model after the server starts listening; /api/ready reports progress
+    app.state.warm_up_task = asyncio.create_task(warm_up_model())
+    app.state.registry_task = None
+    if config.MODEL_BACKEND in REGISTRY_BACKENDS:
+        app.state.registry_task = asyncio.create_task(follow_model_registry(failed_version))
+    if micro_batcher is not None:
+        micro_batcher.start()
+    app.state.loop_monitor_task = None
+    if config.LOOP_LAG_PROBE_SECONDS > 0:
+        app.state.loop_monitor_task = asyncio.create_task(monitor_event_loop(config.LOOP_LAG_PROBE_SECONDS))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if app.state.registry_task is not None:
+        app.state.registry_task.cancel()
+    if app.state.loop_monitor_task is not None:
+        app.state.loop_monitor_task.cancel()
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    inference_executor.shutdown()
+    password_hasher.shutdown()
+    await manager.stop()
+    await app.state.pubsub.close()
+    await interaction_sink.close()
     await MongoDB.close_db()
 
+# bcrypt runs in its own process pool so logins don't stall the event loop
+password_hasher = PasswordHasher(
+    rounds=config.BCRYPT_ROUNDS,
+    max_workers=config.PASSWORD_HASH_WORKERS,
+    max_pending=config.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=config.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
+login_rate_limiter = KeyedRateLimiter(
+    attempts=config.LOGIN_RATE_LIMIT_ATTEMPTS,
+    window_seconds=config.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+)
+
+token_authority = TokenAuthority(
+    parse_keys(config.JWT_KEYS) or {"default": SECRET_KEY},
+    expire_minutes=config.JWT_EXPIRE_MINUTES,
+    cache_size=config.JWT_CACHE_SIZE,
+)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> Dict[str, Any]:
+    """Claims of the request's bearer token; add as a dependency to require a login."""
+    if credentials is not None:
+        try:
+            return token_authority.verify(credentials.credentials)
+        except JWTError:
+            pass
+    errors_by_cause.inc("unauthorized")
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def require_ops_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    """Guard for operational endpoints: only the OPS_TOKEN bearer passes, and nobody while it is unset."""
+    if config.OPS_TOKEN and credentials is not None and hmac.compare_digest(
+        credentials.credentials.encode(), config.OPS_TOKEN.encode()
+    ):
+        return
+    errors_by_cause.inc("unauthorized")
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def websocket_token(websocket: WebSocket) -> Optional[str]:
+    """Token from ?token= (browsers can't set headers on a WebSocket) or an Authorization header."""
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return None
+
+def hasher_busy() -> HTTPException:
+    errors_by_cause.inc("hasher_busy")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again",
+    )
+
 @app.post("/api/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user: UserCreate):
-    # Check if username already exists
-    if await MongoDB.get_user_by_username(user.username):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
-    
-    # Check if email already exists
-    if await MongoDB.get_user_by_email(user.email):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
     # Hash the password
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HasherOverloaded:
+        raise hasher_busy()
     
     # Create user data dictionary
     user_data = user.dict()
     user_data["password"] = hashed_password
     
-    # Insert user into database
-    created_user = await MongoDB.create_user(user_data)
+    # Insert user into database; the unique indexes reject taken usernames and emails
+    try:
+        created_user = await MongoDB.create_user(user_data)
+    except DuplicateKeyError as e:
+        key_pattern = (e.details or {}).get("keyPattern") or {}
+        field = "Email" if "email" in key_pattern or "email_unique" in str(e) else "Username"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{field} already registered"
+        )
     
     # Remove password from response
     created_user.pop("password")
@@ -76,8 +233,22 @@ async def register_user(user: UserCreate):
 
 @app.post("/api/login")
 async def login(user_credentials: UserLogin):
-    user = await MongoDB.authenticate_user(user_credentials.username, user_credentials.password)
+    retry_after = login_rate_limiter.acquire(user_credentials.username)
+    if retry_after:
+        errors_by_cause.inc("login_rate_limited")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+    try:
+        user = await MongoDB.authenticate_user(
+            user_credentials.username, user_credentials.password, password_hasher
+        )
+    except HasherOverloaded:
+        raise hasher_busy()
     if not user:
+        errors_by_cause.inc("login_failed")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -85,10 +256,7 @@ async def login(user_credentials: UserLogin):
         )
     
     # Create access token
-    access_token = create_access_token(
-        data={"sub": user["username"]},
-        expires_delta=timedelta(minutes=30)
-    )
+    access_token = token_authority.issue({"sub": user["username"]})
     
     # Remove password from user data
     user.pop("password", None)
@@ -99,55 +267,34 @@ async def login(user_credentials: UserLogin):
         "user": user
     }
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"New WebSocket connection established. Total active connections: {len(self.active_connections)}")
+def create_pubsub():
+    """Pub/sub between server workers selected by PUBSUB_BACKEND."""
+    if config.PUBSUB_BACKEND == "mongo":
+        return MongoPubSub(MongoDB.get_db())
+    if config.PUBSUB_BACKEND != "local":
+        raise ValueError(f"Unknown pub/sub backend: {config.PUBSUB_BACKEND}")
+    return LocalPubSub()
 
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        logger.info(f"WebSocket connection closed. Total active connections: {len(self.active_connections)}")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
-            traceback.print_exc()
-
-manager = ConnectionManager()
+manager = ConnectionManager(
+    idle_timeout=config.WS_IDLE_TIMEOUT_SECONDS,
+    heartbeat_interval=config.WS_HEARTBEAT_SECONDS,
+    send_timeout=config.WS_SEND_TIMEOUT_SECONDS,
+)
+REGISTRY.gauge("health_ai_ws_connections", "Open WebSocket connections on this worker", lambda: len(manager))
+REGISTRY.gauge("health_ai_ws_users", "Signed-in users with an open WebSocket on this worker",
+               lambda: manager.stats()["users"])
 
 class HealthAssistantModel:
     def __init__(self):
         self.intents = healthcare_data["intents"]
-        self.pattern_to_tag = {}
-        for intent in self.intents:
-            for pattern in intent["patterns"]:
-                self.pattern_to_tag[pattern.lower()] = intent["tag"]
+        # Compile the catalog once so per-message matching does not scan it
+        self.matcher = IntentMatcher(self.intents)
+        self.pattern_to_tag = self.matcher.pattern_to_tag
+        self.intent_table = IntentTable.from_intents(self.intents)
 
     def classify_intent(self, query: str) -> str:
         """Classify the intent of the user's query."""
-        query = query.lower()
-        
-        # First try exact pattern matching
-        for pattern in self.pattern_to_tag:
-            if pattern in query:
-                return self.pattern_to_tag[pattern]
-        
-        # If no exact match, try word-by-word matching
-        query_words = set(query.split())
-        for intent in self.intents:
-            for pattern in intent["patterns"]:
-                pattern_words = set(pattern.lower().split())
-                if len(query_words.intersection(pattern_words)) >= 1:
-                    return intent["tag"]
-        
-        return "default"
+        return self.matcher.match(query)
 
     def predict(self, query: str) -> Dict[str, Any]:
         """Generate a response based on the query."""
@@ -155,22 +302,17 @@ class HealthAssistantModel:
             intent_tag = self.classify_intent(query)
             
             # Find the matching intent
-            matching_intent = None
-            for intent in self.intents:
-                if intent["tag"] == intent_tag:
-                    matching_intent = intent
-                    break
+            intent_id = self.intent_table.lookup(intent_tag)
             
-            if matching_intent:
-                import random
-                response = random.choice(matching_intent["responses"])
+            if intent_id is not None:
+                response = self.intent_table.choose_response(intent_id)
             else:
                 response = "I'm not sure how to respond to that. Could you please rephrase your question?"
 
             return {
                 "response": response,
                 "intent": intent_tag,
-                "confidence": 1.0 if matching_intent else 0.0
+                "confidence": 1.0 if intent_id is not None else 0.0
             }
         except Exception as e:
             logger.error(f"Prediction error: {e}")
@@ -180,12 +322,336 @@ class HealthAssistantModel:
                 "confidence": 0.0
             }
 
-health_model = HealthAssistantModel()
+    def predict_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Generate responses for several queries."""
+        return [self.predict(query) for query in queries]
+
+model_registry = ModelRegistry(config.MODEL_REGISTRY_DIR)
+
+# Backends built from trained artifacts; the others are fitted from the intent catalog
+REGISTRY_BACKENDS = ("keras", "numpy")
+
+def create_health_model(model_dir: Optional[str] = None):
+    """Build the intent model selected by MODEL_BACKEND.
+
+    ``model_dir`` is a model registry version directory; without it the
+    trained artifacts in the working directory are used.
+    """
+    if config.MODEL_BACKEND == "keras":
+        from model import HealthAssistantModel as KerasHealthAssistantModel
+        return KerasHealthAssistantModel(model_dir)
+    if config.MODEL_BACKEND == "numpy":
+        from numpy_model import NumpyHealthModel
+        if model_dir:
+            return NumpyHealthModel(os.path.join(model_dir, os.path.basename(config.NUMPY_MODEL_PATH)))
+        return NumpyHealthModel(config.NUMPY_MODEL_PATH)
+    if config.MODEL_BACKEND == "tfidf":
+        from tfidf_model import TfidfHealthModel
+        return TfidfHealthModel(healthcare_data["intents"], reject_threshold=config.TFIDF_REJECT_THRESHOLD)
+    if config.MODEL_BACKEND == "retrieval":
+        from retrieval_model import RetrievalHealthModel
+        return RetrievalHealthModel(
+            config.RETRIEVAL_INDEX_DIR,
+            healthcare_data["intents"],
+            reject_threshold=config.RETRIEVAL_REJECT_THRESHOLD,
+            nprobe=config.RETRIEVAL_NPROBE,
+            refresh_interval=config.RETRIEVAL_REFRESH_SECONDS,
+        )
+    if config.MODEL_BACKEND != "rules":
+        raise ValueError(f"Unknown model backend: {config.MODEL_BACKEND}")
+    return HealthAssistantModel()
+
+inference_executor = InferenceExecutor(
+    create_health_model,
+    mode=config.INFERENCE_EXECUTOR,
+    max_workers=config.INFERENCE_WORKERS,
+    max_pending=config.INFERENCE_MAX_PENDING,
+    queue_timeout=config.INFERENCE_QUEUE_TIMEOUT,
+    latency=inference_seconds,
+)
+REGISTRY.gauge("health_ai_inference_pending", "Predictions queued or running", lambda: inference_executor.pending)
+
+# Coalesce concurrent messages into one model call when batching is enabled
+micro_batcher = None
+if config.BATCH_MAX_SIZE > 1:
+    micro_batcher = MicroBatcher(
+        inference_executor.predict_batch,
+        max_batch_size=config.BATCH_MAX_SIZE,
+        max_wait_ms=config.BATCH_WINDOW_MS,
+        max_pending=config.INFERENCE_MAX_PENDING,
+        queue_timeout=config.INFERENCE_QUEUE_TIMEOUT,
+        batch_size=REGISTRY.histogram(
+            "health_ai_batch_size", "Messages per model call when batching",
+            buckets=[2 ** i for i in range(config.BATCH_MAX_SIZE.bit_length() + 1)],
+        ),
+    )
+    REGISTRY.gauge("health_ai_batch_pending", "Messages waiting for a batch or in one",
+                   lambda: micro_batcher.pending)
+
+# Cache of classified queries, invalidated when the model or catalog changes
+intent_catalog = IntentTable.from_intents(healthcare_data["intents"])
+response_cache = None
+if config.RESPONSE_CACHE_MAX_ENTRIES > 0:
+    response_cache = ResponseCache(
+        max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS,
+    )
+_shared_responses: Dict[tuple, tuple] = {}
+
+def cached_response_options(result: Dict[str, Any]) -> tuple:
+    """Responses a cache hit may answer with for this result."""
+    if config.MODEL_BACKEND in ("rules", "tfidf", "retrieval"):
+        # These models pick at random among the catalog responses
+        intent_id = intent_catalog.lookup(result["intent"])
+        if intent_id is not None:
+            return intent_catalog.responses[intent_id]
+    key = (result["intent"], result["response"])
+    options = _shared_responses.get(key)
+    if options is None:
+        options = _shared_responses[key] = (result["response"],)
+    return options
+
+# Patterns added with retrieval_model.py reach running servers without a new model version
+retrieval_index_watcher = GenerationWatcher(config.RETRIEVAL_INDEX_DIR, config.RETRIEVAL_REFRESH_SECONDS)
+
+def cache_version() -> str:
+    """What cached answers depend on; the cache empties when it changes."""
+    version = f"{config.MODEL_BACKEND}:{inference_executor.version}:{intent_catalog.version}"
+    if config.MODEL_BACKEND == "retrieval":
+        version += f":{retrieval_index_watcher.generation()}"
+    return version
+
+async def get_prediction(query: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if response_cache is not None:
+        version = cache_version()
+        response_cache.ensure_version(version)
+        cached = response_cache.get(query)
+        if cached is not None:
+            classification_seconds.observe(time.perf_counter() - started, "cache")
+            return cached
+
+    if micro_batcher is not None:
+        result = await micro_batcher.predict(query)
+    else:
+        result = await inference_executor.predict(query)
+    classification_seconds.observe(time.perf_counter() - started, "model")
+
+    # A prediction that was in flight while the model was swapped must not be cached under the new version
+    if response_cache is not None and result["intent"] != "error" and cache_version() == version:
+        response_cache.put(query, result["intent"], result["confidence"], cached_response_options(result))
+    return result
+
+async def warm_up_model():
+    try:
+        await inference_executor.warm_up()
+        logger.info(f"Model warm-up finished in {inference_executor.warm_up_seconds:.2f}s")
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {e}")
+        traceback.print_exc()
+
+def resolve_registry_model():
+    """(version, directory) of the newest version that verifies: CURRENT, else the ones active before it.
+
+    (None, None) without a registry, or when no version verifies; the
+    backend's default files are served then.
+    """
+    for version in model_registry.candidates():
+        try:
+            return version, model_registry.resolve(version)
+        except ModelIntegrityError as e:
+            logger.error(f"Model version {version} failed verification, trying the one before it: {e}")
+    return None, None
+
+async def follow_model_registry(failed_version: Optional[str] = None):
+    """Hot-swap the model whenever the registry's CURRENT version changes."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(config.MODEL_REGISTRY_POLL_SECONDS)
+        version = model_registry.current_version()
+        if version is None or version in (inference_executor.version, failed_version):
+            continue
+        try:
+            model_dir = await loop.run_in_executor(None, model_registry.resolve, version)
+            await inference_executor.swap(functools.partial(create_health_model, model_dir), version)
+            logger.info(f"Switched to model version {version}")
+        except Exception as e:
+            failed_version = version
+            logger.error(f"Loading model version {version} failed, keeping {inference_executor.version}: {e}")
+
+# Interactions are buffered and written to MongoDB in batches off the hot path
+interaction_sink = InteractionSink(
+    MongoDB.insert_interactions,
+    max_buffer=config.INTERACTION_BUFFER_SIZE,
+    batch_size=config.INTERACTION_BATCH_SIZE,
+    flush_interval=config.INTERACTION_FLUSH_SECONDS,
+    drop_policy=config.INTERACTION_DROP_POLICY,
+)
+REGISTRY.gauge("health_ai_interactions_buffered", "Interactions waiting to be written to MongoDB",
+               lambda: interaction_sink.stats()["buffered"])
 
 def log_interaction(user_id: str, query: str, response: Dict[str, Any]):
     """Log user interactions."""
-    logger.info(f"User {user_id} Query: {query}")
-    logger.info(f"Response: {response}")
+    interaction_sink.submit(user_id, query, response)
+    replies_by_intent.inc(response.get("intent", "unknown"))
+    if logger.isEnabledFor(logging.DEBUG):
+        # The query stays in MongoDB; it may hold health details
+        logger.debug("User %s Intent: %s", user_id, response.get("intent"))
+
+# Recent intents and topics of each chat session, used for follow-up questions
+session_contexts = None
+context_resolver = None
+if config.SESSION_CONTEXT_WINDOW > 0:
+    session_contexts = SessionContextStore(
+        window=config.SESSION_CONTEXT_WINDOW,
+        ttl_seconds=config.SESSION_CONTEXT_TTL_SECONDS,
+        max_sessions=config.SESSION_CONTEXT_MAX_SESSIONS,
+        save=MongoDB.save_session_context if config.SESSION_CONTEXT_SPILL else None,
+        load=MongoDB.load_session_context if config.SESSION_CONTEXT_SPILL else None,
+    )
+    context_resolver = ContextResolver(healthcare_data["intents"])
+
+async def ensure_session_context_indexes():
+    try:
+        await MongoDB.ensure_session_context_indexes(config.SESSION_CONTEXT_TTL_SECONDS)
+    except Exception as e:
+        logger.error(f"Creating session context indexes failed: {e}")
+
+def apply_session_context(session: str, query: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    """Answer a follow-up with the session's topic, then record the turn."""
+    if session_contexts is None or response["intent"] == "error":
+        return response
+    topic = context_resolver.resolve(query, response["intent"], session_contexts.get(session))
+    if topic is not None:
+        intent_id = intent_catalog.lookup(topic)
+        if intent_id is not None:
+            response = {
+                "response": intent_catalog.choose_response(intent_id),
+                "intent": topic,
+                "confidence": response["confidence"],
+            }
+    entities = context_resolver.entities(query)
+    if response["intent"] in context_resolver.topics:
+        # The topic that was answered is the one a follow-up refers to
+        entities = [entity for entity in entities if entity != response["intent"]] + [response["intent"]]
+    session_contexts.record(session, response["intent"], entities)
+    return response
+
+def end_session_context(connection):
+    if session_contexts is None:
+        return
+    if connection.session_key is not None:
+        session_contexts.release(connection.session_key)
+    else:
+        # Nobody can resume this connection's context
+        session_contexts.discard(connection.id)
+
+@app.get("/api/me")
+async def me(claims: Dict[str, Any] = Depends(current_user)):
+    return {"username": claims["sub"], "expires_at": claims["exp"]}
+
+def notice_frame(notice: Notice) -> str:
+    # Server-initiated frames are JSON text whatever codec the connection negotiated
+    return json.dumps({"type": "notice", "message": notice.message})
+
+@app.post("/api/broadcast", dependencies=[Depends(require_ops_token)])
+async def broadcast_notice(notice: Notice):
+    """Send a notice to every WebSocket on every worker."""
+    await manager.cluster_broadcast(notice_frame(notice))
+    return {"sent": True}
+
+@app.get("/api/sessions/{session}")
+async def session_location(session: str, claims: Dict[str, Any] = Depends(current_user)):
+    """Which worker holds the caller's ?session= connections."""
+    worker = manager.locate_session(claims["sub"], session)
+    if worker is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session is not connected")
+    return {"session": session, "worker": worker}
+
+@app.post("/api/sessions/{session}/notices")
+async def send_session_notice(session: str, notice: Notice, claims: Dict[str, Any] = Depends(current_user)):
+    """Send a notice to the caller's ?session= connections, on whichever worker holds them."""
+    if not await manager.send_to_session(claims["sub"], session, notice_frame(notice)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session is not connected")
+    return {"sent": True}
+
+@app.get("/api/ready")
+async def readiness():
+    body = {
+        "ready": inference_executor.ready,
+        "backend": config.MODEL_BACKEND,
+        "warm_up_seconds": inference_executor.warm_up_seconds,
+        "error": inference_executor.warm_up_error,
+    }
+    if not inference_executor.ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
+
+@app.get("/api/inference/stats", dependencies=[Depends(require_ops_token)])
+async def inference_stats():
+    stats = {"executor": inference_executor.stats()}
+    if micro_batcher is not None:
+        stats["batching"] = micro_batcher.stats()
+    if response_cache is not None:
+        stats["cache"] = response_cache.stats()
+    stats["interaction_log"] = interaction_sink.stats()
+    stats["websocket"] = manager.stats()
+    stats["pubsub"] = app.state.pubsub.stats()
+    stats["password_hasher"] = password_hasher.stats()
+    stats["database"] = MongoDB.stats()
+    stats["tokens"] = token_authority.stats()
+    stats["codec"] = response_frames.stats()
+    stats["streams"] = response_streamer.stats()
+    stats["login_rate_limit"] = login_rate_limiter.stats()
+    if session_contexts is not None:
+        stats["session_context"] = session_contexts.stats()
+    return stats
+
+# Catalog responses encoded once per codec; a message only adds its confidence
+response_frames = ResponseFrames()
+response_frames.add_catalog(healthcare_data["intents"])
+
+def websocket_codec(websocket: WebSocket):
+    """Codec for replies: the first supported WebSocket subprotocol, then ?codec=, then JSON.
+
+    Returns the codec and the subprotocol to accept with, if the client offered one.
+    """
+    offered = list(websocket.scope.get("subprotocols") or [])
+    requested = offered + [websocket.query_params.get("codec", "")]
+    codec, name = negotiate(requested)
+    return codec, name if name in offered else None
+
+# Streamed replies: catalog responses are split into chunks once
+response_streamer = ResponseStreamer(max_chunk_chars=config.WS_STREAM_CHUNK_CHARS, max_active=config.WS_MAX_STREAMS)
+response_streamer.add_catalog(healthcare_data["intents"])
+
+async def receive_frame(websocket: WebSocket):
+    """Next text (str) or binary (bytes) frame."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes")
+
+def decode_frame(frame):
+    """Text frames carry JSON and binary frames MessagePack, whatever the reply codec."""
+    if isinstance(frame, str):
+        return JSON.decode(frame)
+    if "msgpack" not in CODECS:
+        raise ValueError("Binary frames need msgpack installed")
+    return CODECS["msgpack"].decode(frame)
+
+async def send_frame(websocket: WebSocket, frame):
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+@app.get("/metrics", dependencies=[Depends(require_ops_token)])
+async def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/test")
 async def test():
@@ -193,64 +659,172 @@ async def test():
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    user = None
+    token = websocket_token(websocket)
+    if token is not None:
+        try:
+            user = token_authority.verify(token)["sub"]
+        except JWTError:
+            errors_by_cause.inc("ws_unauthorized")
+            # Closing before accept refuses the handshake
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    elif config.WS_REQUIRE_AUTH:
+        errors_by_cause.inc("ws_unauthorized")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    codec, subprotocol = websocket_codec(websocket)
+    connection = await manager.connect(
+        websocket, user=user, session=websocket.query_params.get("session"), subprotocol=subprotocol
+    )
+
+    async def reply(message: Dict[str, Any]):
+        started = time.perf_counter()
+        frame = codec.encode(message)
+        serialization_seconds.observe(time.perf_counter() - started, codec.name)
+        await send_frame(websocket, frame)
+
+    streams = response_streamer.connection()
+    stream_by_default = websocket.query_params.get("stream", "").lower() in ("1", "true")
+
+    async def stream_reply(stream_id: str, question_text: str, received: float):
+        """Ack with the intent as soon as it is known, then send the response in chunks."""
+        try:
+            response = await get_prediction(question_text)
+        except InferenceOverloaded:
+            logger.warning("Inference queue full, rejecting message")
+            errors_by_cause.inc("overloaded")
+            await reply({"type": "error", "id": stream_id, "error": "Server is busy, please try again"})
+            return
+        try:
+            response = apply_session_context(session, question_text, response)
+            ack = {key: value for key, value in response.items() if key != "response"}
+            await reply({"type": "ack", "id": stream_id, **ack})
+            chunks = response_streamer.chunks(response["response"])
+            for seq, text in enumerate(chunks):
+                await reply({"type": "chunk", "id": stream_id, "seq": seq, "text": text})
+                # Let a cancel for this stream, and other connections, in between chunks
+                await asyncio.sleep(0)
+            await reply({"type": "end", "id": stream_id, "chunks": len(chunks)})
+        except WebSocketDisconnect:
+            return
+        except Exception:
+            errors_by_cause.inc("internal")
+            await reply({"type": "error", "id": stream_id, "error": "Internal server error"})
+            raise
+        ws_turn_seconds.observe(time.perf_counter() - received, "stream")
+        log_interaction(user or "anonymous", question_text, response)
+
+    # Signed-in ?session= connections resume their context; others keep one of their own
+    session = connection.session_key or connection.id
+    if session_contexts is not None and session != connection.id:
+        await session_contexts.restore(session)
     try:
         while True:
             try:
                 # Receive message from client
-                data = await websocket.receive_text()
+                data = await receive_frame(websocket)
+                received = time.perf_counter()
+                connection.touch()
                 
-                # Log incoming message
-                logger.info(f"Received WebSocket message: {data}")
+                # Log a sample of incoming messages, never their content
+                if log_sampled():
+                    logger.info("WebSocket %s received a %d byte %s frame", connection.id, len(data),
+                                "text" if isinstance(data, str) else "binary")
                 
                 # Parse the incoming message
                 try:
-                    message_data = json.loads(data)
+                    message_data = decode_frame(data)
+                    if not isinstance(message_data, dict):
+                        raise ValueError("Message is not an object")
                     question_text = message_data.get("message", "")
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid JSON received: {data}")
-                    await websocket.send_text(json.dumps({
+                    message_type = message_data.get("type")
+                    # The cache and the models expect text; {"message": 5} is a malformed frame
+                    if not isinstance(question_text, str):
+                        raise ValueError("Message text is not a string")
+                except ValueError:
+                    logger.warning("Invalid message received on WebSocket %s", connection.id)
+                    errors_by_cause.inc("invalid_message")
+                    await reply({
                         "error": "Invalid message format"
-                    }))
+                    })
+                    continue
+
+                # Keep-alive messages only refresh the idle timer
+                if message_type == "ping":
+                    await reply({"type": "pong"})
+                    continue
+                if message_type == "pong":
+                    continue
+                if message_type == "cancel":
+                    stream_id = str(message_data.get("id"))
+                    if streams.cancel(stream_id):
+                        await reply({"type": "end", "id": stream_id, "cancelled": True})
                     continue
 
                 # Validate input
                 if not question_text:
                     logger.warning("Empty message received")
-                    await websocket.send_text(json.dumps({
+                    errors_by_cause.inc("empty_message")
+                    await reply({
                         "error": "Empty message received"
-                    }))
+                    })
+                    continue
+
+                if message_data.get("stream", stream_by_default):
+                    stream_id = str(message_data.get("id") or streams.next_id())
+                    if not streams.start(stream_id, stream_reply(stream_id, question_text, received)):
+                        errors_by_cause.inc("too_many_streams")
+                        await reply({"type": "error", "id": stream_id, "error": "Too many streams in progress"})
+                    continue
+
+                # Get AI response without blocking other connections
+                try:
+                    response = await get_prediction(question_text)
+                except InferenceOverloaded:
+                    logger.warning("Inference queue full, rejecting message")
+                    errors_by_cause.inc("overloaded")
+                    await reply({
+                        "error": "Server is busy, please try again"
+                    })
                     continue
 
-                # Get AI response
-                response = health_model.predict(question_text)
+                response = apply_session_context(session, question_text, response)
                 
                 # Send response back to client
-                await websocket.send_text(json.dumps(response))
+                started = time.perf_counter()
+                frame = response_frames.encode(codec, response)
+                serialization_seconds.observe(time.perf_counter() - started, codec.name)
+                await send_frame(websocket, frame)
+                ws_turn_seconds.observe(time.perf_counter() - received, "single")
                 
                 # Log the interaction
-                log_interaction("anonymous", question_text, response)
+                log_interaction(user or "anonymous", question_text, response)
                 
             except WebSocketDisconnect:
-                manager.disconnect(websocket)
+                manager.disconnect(connection.id)
                 break
             except Exception as e:
                 logger.error(f"WebSocket message handling error: {str(e)}")
+                errors_by_cause.inc("internal")
                 traceback.print_exc()
                 try:
-                    await websocket.send_text(json.dumps({
+                    await reply({
                         "error": "Internal server error"
-                    }))
+                    })
                 except:
                     pass
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        manager.disconnect(connection.id)
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
         traceback.print_exc()
-        manager.disconnect(websocket)
+        manager.disconnect(connection.id)
+    finally:
+        streams.cancel_all()
+        end_session_context(connection)
 
 # Add this to run the server
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=config.SERVER_WORKERS)
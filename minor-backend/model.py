@@ -1,47 +1,175 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.text import Tokenizer
+from tensorflow.keras.preprocessing.text import Tokenizer, text_to_word_sequence
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import Dense, Embedding, GlobalAveragePooling1D
 import numpy as np
 from database import get_training_data
+from utils.intent_table import IntentTable
 import pickle
+import json
 import os
+import time
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Records wall time and throughput for every epoch."""
+
+    def __init__(self, num_examples):
+        super().__init__()
+        self.num_examples = num_examples
+        self.epochs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._started
+        examples_per_sec = self.num_examples / seconds if seconds else 0.0
+        self.epochs.append({"epoch": epoch + 1, "seconds": seconds, "examples_per_sec": examples_per_sec})
+        print(f"Epoch {epoch + 1}: {seconds:.3f}s, {examples_per_sec:.0f} examples/sec")
 
 class HealthAssistantModel:
-    def __init__(self):
+    def __init__(self, model_dir=None):
         self.model = None
         self.tokenizer = None
         self.label_encoder = None
+        self.intent_table = None
         self.max_sequence_length = 20
         self.vocab_size = 1000
         self.embedding_dim = 16
         self.model_path = "health_model.h5"
         self.tokenizer_path = "tokenizer.pickle"
         self.label_encoder_path = "label_encoder.pickle"
+        self.numpy_weights_path = "health_model.npz"
+        if model_dir:
+            # Load a published registry version instead of the working-directory files
+            self.model_path, self.tokenizer_path, self.label_encoder_path, self.numpy_weights_path = (
+                self._artifact_paths(model_dir)
+            )
 
-    def preprocess_data(self, training_data):
+    def _artifact_paths(self, directory):
+        return tuple(
+            os.path.join(directory, os.path.basename(path))
+            for path in (self.model_path, self.tokenizer_path, self.label_encoder_path, self.numpy_weights_path)
+        )
+
+    def fit_vocabulary(self, training_data):
+        """Fit the tokenizer and label encoder; return texts, encoded labels and class count."""
         # Extract texts and labels
         texts = [item["text"] for item in training_data]
         intents = [item["intent"] for item in training_data]
         responses = [item["response"] for item in training_data]
 
-        # Tokenize texts
+        # Fit the tokenizer vocabulary
         self.tokenizer = Tokenizer(num_words=self.vocab_size, oov_token="<OOV>")
         self.tokenizer.fit_on_texts(texts)
-        sequences = self.tokenizer.texts_to_sequences(texts)
-        padded_sequences = pad_sequences(sequences, maxlen=self.max_sequence_length, truncating='post')
 
-        # Encode labels
-        self.label_encoder = {intent: i for i, intent in enumerate(set(intents))}
+        # Encode labels (sorted so class ids don't depend on hash seeds)
+        self.label_encoder = {intent: i for i, intent in enumerate(sorted(set(intents)))}
         encoded_labels = np.array([self.label_encoder[intent] for intent in intents])
         num_classes = len(self.label_encoder)
 
         # Create response lookup
         self.response_lookup = {intent: resp for intent, resp in zip(intents, responses)}
+        self.intent_table = IntentTable.from_label_encoder(self.label_encoder, self.response_lookup)
+
+        return texts, encoded_labels, num_classes
+
+    def extend_vocabulary(self, training_data):
+        """Add unseen words and intents after the existing ids; same return value as fit_vocabulary.
+
+        Refitting the tokenizer would renumber words by frequency and invalidate
+        the trained embedding rows, so new words are appended instead and the
+        vocabulary grows past vocab_size when it has to.
+        """
+        texts = [item["text"] for item in training_data]
+        intents = [item["intent"] for item in training_data]
 
+        tokenizer = self.tokenizer
+        for text in texts:
+            for word in text_to_word_sequence(text, filters=tokenizer.filters, lower=tokenizer.lower,
+                                              split=tokenizer.split):
+                tokenizer.word_counts[word] = tokenizer.word_counts.get(word, 0) + 1
+                if word not in tokenizer.word_index:
+                    index = len(tokenizer.word_index) + 1
+                    tokenizer.word_index[word] = index
+                    tokenizer.index_word[index] = word
+        self.vocab_size = max(self.vocab_size, len(tokenizer.word_index) + 1)
+        tokenizer.num_words = self.vocab_size
+
+        for intent, item in zip(intents, training_data):
+            if intent not in self.label_encoder:
+                self.label_encoder[intent] = len(self.label_encoder)
+            if item.get("response") or intent not in self.response_lookup:
+                self.response_lookup[intent] = item.get("response") or ""
+        encoded_labels = np.array([self.label_encoder[intent] for intent in intents])
+        self.intent_table = IntentTable.from_label_encoder(self.label_encoder, self.response_lookup)
+
+        return texts, encoded_labels, len(self.label_encoder)
+
+    def preprocess_data(self, training_data):
+        texts, encoded_labels, num_classes = self.fit_vocabulary(training_data)
+        sequences = self.tokenizer.texts_to_sequences(texts)
+        padded_sequences = pad_sequences(sequences, maxlen=self.max_sequence_length, truncating='post')
         return padded_sequences, encoded_labels, num_classes
 
+    def make_tokenize_fn(self):
+        """In-graph equivalent of texts_to_sequences + pad_sequences(truncating='post') for tf.data."""
+        tokenizer = self.tokenizer
+        oov_index = tokenizer.word_index.get(tokenizer.oov_token, -1) if tokenizer.oov_token else -1
+        words = [w for w, i in tokenizer.word_index.items() if not tokenizer.num_words or i < tokenizer.num_words]
+        table = tf.lookup.StaticHashTable(
+            tf.lookup.KeyValueTensorInitializer(
+                tf.constant(words, dtype=tf.string),
+                tf.constant([tokenizer.word_index[w] for w in words], dtype=tf.int32),
+            ),
+            default_value=oov_index,
+        )
+        filters = "".join(
+            {"\t": "\\t", "\n": "\\n"}.get(c, c if c.isalnum() else "\\" + c) for c in tokenizer.filters
+        )
+        maxlen = self.max_sequence_length
+        lower = tokenizer.lower
+        split = tokenizer.split
+
+        def tokenize(text, label):
+            if lower:
+                text = tf.strings.lower(text, encoding="utf-8")
+            if filters:
+                text = tf.strings.regex_replace(text, f"[{filters}]", split)
+            words = tf.strings.split(text, sep=split)
+            words = tf.boolean_mask(words, tf.strings.length(words) > 0)
+            ids = table.lookup(words)
+            ids = tf.boolean_mask(ids, ids >= 0)[:maxlen]
+            padded = tf.concat([tf.zeros([maxlen - tf.size(ids)], dtype=tf.int32), ids], axis=0)
+            padded.set_shape([maxlen])
+            return padded, label
+
+        return tokenize
+
+    def make_dataset(self, texts, labels, batch_size, shuffle=False, seed=None):
+        dataset = tf.data.Dataset.from_tensor_slices((tf.constant(texts, dtype=tf.string), labels))
+        dataset = dataset.map(self.make_tokenize_fn(), num_parallel_calls=tf.data.AUTOTUNE)
+        dataset = dataset.cache()
+        if shuffle:
+            dataset = dataset.shuffle(len(texts), seed=seed, reshuffle_each_iteration=True)
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    @staticmethod
+    def stratified_split(labels, validation_fraction, seed):
+        """Return train/validation indices holding out the same fraction of every class."""
+        rng = np.random.default_rng(seed)
+        train_idx, val_idx = [], []
+        for label in np.unique(labels):
+            idx = np.flatnonzero(labels == label)
+            rng.shuffle(idx)
+            # Classes with a single example stay in the training set
+            n_val = int(round(len(idx) * validation_fraction)) if len(idx) > 1 else 0
+            n_val = min(n_val, len(idx) - 1)
+            val_idx.extend(idx[:n_val])
+            train_idx.extend(idx[n_val:])
+        return np.array(sorted(train_idx), dtype=np.int64), np.array(sorted(val_idx), dtype=np.int64)
+
     def build_model(self, num_classes):
         self.model = Sequential([
             Embedding(self.vocab_size, self.embedding_dim, input_length=self.max_sequence_length),
@@ -56,21 +184,100 @@ class HealthAssistantModel:
             metrics=['accuracy']
         )
 
-    def train(self):
+    def expand_model(self, num_classes):
+        """Rebuild the network for the current vocabulary and class count, keeping the trained weights."""
+        embedding, dense_kernel, dense_bias, output_kernel, output_bias = self.model.get_weights()
+        self.build_model(num_classes)
+        self.model.build((None, self.max_sequence_length))
+        new_embedding, _, _, new_output_kernel, new_output_bias = self.model.get_weights()
+
+        # Known words and intents keep their rows/columns; new ones start from the fresh initialisation
+        new_embedding[:embedding.shape[0]] = embedding
+        new_output_kernel[:, :output_kernel.shape[1]] = output_kernel
+        new_output_bias[:output_bias.shape[0]] = output_bias
+        self.model.set_weights([new_embedding, dense_kernel, dense_bias, new_output_kernel, new_output_bias])
+
+    def fine_tune(self, new_data, replay_data=(), epochs=5, batch_size=32, learning_rate=1e-3, seed=42):
+        """Warm-start from the loaded weights and train a few epochs on new_data plus replay_data.
+
+        replay_data should be a small sample of the existing corpus so the
+        model does not forget intents that are missing from the delta. Cost
+        scales with len(new_data) + len(replay_data), not the corpus size.
+        """
+        tf.keras.utils.set_random_seed(seed)
+        tf.config.experimental.enable_op_determinism()
+        if not self.model or not self.tokenizer or not self.label_encoder:
+            self.load_model()
+
+        examples = list(new_data) + list(replay_data)
+        texts, labels, num_classes = self.extend_vocabulary(examples)
+        self.expand_model(num_classes)
+        self.model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+
+        dataset = self.make_dataset(texts, labels, batch_size, shuffle=True, seed=seed)
+        timer = EpochTimer(len(texts))
+        started = time.perf_counter()
+        history = self.model.fit(dataset, epochs=epochs, callbacks=[timer], verbose=2)
+        seconds = time.perf_counter() - started
+
+        return history.history, {
+            "accuracy": history.history['accuracy'][-1],
+            "loss": history.history['loss'][-1],
+            "epochs": len(timer.epochs),
+            "seconds": seconds,
+            "examples_per_sec": len(texts) * len(timer.epochs) / seconds if seconds else 0.0,
+            "new_examples": len(new_data),
+            "replay_examples": len(replay_data),
+        }
+
+    def train(self, epochs=100, batch_size=32, validation_fraction=0.2, patience=10,
+              seed=42, checkpoint_dir="checkpoints"):
+        # Seed Python, NumPy and TensorFlow and force deterministic kernels
+        tf.keras.utils.set_random_seed(seed)
+        tf.config.experimental.enable_op_determinism()
+
         # Get training data from MongoDB
         training_data = get_training_data()
         
-        # Preprocess data
-        X, y, num_classes = self.preprocess_data(training_data)
+        # Fit vocabulary and labels, then split every class the same way
+        texts, labels, num_classes = self.fit_vocabulary(training_data)
+        train_idx, val_idx = self.stratified_split(labels, validation_fraction, seed)
+        texts = np.array(texts, dtype=object)
+        train_ds = self.make_dataset(list(texts[train_idx]), labels[train_idx], batch_size, shuffle=True, seed=seed)
+        val_ds = None
+        if len(val_idx):
+            val_ds = self.make_dataset(list(texts[val_idx]), labels[val_idx], batch_size)
+        # A validation set with fewer than two examples per class is too noisy to stop on
+        monitor = "val_loss" if len(val_idx) >= 2 * num_classes else "loss"
         
         # Build and train model
         self.build_model(num_classes)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        timer = EpochTimer(len(train_idx))
+        started = time.perf_counter()
         history = self.model.fit(
-            X, y,
-            epochs=100,
-            validation_split=0.2,
-            verbose=1
+            train_ds,
+            validation_data=val_ds,
+            epochs=epochs,
+            callbacks=[
+                tf.keras.callbacks.EarlyStopping(
+                    monitor=monitor, patience=patience, min_delta=1e-4, restore_best_weights=True
+                ),
+                tf.keras.callbacks.ModelCheckpoint(
+                    os.path.join(checkpoint_dir, "best.weights.h5"),
+                    monitor=monitor,
+                    save_best_only=True,
+                    save_weights_only=True,
+                ),
+                timer,
+            ],
+            verbose=2
         )
+        seconds = time.perf_counter() - started
         
         # Save model and tokenizer
         self.save_model()
@@ -78,39 +285,51 @@ class HealthAssistantModel:
         # Return training metrics
         return history.history, {
             "accuracy": history.history['accuracy'][-1],
-            "loss": history.history['loss'][-1]
+            "loss": history.history['loss'][-1],
+            "epochs": len(timer.epochs),
+            "seconds": seconds,
+            "examples_per_sec": len(train_idx) * len(timer.epochs) / seconds if seconds else 0.0,
         }
 
     def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
         if not self.model or not self.tokenizer or not self.label_encoder:
             self.load_model()
         
-        # Preprocess input text
-        sequence = self.tokenizer.texts_to_sequences([text])
-        padded = pad_sequences(sequence, maxlen=self.max_sequence_length)
-        
-        # Get prediction
-        prediction = self.model.predict(padded)
-        predicted_class_idx = np.argmax(prediction, axis=1)[0]
-        
-        # Convert prediction to intent
-        reverse_label_encoder = {v: k for k, v in self.label_encoder.items()}
-        predicted_intent = reverse_label_encoder[predicted_class_idx]
+        # Preprocess all input texts in one pass
+        sequences = self.tokenizer.texts_to_sequences(texts)
+        padded = pad_sequences(sequences, maxlen=self.max_sequence_length)
         
-        # Get corresponding response
-        response = self.response_lookup.get(predicted_intent, "I'm not sure how to respond to that.")
+        # Get predictions for the whole batch; verbose=0 keeps Keras' progress bar out of stdout
+        predictions = self.model.predict(padded, verbose=0)
+        predicted_class_idxs = np.argmax(predictions, axis=1)
         
-        return {
-            "intent": predicted_intent,
-            "confidence": float(prediction[0][predicted_class_idx]),
-            "response": response
-        }
+        # Convert predictions to intents
+        intent_table = self.intent_table
+        results = []
+        for row, predicted_class_idx in zip(predictions, predicted_class_idxs):
+            predicted_intent = intent_table.tags[predicted_class_idx]
+            
+            # Get corresponding response
+            response = intent_table.first_response(predicted_class_idx) or "I'm not sure how to respond to that."
+            
+            results.append({
+                "intent": predicted_intent,
+                "confidence": float(row[predicted_class_idx]),
+                "response": response
+            })
+        return results
 
-    def save_model(self):
-        self.model.save(self.model_path)
-        with open(self.tokenizer_path, 'wb') as handle:
+    def save_model(self, directory=None):
+        model_path, tokenizer_path, label_encoder_path = self.model_path, self.tokenizer_path, self.label_encoder_path
+        if directory:
+            model_path, tokenizer_path, label_encoder_path, _ = self._artifact_paths(directory)
+        self.model.save(model_path)
+        with open(tokenizer_path, 'wb') as handle:
             pickle.dump(self.tokenizer, handle, protocol=pickle.HIGHEST_PROTOCOL)
-        with open(self.label_encoder_path, 'wb') as handle:
+        with open(label_encoder_path, 'wb') as handle:
             pickle.dump(
                 {
                     "label_encoder": self.label_encoder,
@@ -120,14 +339,54 @@ class HealthAssistantModel:
                 protocol=pickle.HIGHEST_PROTOCOL
             )
 
+    def export_numpy(self, path=None):
+        """Write the weights and tokenizer config for numpy_model.NumpyHealthModel."""
+        if not self.model or not self.tokenizer or not self.label_encoder:
+            self.load_model()
+
+        embedding, dense_kernel, dense_bias, output_kernel, output_bias = self.model.get_weights()
+        meta = {
+            "max_sequence_length": self.max_sequence_length,
+            "mask_zero": bool(self.model.layers[0].get_config().get("mask_zero", False)),
+            "tokenizer": {
+                "word_index": self.tokenizer.word_index,
+                "num_words": self.tokenizer.num_words,
+                "oov_token": self.tokenizer.oov_token,
+                "filters": self.tokenizer.filters,
+                "lower": self.tokenizer.lower,
+                "split": self.tokenizer.split,
+            },
+            "label_encoder": self.label_encoder,
+            "response_lookup": self.response_lookup,
+        }
+        np.savez(
+            path or self.numpy_weights_path,
+            embedding=embedding.astype(np.float32),
+            dense_kernel=dense_kernel.astype(np.float32),
+            dense_bias=dense_bias.astype(np.float32),
+            output_kernel=output_kernel.astype(np.float32),
+            output_bias=output_bias.astype(np.float32),
+            meta=np.array(json.dumps(meta)),
+        )
+
+    def publish(self, registry, metadata=None):
+        """Save all artifacts as a new version in a model_registry.ModelRegistry."""
+        def write(directory):
+            self.save_model(directory)
+            self.export_numpy(self._artifact_paths(directory)[3])
+        return registry.publish(write, metadata)
+
     def load_model(self):
         if os.path.exists(self.model_path):
             self.model = load_model(self.model_path)
+            # Incrementally retrained models may have grown past the default vocabulary
+            self.vocab_size = self.model.layers[0].input_dim
             with open(self.tokenizer_path, 'rb') as handle:
                 self.tokenizer = pickle.load(handle)
             with open(self.label_encoder_path, 'rb') as handle:
                 data = pickle.load(handle)
                 self.label_encoder = data["label_encoder"]
                 self.response_lookup = data["response_lookup"]
+            self.intent_table = IntentTable.from_label_encoder(self.label_encoder, self.response_lookup)
         else:
             raise FileNotFoundError("Model files not found. Please train the model first.")
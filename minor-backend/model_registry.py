@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+
+
+class ModelIntegrityError(Exception):
+    """A published model version is missing files or fails its checksums."""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path: str):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(data, handle, indent=2)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+class ModelRegistry:
+    """Directory-per-version store for trained model artifacts.
+
+    Each version is staged in a hidden directory, checksummed into a
+    manifest and renamed into place, so readers only ever see complete
+    versions. ``CURRENT`` names the active version plus the versions that
+    were active before it, which is what ``rollback`` walks back through.
+    """
+
+    def __init__(self, root: str = "model_registry"):
+        self.root = root
+
+    def _current_path(self) -> str:
+        return os.path.join(self.root, CURRENT_NAME)
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.root, version)
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith("v") and os.path.isfile(os.path.join(self.root, name, MANIFEST_NAME))
+        )
+
+    def _next_version(self) -> str:
+        numbers = [int(version[1:]) for version in self.versions() if version[1:].isdigit()]
+        return f"v{max(numbers, default=0) + 1:04d}"
+
+    def manifest(self, version: str) -> Dict[str, Any]:
+        with open(os.path.join(self.path(version), MANIFEST_NAME)) as handle:
+            return json.load(handle)
+
+    def publish(self, write: Callable[[str], None], metadata: Optional[Dict[str, Any]] = None,
+                activate: bool = True) -> str:
+        """Create a new version from the files ``write(directory)`` produces."""
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            write(staging)
+
+            files = {}
+            for name in sorted(os.listdir(staging)):
+                file_path = os.path.join(staging, name)
+                with open(file_path, "rb") as handle:
+                    os.fsync(handle.fileno())
+                files[name] = {"sha256": _sha256(file_path), "size": os.path.getsize(file_path)}
+
+            version = self._next_version()
+            _write_json_atomic(os.path.join(staging, MANIFEST_NAME), {
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "files": files,
+                "metadata": metadata or {},
+            })
+            os.rename(staging, self.path(version))
+            _fsync_dir(self.root)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def verify(self, version: str):
+        """Raise ModelIntegrityError unless every file matches the manifest."""
+        try:
+            manifest = self.manifest(version)
+        except (OSError, ValueError) as e:
+            raise ModelIntegrityError(f"Unreadable manifest for {version}: {e}")
+        for name, info in manifest["files"].items():
+            file_path = os.path.join(self.path(version), name)
+            if not os.path.isfile(file_path):
+                raise ModelIntegrityError(f"{version} is missing {name}")
+            if _sha256(file_path) != info["sha256"]:
+                raise ModelIntegrityError(f"Checksum mismatch for {name} in {version}")
+
+    def _read_current(self) -> Dict[str, Any]:
+        try:
+            with open(self._current_path()) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {"version": None, "history": []}
+
+    def current_version(self) -> Optional[str]:
+        return self._read_current()["version"]
+
+    def candidates(self) -> List[str]:
+        """The current version, then the previously active ones, newest first."""
+        current = self._read_current()
+        if current["version"] is None:
+            return []
+        return [current["version"]] + list(reversed(current["history"]))
+
+    def activate(self, version: str):
+        """Point CURRENT at a verified version."""
+        self.verify(version)
+        current = self._read_current()
+        history = list(current["history"])
+        if current["version"] and current["version"] != version:
+            history.append(current["version"])
+        _write_json_atomic(self._current_path(), {"version": version, "history": history})
+
+    def rollback(self) -> str:
+        """Reactivate the version that was active before the current one."""
+        current = self._read_current()
+        history = list(current["history"])
+        if not history:
+            raise ValueError("No previous model version to roll back to")
+        version = history.pop()
+        self.verify(version)
+        _write_json_atomic(self._current_path(), {"version": version, "history": history})
+        return version
+
+    def resolve(self, version: Optional[str] = None) -> Optional[str]:
+        """Return the verified directory of a version (default: the current one)."""
+        version = version or self.current_version()
+        if version is None:
+            return None
+        self.verify(version)
+        return self.path(version)
+
+
+def main(argv: List[str]):
+    import config
+
+    registry = ModelRegistry(config.MODEL_REGISTRY_DIR)
+    command = argv[0] if argv else "list"
+    if command == "list":
+        current = registry.current_version()
+        for version in registry.versions():
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  {registry.manifest(version)['created_at']}")
+    elif command == "current":
+        print(registry.current_version())
+    elif command == "activate" and len(argv) == 2:
+        registry.activate(argv[1])
+        print(f"Activated {argv[1]}")
+    elif command == "rollback":
+        print(f"Rolled back to {registry.rollback()}")
+    else:
+        print("Usage: python model_registry.py [list | current | activate <version> | rollback]")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
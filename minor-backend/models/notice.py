@@ -0,0 +1,4 @@
+from pydantic import BaseModel, Field
+
+class Notice(BaseModel):
+    message: str = Field(..., min_length=1, max_length=2000)
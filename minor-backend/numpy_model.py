@@ -0,0 +1,132 @@
+import json
+import os
+import numpy as np
+from utils.intent_table import IntentTable
+from utils.npz_mmap import load_npz_mmap
+
+DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+
+class NumpyTokenizer:
+    """Re-implementation of the Keras ``Tokenizer.texts_to_sequences`` path.
+
+    Built from the tokenizer config saved by ``HealthAssistantModel.export_numpy``
+    so the serving process never has to unpickle a Keras object.
+    """
+
+    def __init__(self, word_index, num_words=None, oov_token=None,
+                 filters=DEFAULT_FILTERS, lower=True, split=" "):
+        self.word_index = word_index
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.oov_token_index = word_index.get(oov_token) if oov_token is not None else None
+        self.lower = lower
+        self.split = split
+        self._translate_map = str.maketrans({c: split for c in filters})
+
+    def text_to_word_sequence(self, text):
+        if self.lower:
+            text = text.lower()
+        text = text.translate(self._translate_map)
+        return [word for word in text.split(self.split) if word]
+
+    def texts_to_sequences(self, texts):
+        sequences = []
+        for text in texts:
+            sequence = []
+            for word in self.text_to_word_sequence(text):
+                i = self.word_index.get(word)
+                if i is not None:
+                    if self.num_words and i >= self.num_words:
+                        if self.oov_token_index is not None:
+                            sequence.append(self.oov_token_index)
+                    else:
+                        sequence.append(i)
+                elif self.oov_token is not None:
+                    sequence.append(self.oov_token_index)
+            sequences.append(sequence)
+        return sequences
+
+
+def pad_sequences(sequences, maxlen):
+    """Pre-pad and pre-truncate like the Keras defaults used at prediction time."""
+    padded = np.zeros((len(sequences), maxlen), dtype=np.int32)
+    for row, sequence in enumerate(sequences):
+        if not sequence:
+            continue
+        trunc = sequence[-maxlen:]
+        padded[row, maxlen - len(trunc):] = trunc
+    return padded
+
+
+class NumpyHealthModel:
+    """Serves the exported Keras intent model with plain NumPy.
+
+    Reproduces Embedding -> GlobalAveragePooling1D -> Dense(relu) ->
+    Dense(softmax) from the weights in ``health_model.npz`` without importing
+    TensorFlow.
+    """
+
+    def __init__(self, weights_path="health_model.npz"):
+        self.weights_path = weights_path
+        self.embedding = None
+        self.tokenizer = None
+        self.label_encoder = None
+
+    def load_model(self):
+        if not os.path.exists(self.weights_path):
+            raise FileNotFoundError("Exported model weights not found. Run export_model.py first.")
+        # Memory-mapped read-only, so every worker process shares one copy of the weights
+        data = load_npz_mmap(self.weights_path)
+        self.embedding = data["embedding"]
+        self.dense_kernel = data["dense_kernel"]
+        self.dense_bias = data["dense_bias"]
+        self.output_kernel = data["output_kernel"]
+        self.output_bias = data["output_bias"]
+        meta = json.loads(str(data["meta"]))
+
+        self.max_sequence_length = meta["max_sequence_length"]
+        self.mask_zero = meta.get("mask_zero", False)
+        self.tokenizer = NumpyTokenizer(**meta["tokenizer"])
+        self.label_encoder = meta["label_encoder"]
+        self.response_lookup = meta["response_lookup"]
+        self.intent_table = IntentTable.from_label_encoder(self.label_encoder, self.response_lookup)
+
+    def forward(self, padded):
+        """Return class probabilities for a batch of padded token ids."""
+        embedded = self.embedding[padded]
+        if self.mask_zero:
+            mask = (padded != 0).astype(embedded.dtype)[:, :, None]
+            counts = np.maximum(mask.sum(axis=1), 1.0)
+            pooled = (embedded * mask).sum(axis=1) / counts
+        else:
+            pooled = embedded.mean(axis=1)
+        hidden = np.maximum(pooled @ self.dense_kernel + self.dense_bias, 0.0)
+        logits = hidden @ self.output_kernel + self.output_bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        if self.embedding is None:
+            self.load_model()
+
+        sequences = self.tokenizer.texts_to_sequences(texts)
+        padded = pad_sequences(sequences, self.max_sequence_length)
+        predictions = self.forward(padded)
+        predicted_class_idxs = np.argmax(predictions, axis=1)
+
+        intent_table = self.intent_table
+        results = []
+        for row, predicted_class_idx in zip(predictions, predicted_class_idxs):
+            predicted_intent = intent_table.tags[predicted_class_idx]
+            response = intent_table.first_response(predicted_class_idx) or "I'm not sure how to respond to that."
+            results.append({
+                "intent": predicted_intent,
+                "confidence": float(row[predicted_class_idx]),
+                "response": response
+            })
+        return results
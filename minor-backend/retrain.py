@@ -0,0 +1,132 @@
+"""Incrementally retrain the current model version on newly labeled examples.
+
+Instead of retraining from scratch like setup.py, this loads the current
+registry version and fine-tunes it for a few epochs on the examples labeled
+since that version was trained:
+
+* interactions a reviewer corrected (``corrected_intent``, ``corrected_at``
+  and optionally ``corrected_response`` set on the interaction record), which
+  are first folded into training_data so a later full retrain sees them too
+* training_data rows added or updated since then (e.g. by ingest.py)
+
+Unseen words and intents are appended to the tokenizer and label encoder
+without renumbering existing ones, and the embedding/output layers grow to
+match. A random replay sample of the existing corpus is mixed in so intents
+absent from the delta are not forgotten. The result is published as a new
+registry version.
+
+Usage:
+    python retrain.py
+    python retrain.py --epochs 10 --replay-ratio 2
+    python retrain.py --dry-run        # only report the size of the delta, write nothing
+"""
+import argparse
+import json
+from datetime import datetime
+
+import config
+from model_registry import ModelRegistry
+
+DEFAULT_EPOCHS = 5
+DEFAULT_REPLAY_RATIO = 1.0
+DEFAULT_LEARNING_RATE = 1e-3
+
+
+def watermarks(registry, version):
+    """Return (trained_through, corrections_through) for a version.
+
+    trained_through bounds the training_data rows the version has seen;
+    corrections_through bounds the interaction corrections already folded
+    into training_data. Versions from setup.py only record the former.
+    """
+    manifest = registry.manifest(version)
+    trained = datetime.fromisoformat(manifest["metadata"].get("trained_through") or manifest["created_at"])
+    corrected = manifest["metadata"].get("corrections_through")
+    return trained, datetime.fromisoformat(corrected) if corrected else trained
+
+
+def fold_corrections(since, response_lookup, write=True):
+    """Upsert interactions corrected after since into training_data.
+
+    Returns the row count and the newest ``corrected_at`` read (since if
+    there was none), which bounds exactly what this call consumed.
+    """
+    from database import iter_corrected_interactions, upsert_training_data
+
+    rows = {}
+    through = since
+    for interaction in iter_corrected_interactions(since):
+        corrected_at = interaction.get("corrected_at")
+        if corrected_at is not None and (through is None or corrected_at > through):
+            through = corrected_at
+        text = (interaction.get("query") or "").strip()
+        intent = interaction["corrected_intent"]
+        if text and intent:
+            response = interaction.get("corrected_response") or response_lookup.get(intent, "")
+            rows[(text, intent)] = {"text": text, "intent": intent, "response": response}
+    if write:
+        upsert_training_data(list(rows.values()))
+    return len(rows), through
+
+
+def retrain(epochs=DEFAULT_EPOCHS, replay_ratio=DEFAULT_REPLAY_RATIO, learning_rate=DEFAULT_LEARNING_RATE,
+            since=None, dry_run=False):
+    from database import ensure_training_data_indexes, iter_training_data, sample_training_data
+    from model import HealthAssistantModel
+
+    registry = ModelRegistry(config.MODEL_REGISTRY_DIR)
+    version = registry.current_version()
+    if version is None:
+        raise SystemExit("No current model version; run setup.py for the initial training first.")
+    trained, corrected = watermarks(registry, version)
+    if since:
+        trained = corrected = since
+
+    model = HealthAssistantModel(model_dir=registry.resolve(version))
+    model.load_model()
+    ensure_training_data_indexes()
+
+    # The corrections watermark is the newest one folded, so a correction
+    # written during the run is folded by this run or the next, never both.
+    # The training_data cutoff is taken before its read for the same reason.
+    corrections, corrections_through = fold_corrections(corrected, model.response_lookup, write=not dry_run)
+    cutoff = datetime.utcnow()
+    new_data = list(iter_training_data({"updated_at": {"$gt": trained, "$lte": cutoff}}))
+    stats = {"base_version": version, "since": trained.isoformat(), "corrections": corrections,
+             "new_examples": len(new_data)}
+    if not new_data or dry_run:
+        return stats
+
+    replay_data = sample_training_data(int(len(new_data) * replay_ratio))
+    _, model_info = model.fine_tune(new_data, replay_data, epochs=epochs, learning_rate=learning_rate)
+
+    metadata = {name: float(value) for name, value in model_info.items()}
+    metadata.update({
+        "base_version": version,
+        "trained_through": cutoff.isoformat(),
+        "corrections_through": corrections_through.isoformat(),
+    })
+    stats["version"] = model.publish(registry, metadata=metadata)
+    stats.update(model_info)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the current model on newly labeled examples.")
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    parser.add_argument("--replay-ratio", type=float, default=DEFAULT_REPLAY_RATIO,
+                        help="replayed corpus examples per new example")
+    parser.add_argument("--learning-rate", type=float, default=DEFAULT_LEARNING_RATE)
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="ISO timestamp to read from (default: when the current version was trained)")
+    parser.add_argument("--dry-run", action="store_true", help="report the delta without training")
+    args = parser.parse_args()
+
+    stats = retrain(args.epochs, args.replay_ratio, args.learning_rate, args.since, args.dry_run)
+    if not stats["new_examples"]:
+        print(f"No new labeled examples since {stats['since']}; {stats['base_version']} is up to date.")
+    print(json.dumps(stats, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Nearest-pattern intent backend on top of utils.pattern_index.PatternIndex.
+
+The index is built from the intent catalog the first time the backend loads
+and can grow afterwards without a rebuild; running servers pick up added
+patterns within ``refresh_interval`` seconds.
+
+Usage:
+    python retrieval_model.py search "I keep getting headaches" -k 5
+    python retrieval_model.py add patterns.jsonl     # lines of {"text", "tag"}
+    python retrieval_model.py train-ivf 256          # partition large indexes
+"""
+import argparse
+import json
+import time
+from utils.intent_table import IntentTable
+from utils.pattern_index import PatternIndex
+
+DEFAULT_RESPONSE = "I'm not sure how to respond to that. Could you please rephrase your question?"
+
+
+class RetrievalHealthModel:
+    """Answers with the intent of the most similar stored pattern.
+
+    The confidence is the cosine similarity to that pattern; below
+    ``reject_threshold`` the query is answered as ``default_tag``.
+    """
+
+    def __init__(self, index_dir="pattern_index", intents=None, reject_threshold=0.4, nprobe=4,
+                 default_tag="default", refresh_interval=1.0):
+        self.index_dir = index_dir
+        self.intents = intents
+        self.reject_threshold = reject_threshold
+        self.nprobe = nprobe
+        self.default_tag = default_tag
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self._refreshed_at = float("-inf")
+
+    def load_model(self):
+        if self.intents is None:
+            from insert_data import healthcare_data
+            self.intents = healthcare_data["intents"]
+        self.intent_table = IntentTable.from_intents(self.intents)
+        index = PatternIndex(self.index_dir)
+        if not len(index):
+            # Every worker starting on an empty index gets here; only the first one writes
+            index.seed((pattern, intent["tag"]) for intent in self.intents for pattern in intent["patterns"])
+        self.index = index
+        self._refreshed_at = time.monotonic()
+
+    def nearest(self, texts, k=5):
+        """Return the k nearest patterns with scores for every text."""
+        if self.index is None:
+            self.load_model()
+        now = time.monotonic()
+        if now - self._refreshed_at >= self.refresh_interval:
+            self.index.refresh()
+            self._refreshed_at = now
+        return self.index.search_batch(texts, k, self.nprobe)
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        nearest = self.nearest(texts, k=1)
+        intent_table = self.intent_table
+        results = []
+        for hits in nearest:
+            best = hits[0] if hits else None
+            intent_id = intent_table.lookup(best["tag"]) if best else None
+            if best is None or best["score"] < self.reject_threshold:
+                results.append({"response": DEFAULT_RESPONSE, "intent": self.default_tag,
+                                "confidence": best["score"] if best else 0.0})
+                continue
+            response = intent_table.choose_response(intent_id) if intent_id is not None else None
+            results.append({
+                "response": response or DEFAULT_RESPONSE,
+                "intent": best["tag"],
+                "confidence": best["score"]
+            })
+        return results
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description="Manage the nearest-pattern retrieval index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    search = subparsers.add_parser("search")
+    search.add_argument("text")
+    search.add_argument("-k", type=int, default=5)
+    add = subparsers.add_parser("add")
+    add.add_argument("path", help="JSONL file of {\"text\", \"tag\"} lines")
+    train = subparsers.add_parser("train-ivf")
+    train.add_argument("nlist", type=int)
+    args = parser.parse_args()
+
+    model = RetrievalHealthModel(config.RETRIEVAL_INDEX_DIR, nprobe=config.RETRIEVAL_NPROBE)
+    model.load_model()
+    if args.command == "search":
+        for hit in model.nearest([args.text], args.k)[0]:
+            print(f"{hit['score']:.3f}  {hit['tag']:<20} {hit['text']}")
+    elif args.command == "add":
+        with open(args.path) as handle:
+            rows = [json.loads(line) for line in handle if line.strip()]
+        model.index.add((row["text"], row["tag"]) for row in rows)
+        print(f"Added {len(rows)} patterns; the index now holds {len(model.index)}")
+    else:
+        model.index.train_ivf(args.nlist)
+        print(f"Partitioned {len(model.index)} patterns into {args.nlist} lists")
+
+
+if __name__ == "__main__":
+    main()
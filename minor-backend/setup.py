@@ -1,20 +1,37 @@
 from insert_data import main as insert_data
 from model import HealthAssistantModel
+from model_registry import ModelRegistry
+import config
 import time
+from datetime import datetime
 
 def setup():
     print("Step 1: Inserting health data into MongoDB...")
     insert_data()
     
+    # Rows written after this point are picked up by the next retrain.py run
+    trained_through = datetime.utcnow()
+
     print("\nStep 2: Initializing the health assistant model...")
     model = HealthAssistantModel()
     
     print("\nStep 3: Training the model...")
     history, model_info = model.train()
     
+    print("\nStep 4: Exporting weights for NumPy serving...")
+    model.export_numpy()
+    
+    print("\nStep 5: Publishing the model to the registry...")
+    metrics = {name: float(value) for name, value in model_info.items()}
+    metrics["trained_through"] = trained_through.isoformat()
+    version = model.publish(ModelRegistry(config.MODEL_REGISTRY_DIR), metadata=metrics)
+    print(f"Published and activated model version {version}")
+    
     print("\nTraining completed!")
     print(f"Model accuracy: {model_info['accuracy']:.2%}")
     print(f"Model loss: {model_info['loss']:.4f}")
+    print(f"Trained {model_info['epochs']} epochs in {model_info['seconds']:.1f}s "
+          f"({model_info['examples_per_sec']:.0f} examples/sec)")
     
     print("\nSetup complete! You can now run 'main.py' to start the API server.")
 
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from utils import codec
+from utils.codec import CODECS, JSON, ResponseFrames, negotiate
+
+RESULT = {"response": "Rest.\n\n\"Drink\" fluids — ok", "intent": "fever", "confidence": 0.875}
+
+
+def test_negotiate():
+    assert negotiate([]) == (JSON, None)
+    assert negotiate(["cbor", " JSON "]) == (JSON, "json")
+    if "msgpack" in CODECS:
+        assert negotiate(["msgpack", "json"]) == (CODECS["msgpack"], "msgpack")
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_round_trip(name):
+    assert CODECS[name].decode(CODECS[name].encode(RESULT)) == RESULT
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_response_frames_match_plain_encoding(name):
+    frames = ResponseFrames()
+    frames.add_catalog([{"tag": "fever", "responses": [RESULT["response"]]}])
+    selected = CODECS[name]
+
+    frame = frames.encode(selected, RESULT)
+    assert selected.decode(frame) == RESULT
+    assert frames.hits == 1
+
+    other = dict(RESULT, response="Not in the catalog")
+    assert selected.decode(frames.encode(selected, other)) == other
+    assert frames.misses == 1
+
+
+def test_response_frames_fall_back_for_extra_keys():
+    frames = ResponseFrames()
+    frames.add("fever", RESULT["response"])
+    result = dict(RESULT, stream="1")
+    assert json.loads(frames.encode(JSON, result)) == result
+    assert frames.stats()["misses"] == 1
+
+
+def test_json_codec_without_orjson(monkeypatch):
+    monkeypatch.setattr(codec, "orjson", None)
+    assert JSON.decode(JSON.encode(RESULT)) == RESULT
@@ -0,0 +1,45 @@
+from utils.intent_matcher import AhoCorasick, IntentMatcher
+
+INTENTS = [
+    {"tag": "greeting", "patterns": ["Hello", "Good morning"]},
+    {"tag": "headache", "patterns": ["I have a headache", "My head hurts"]},
+    {"tag": "fever", "patterns": ["I have a fever", "high temperature"]},
+]
+
+
+def test_best_match_returns_lowest_rank_found():
+    automaton = AhoCorasick(["she", "he", "hers"])
+    assert automaton.best_match("ushers") == 0
+    assert automaton.best_match("the") == 1
+    assert automaton.best_match("xyz") is None
+
+
+def test_best_match_agrees_with_substring_scan():
+    patterns = ["ab", "bc", "abcd", "cd", "d"]
+    automaton = AhoCorasick(patterns)
+    for text in ["abcd", "bcd", "xcd", "zzd", "a", ""]:
+        expected = next((rank for rank, pattern in enumerate(patterns) if pattern in text), None)
+        assert automaton.best_match(text) == expected
+
+
+def test_empty_pattern_matches_everything():
+    assert AhoCorasick(["", "a"]).best_match("zzz") == 0
+
+
+def test_match_by_pattern_substring():
+    matcher = IntentMatcher(INTENTS)
+    assert matcher.match("Well, I have a headache today") == "headache"
+    assert matcher.pattern_match("HELLO there") == "greeting"
+
+
+def test_match_falls_back_to_word_overlap_then_default():
+    matcher = IntentMatcher(INTENTS, default_tag="unknown")
+    assert matcher.match("temperature check") == "fever"
+    assert matcher.pattern_match("temperature check") is None
+    assert matcher.match("nothing relevant") == "unknown"
+
+
+def test_word_overlap_prefers_earlier_intent():
+    matcher = IntentMatcher(INTENTS)
+    # "have" is in both headache and fever patterns
+    assert matcher.match("i have something") == "headache"
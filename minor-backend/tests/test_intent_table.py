@@ -0,0 +1,54 @@
+import pytest
+
+from utils.intent_table import IntentTable
+
+INTENTS = [
+    {"tag": "greeting", "patterns": ["Hi"], "responses": ["Hello!", "Hi there!"]},
+    {"tag": "fever", "patterns": ["fever"], "responses": ["Rest and drink fluids."]},
+    {"tag": "silent", "patterns": ["..."], "responses": []},
+]
+
+
+def test_from_intents_indexes_by_class_id():
+    table = IntentTable.from_intents(INTENTS)
+    assert len(table) == 3
+    assert table.tags == ("greeting", "fever", "silent")
+    assert table.lookup("fever") == 1
+    assert table.lookup("missing") is None
+    assert table.first_response(1) == "Rest and drink fluids."
+
+
+def test_choose_response():
+    table = IntentTable.from_intents(INTENTS)
+    assert table.choose_response(0) in ("Hello!", "Hi there!")
+    assert table.choose_response(1) == "Rest and drink fluids."
+    assert table.choose_response(2) is None
+    assert table.first_response(2) is None
+
+
+def test_is_immutable():
+    table = IntentTable.from_intents(INTENTS)
+    with pytest.raises(AttributeError):
+        table.tags = ()
+    with pytest.raises(TypeError):
+        table.tag_to_id["new"] = 3
+
+
+def test_version_follows_content():
+    table = IntentTable.from_intents(INTENTS)
+    assert IntentTable.from_intents(INTENTS).version == table.version
+    changed = [dict(INTENTS[0], responses=["Hey"])] + INTENTS[1:]
+    assert IntentTable.from_intents(changed).version != table.version
+
+
+def test_mismatched_lengths():
+    with pytest.raises(ValueError):
+        IntentTable(["a", "b"], [["x"]])
+
+
+def test_from_label_encoder():
+    table = IntentTable.from_label_encoder({"fever": 1, "greeting": 0}, {"greeting": "Hello!"})
+    assert table.tags == ("greeting", "fever")
+    assert table.responses == (("Hello!",), ())
+    with pytest.raises(ValueError):
+        IntentTable.from_label_encoder({"a": 0, "b": 2}, {})
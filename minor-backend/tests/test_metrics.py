@@ -0,0 +1,57 @@
+import pytest
+
+from utils.metrics import MetricsRegistry
+
+
+def test_counter():
+    registry = MetricsRegistry()
+    replies = registry.counter("replies_total", "Replies sent", ["intent"])
+    replies.inc("fever")
+    replies.inc("fever", amount=2)
+    assert replies.value("fever") == 3
+    assert replies.value("greeting") == 0
+    assert 'replies_total{intent="fever"} 3.0' in registry.render()
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=[0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value)
+    assert latency.count() == 4
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 2.65",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_gauge_reads_at_render():
+    registry = MetricsRegistry()
+    value = [1]
+    registry.gauge("connections", "Open connections", lambda: value[0])
+    value[0] = 7
+    assert "connections 7.0" in registry.render()
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("c", "doc", ["name"]).inc('a"b\\c\nd')
+    assert 'c{name="a\\"b\\\\c\\nd"} 1.0' in registry.render()
+
+
+def test_registering_again_returns_the_same_metric():
+    registry = MetricsRegistry()
+    counter = registry.counter("c", "doc", ["intent"])
+    assert registry.counter("c", "doc", ["intent"]) is counter
+    gauge = registry.gauge("g", "doc", lambda: 1)
+    assert registry.gauge("g", "doc", lambda: 2) is gauge
+    assert "g 2.0" in registry.render()
+    with pytest.raises(ValueError):
+        registry.histogram("c", "doc", ["intent"])
+    with pytest.raises(ValueError):
+        registry.counter("c", "doc", ["other"])
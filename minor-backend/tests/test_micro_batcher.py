@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from utils.inference_executor import InferenceOverloaded
+from utils.metrics import Histogram
+from utils.micro_batcher import MicroBatcher
+
+
+async def echo_batch(texts):
+    await asyncio.sleep(0)
+    return [{"text": text, "batch": len(texts)} for text in texts]
+
+
+def test_coalesces_concurrent_predictions():
+    sizes = Histogram("batch_size", "doc", buckets=[1, 2, 4])
+
+    async def run():
+        batcher = MicroBatcher(echo_batch, max_batch_size=4, max_wait_ms=50, batch_size=sizes)
+        batcher.start()
+        results = await asyncio.gather(*(batcher.predict(str(i)) for i in range(6)))
+        await batcher.stop()
+        return batcher.stats(), results
+
+    stats, results = asyncio.run(run())
+    assert [result["text"] for result in results] == [str(i) for i in range(6)]
+    assert [result["batch"] for result in results] == [4, 4, 4, 4, 2, 2]
+    assert stats["batch_size_counts"] == {2: 1, 4: 1}
+    assert sizes.count() == 2
+
+
+def test_rejects_past_max_pending():
+    async def run():
+        release = asyncio.Event()
+
+        async def slow_batch(texts):
+            await release.wait()
+            return [{} for _ in texts]
+
+        batcher = MicroBatcher(slow_batch, max_wait_ms=0, max_pending=2, queue_timeout=0.01)
+        batcher.start()
+        waiting = [asyncio.ensure_future(batcher.predict("a")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(InferenceOverloaded):
+            await batcher.predict("b")
+        stats = batcher.stats()
+        release.set()
+        await asyncio.gather(*waiting)
+        await batcher.stop()
+        return stats, batcher.stats()
+
+    during, after = asyncio.run(run())
+    assert (during["pending"], during["rejected"]) == (2, 1)
+    assert after["pending"] == 0
+
+
+def test_batch_errors_reach_every_caller():
+    async def broken(texts):
+        raise RuntimeError("model failed")
+
+    async def run():
+        batcher = MicroBatcher(broken, max_wait_ms=10)
+        batcher.start()
+        results = await asyncio.gather(batcher.predict("a"), batcher.predict("b"), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
@@ -0,0 +1,48 @@
+import os
+
+from utils import pattern_index
+from utils.pattern_index import META_NAME, GenerationWatcher, index_generation
+
+
+def commit(directory, text):
+    # Same as an index commit: meta.json is replaced by rename
+    path = os.path.join(directory, META_NAME)
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def test_index_generation_changes_on_commit(tmp_path):
+    assert index_generation(str(tmp_path)) == "empty"
+    commit(str(tmp_path), "1")
+    first = index_generation(str(tmp_path))
+    commit(str(tmp_path), "2")
+    assert index_generation(str(tmp_path)) not in ("empty", first)
+
+
+def test_watcher_adopts_a_generation_after_an_interval(tmp_path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(pattern_index.time, "monotonic", lambda: now[0])
+    directory = str(tmp_path)
+    commit(directory, "1")
+    watcher = GenerationWatcher(directory, interval=1.0)
+    first = watcher.generation()
+
+    commit(directory, "2")
+    second = index_generation(directory)
+    # Not stat-ed again within the interval
+    now[0] = 0.5
+    assert watcher.generation() == first
+    # Seen for the first time, still pending
+    now[0] = 1.0
+    assert watcher.generation() == first
+    now[0] = 2.0
+    assert watcher.generation() == second
+
+
+def test_watcher_without_interval_follows_every_commit(tmp_path):
+    directory = str(tmp_path)
+    watcher = GenerationWatcher(directory, interval=0)
+    assert watcher.generation() == "empty"
+    commit(directory, "1")
+    assert watcher.generation() == index_generation(directory)
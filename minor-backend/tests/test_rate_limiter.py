@@ -0,0 +1,44 @@
+from utils import rate_limiter
+from utils.rate_limiter import KeyedRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_refill(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    limiter = KeyedRateLimiter(attempts=2, window_seconds=10)
+
+    assert limiter.acquire("ann") == 0
+    assert limiter.acquire("ann") == 0
+    assert limiter.acquire("ann") == 5.0
+    # Other keys have their own bucket
+    assert limiter.acquire("bob") == 0
+
+    clock.now += 5
+    assert limiter.acquire("ann") == 0
+    assert limiter.stats() == {"enabled": True, "keys": 2, "allowed": 4, "limited": 1}
+
+
+def test_evicts_least_recently_used_key():
+    limiter = KeyedRateLimiter(attempts=1, window_seconds=60, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("c")
+    assert limiter.stats()["keys"] == 2
+    # "a" was evicted and starts again with a full bucket
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("c") > 0
+
+
+def test_disabled_allows_everything():
+    for limiter in (KeyedRateLimiter(attempts=0), KeyedRateLimiter(window_seconds=0)):
+        assert not limiter.enabled
+        assert all(limiter.acquire("ann") == 0 for _ in range(10))
+        assert limiter.stats()["keys"] == 0
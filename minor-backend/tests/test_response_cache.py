@@ -0,0 +1,66 @@
+from utils import response_cache
+from utils.response_cache import ResponseCache
+
+
+def test_hit_after_put_with_normalized_key():
+    cache = ResponseCache()
+    assert cache.get("Hello") is None
+    cache.put("Hello", "greeting", 0.9, ("Hi!",))
+    assert cache.get("  hello ") == {"response": "Hi!", "intent": "greeting", "confidence": 0.9}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_hits_choose_among_responses():
+    cache = ResponseCache()
+    cache.put("hi", "greeting", 1.0, ("a", "b"))
+    assert {cache.get("hi")["response"] for _ in range(50)} <= {"a", "b"}
+
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "x", 1.0, ("r",))
+    cache.put("b", "x", 1.0, ("r",))
+    cache.get("a")
+    cache.put("c", "x", 1.0, ("r",))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget():
+    cache = ResponseCache(max_entries=100, max_bytes=600)
+    for query in ("one", "two", "three", "four"):
+        cache.put(query, "x", 1.0, ("r",))
+    assert cache.bytes_used <= 600
+    assert cache.stats()["entries"] < 4
+
+
+def test_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=10)
+    cache.put("hi", "greeting", 1.0, ("r",))
+    now[0] = 9.9
+    assert cache.get("hi") is not None
+    now[0] = 20.0
+    assert cache.get("hi") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.bytes_used == 0
+
+
+def test_version_change_clears():
+    cache = ResponseCache()
+    cache.ensure_version("v1")
+    cache.put("hi", "greeting", 1.0, ("r",))
+    cache.ensure_version("v1")
+    assert cache.get("hi") is not None
+    cache.ensure_version("v2")
+    assert cache.get("hi") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_disabled_with_no_entries():
+    cache = ResponseCache(max_entries=0)
+    cache.put("hi", "greeting", 1.0, ("r",))
+    assert cache.get("hi") is None
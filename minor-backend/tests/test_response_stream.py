@@ -0,0 +1,69 @@
+import asyncio
+
+from utils.response_stream import ResponseStreamer, split_sections
+
+TEXT = "Causes:\n- stress\n- dehydration\n\nSeek care if:\n- it lasts days\n\nRest."
+
+
+def test_split_sections_at_blank_lines():
+    assert split_sections(TEXT) == ["Causes:\n- stress\n- dehydration\n\n", "Seek care if:\n- it lasts days\n\n", "Rest."]
+
+
+def test_split_sections_respects_max_chars():
+    for max_chars in (1, 5, 12, 20, 100):
+        chunks = split_sections(TEXT, max_chars)
+        assert "".join(chunks) == TEXT
+        assert all(0 < len(chunk) <= max_chars for chunk in chunks)
+
+
+def test_chunks_are_cached_for_catalog_responses():
+    streamer = ResponseStreamer(max_chunk_chars=20)
+    streamer.add_catalog([{"tag": "headache", "responses": [TEXT]}])
+    assert streamer.chunks(TEXT) is streamer.chunks(TEXT)
+    assert "".join(streamer.chunks("other text")) == "other text"
+
+
+def test_connection_streams():
+    async def run():
+        streamer = ResponseStreamer(max_active=2)
+        streams = streamer.connection()
+        release = asyncio.Event()
+
+        async def wait():
+            await release.wait()
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        assert streams.start("1", wait())
+        assert not streams.start("1", wait())
+        assert streams.start("2", fail())
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert streams.start("3", wait())
+        assert not streams.start("4", wait())
+
+        assert streams.cancel("3")
+        assert not streams.cancel("3")
+        release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return streamer.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["started"], stats["completed"], stats["failed"]) == (3, 1, 1)
+    assert (stats["cancelled"], stats["rejected"]) == (1, 2)
+
+
+def test_cancel_all():
+    async def run():
+        streamer = ResponseStreamer()
+        streams = streamer.connection()
+        streams.start(streams.next_id(), asyncio.sleep(10))
+        streams.start(streams.next_id(), asyncio.sleep(10))
+        streams.cancel_all()
+        await asyncio.sleep(0)
+        return streamer.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["cancelled"], stats["completed"]) == (2, 0)
@@ -0,0 +1,92 @@
+import asyncio
+
+from utils import session_context
+from utils.session_context import ContextResolver, SessionContextStore
+
+INTENTS = [
+    {"tag": "greeting", "patterns": ["Hi", "Hello"]},
+    {"tag": "diabetes", "patterns": ["What causes diabetes", "Is diabetes hereditary", "diabetes symptoms"]},
+    {"tag": "hypertension", "patterns": ["high blood pressure", "How to lower blood pressure"]},
+    {"tag": "prevention", "patterns": ["How do I prevent it", "How to avoid getting sick"]},
+]
+
+
+def test_record_keeps_a_window():
+    store = SessionContextStore(window=2)
+    store.record("s", "greeting")
+    store.record("s", "diabetes", ["diabetes"])
+    context = store.record("s", "prevention", ["diabetes", "hypertension"])
+    assert context.intents == ("diabetes", "prevention")
+    assert context.entities == ("diabetes", "hypertension")
+    assert context.topic == "hypertension"
+
+
+def test_expire_and_evict(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(session_context.time, "monotonic", lambda: now[0])
+    store = SessionContextStore(ttl_seconds=10, max_sessions=2)
+    store.record("a", "greeting")
+    now[0] = 5.0
+    store.record("b", "greeting")
+    store.record("c", "greeting")
+    assert store.get("a") is None
+    assert store.stats()["evicted"] == 1
+    now[0] = 15.5
+    assert store.get("b") is None
+    assert store.get("c") is None
+    assert store.stats()["expired"] == 2
+    assert len(store) == 0
+
+
+def test_release_and_restore_through_save_and_load():
+    saved = {}
+
+    async def save(session, document):
+        saved[session] = document
+
+    async def load(session):
+        return saved.get(session)
+
+    async def run():
+        first = SessionContextStore(save=save, load=load)
+        first.record("s", "diabetes", ["diabetes"])
+        first.release("s")
+        await asyncio.sleep(0)
+
+        second = SessionContextStore(save=save, load=load)
+        context = await second.restore("s")
+        return first.stats(), second.stats(), context
+
+    first_stats, second_stats, context = asyncio.run(run())
+    assert saved["s"] == {"intents": ["diabetes"], "entities": ["diabetes"]}
+    assert first_stats["spilled"] == 1
+    assert second_stats["restored"] == 1
+    assert context.topic == "diabetes"
+
+
+def test_restore_survives_load_errors():
+    async def load(session):
+        raise ConnectionError("down")
+
+    store = SessionContextStore(load=load)
+    assert asyncio.run(store.restore("s")) is None
+
+
+def test_entities_of_a_query():
+    resolver = ContextResolver(INTENTS)
+    assert resolver.entities("Is high blood pressure linked to diabetes?") == ["hypertension", "diabetes"]
+    assert resolver.entities("hello") == []
+
+
+def test_resolves_follow_up_to_session_topic():
+    resolver = ContextResolver(INTENTS)
+    store = SessionContextStore()
+    context = store.record("s", "diabetes", resolver.entities("What causes diabetes"))
+
+    assert resolver.resolve("what makes it worse", "greeting", context) == "diabetes"
+    # Keeps the intent without a reference word, an entity of its own, or a session
+    assert resolver.resolve("what makes things worse", "greeting", context) is None
+    assert resolver.resolve("does it affect blood pressure", "greeting", context) is None
+    assert resolver.resolve("what makes it worse", "greeting", None) is None
+    # A whole catalog pattern is evidence for the intent
+    assert resolver.resolve("How do I prevent it", "prevention", context) is None
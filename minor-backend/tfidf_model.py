@@ -0,0 +1,81 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+from scipy import sparse
+from utils.intent_table import IntentTable
+
+DEFAULT_RESPONSE = "I'm not sure how to respond to that. Could you please rephrase your question?"
+
+
+class TfidfHealthModel:
+    """Classifies queries by cosine similarity to TF-IDF intent centroids.
+
+    Every catalog pattern is vectorised with character n-grams inside word
+    boundaries, which tolerates typos and word order. The L2-normalised mean
+    of an intent's patterns is its centroid, so a whole batch is scored with
+    one sparse matmul and the confidence is a real similarity in [0, 1].
+    Queries scoring below ``reject_threshold`` are answered as ``default_tag``.
+    """
+
+    def __init__(self, intents=None, reject_threshold=0.2, ngram_range=(3, 5), default_tag="default"):
+        self.intents = intents
+        self.reject_threshold = reject_threshold
+        self.ngram_range = ngram_range
+        self.default_tag = default_tag
+        self.vectorizer = None
+        self.centroids = None
+
+    def load_model(self):
+        if self.intents is None:
+            from insert_data import healthcare_data
+            self.intents = healthcare_data["intents"]
+        self.intent_table = IntentTable.from_intents(self.intents)
+
+        texts = [pattern for intent in self.intents for pattern in intent["patterns"]]
+        labels = np.array([
+            self.intent_table.lookup(intent["tag"])
+            for intent in self.intents
+            for _ in intent["patterns"]
+        ])
+        vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=self.ngram_range, sublinear_tf=True)
+        patterns = vectorizer.fit_transform(texts)
+
+        # Average each intent's pattern rows with one sparse matmul, then normalise
+        membership = sparse.csr_matrix(
+            (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+            shape=(len(self.intent_table.tags), len(labels)),
+        )
+        counts = np.maximum(np.asarray(membership.sum(axis=1)), 1.0)
+        centroids = normalize(sparse.csr_matrix(membership.multiply(1.0 / counts)) @ patterns)
+
+        # Stored transposed so scoring is queries @ centroids
+        self.centroids = sparse.csc_matrix(centroids.T)
+        self.vectorizer = vectorizer
+
+    def scores(self, texts):
+        """Return the (len(texts), n_intents) cosine similarity matrix."""
+        if self.vectorizer is None:
+            self.load_model()
+        return (self.vectorizer.transform(texts) @ self.centroids).toarray()
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        scores = self.scores(texts)
+        best = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(texts)), best]
+
+        intent_table = self.intent_table
+        results = []
+        for intent_id, confidence in zip(best, confidences):
+            if confidence < self.reject_threshold:
+                results.append({"response": DEFAULT_RESPONSE, "intent": self.default_tag,
+                                "confidence": float(confidence)})
+                continue
+            results.append({
+                "response": intent_table.choose_response(intent_id),
+                "intent": intent_table.tags[intent_id],
+                "confidence": float(confidence)
+            })
+        return results
@@ -1,38 +1,96 @@
-from passlib.context import CryptContext
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from fastapi import HTTPException, status
+import time
+from typing import Any, Dict, Optional, Tuple
+from jose import JWTError, jwk, jwt
 
 # Security configurations
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = "your-secret-key-here"  # Change this to a secure secret key in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def verify_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+
+def parse_keys(spec: str) -> Dict[str, str]:
+    """Parse "kid:secret,kid:secret" into an ordered kid -> secret dict."""
+    keys = {}
+    for item in spec.split(","):
+        kid, _, secret = item.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret
+    return keys
+
+
+class TokenAuthority:
+    """Issues and verifies access tokens under a set of keys named by ``kid``.
+
+    New tokens are signed with the first key and carry its ``kid`` in the
+    header; any listed key verifies, so a new key can be put first while
+    the previous one keeps accepting tokens it signed until they expire.
+    Tokens without a ``kid`` (issued before rotation) use the first key.
+
+    Key objects are built once instead of on every decode, and verified
+    tokens are remembered in an LRU of ``cache_size`` entries until their
+    ``exp``, so a reconnecting client costs a dict lookup. Only tokens with
+    an ``exp`` and a ``sub`` are accepted.
+    """
+
+    def __init__(self, keys: Dict[str, str], algorithm: str = ALGORITHM,
+                 expire_minutes: float = ACCESS_TOKEN_EXPIRE_MINUTES, cache_size: int = 10000):
+        if not keys:
+            raise ValueError("TokenAuthority needs at least one key")
+        self.algorithm = algorithm
+        self.expire_minutes = expire_minutes
+        self.cache_size = cache_size
+        self.signing_kid, self._signing_secret = next(iter(keys.items()))
+        self._keys = {kid: jwk.construct(secret, algorithm) for kid, secret in keys.items()}
+        # token -> (claims, exp)
+        self._verified: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    def issue(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
+        to_encode = data.copy()
+        to_encode["exp"] = datetime.utcnow() + (expires_delta or timedelta(minutes=self.expire_minutes))
+        return jwt.encode(to_encode, self._signing_secret, algorithm=self.algorithm,
+                          headers={"kid": self.signing_kid})
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims (shared, don't modify) or raise JWTError."""
+        entry = self._verified.get(token)
+        if entry is not None:
+            if entry[1] > time.time():
+                self._verified.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            del self._verified[token]
+
+        self.misses += 1
+        try:
+            kid = jwt.get_unverified_header(token).get("kid", self.signing_kid)
+            key = self._keys.get(kid)
+            if key is None:
+                raise JWTError(f"Unknown signing key {kid!r}")
+            claims = jwt.decode(token, key, algorithms=[self.algorithm])
+            if "exp" not in claims:
+                raise JWTError("Token has no expiry")
+            if "sub" not in claims:
+                raise JWTError("Token has no subject")
+        except JWTError:
+            self.failures += 1
+            raise
+
+        self._verified[token] = (claims, float(claims["exp"]))
+        if len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "signing_kid": self.signing_kid,
+            "kids": list(self._keys),
+            "cached": len(self._verified),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
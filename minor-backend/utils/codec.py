@@ -0,0 +1,119 @@
+import json
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # the standard library is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # only JSON frames are offered
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+
+class JsonCodec:
+    """JSON in WebSocket text frames, through orjson when it is installed."""
+
+    name = "json"
+    binary = False
+
+    def encode(self, obj: Any) -> str:
+        if orjson is not None:
+            return orjson.dumps(obj).decode()
+        return json.dumps(obj)
+
+    def decode(self, data: Frame) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack in WebSocket binary frames."""
+
+    name = "msgpack"
+    binary = True
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data: Frame) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        return msgpack.unpackb(data, raw=False)
+
+
+JSON = JsonCodec()
+CODECS: Dict[str, Any] = {"json": JSON}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+
+def negotiate(requested: Iterable[str]) -> Tuple[Any, Optional[str]]:
+    """Pick the first supported codec of a client's preference list.
+
+    Returns the codec and the name to echo as the WebSocket subprotocol, or
+    JSON and None when nothing requested is supported.
+    """
+    for name in requested:
+        codec = CODECS.get(name.strip().lower())
+        if codec is not None:
+            return codec, codec.name
+    return JSON, None
+
+
+class ResponseFrames:
+    """Chat responses pre-encoded for every codec.
+
+    A response message is ``{"response", "intent", "confidence"}``. Only
+    the confidence changes between messages, so everything before it is
+    encoded once per catalog response and a message is that prefix plus the
+    encoded number. The long catalog texts are never escaped or packed again.
+    """
+
+    def __init__(self):
+        # codec name -> (intent, response) -> encoded prefix
+        self._prefixes: Dict[str, Dict[Tuple[str, str], Frame]] = {name: {} for name in CODECS}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, intent: str, response: str):
+        key = (intent, response)
+        self._prefixes["json"][key] = JSON.encode({"response": response, "intent": intent})[:-1] + ',"confidence":'
+        if "msgpack" in self._prefixes:
+            # fixmap header for three entries, then the first two pairs and the last key
+            self._prefixes["msgpack"][key] = b"\x83" + b"".join(
+                msgpack.packb(item, use_bin_type=True)
+                for item in ("response", response, "intent", intent, "confidence")
+            )
+
+    def add_catalog(self, intents: Iterable[Dict[str, Any]]):
+        for intent in intents:
+            for response in intent["responses"]:
+                self.add(intent["tag"], response)
+
+    def encode(self, codec, result: Dict[str, Any]) -> Frame:
+        """Encode a prediction result, from its pre-encoded prefix when there is one."""
+        prefix = None
+        if len(result) == 3:
+            prefix = self._prefixes[codec.name].get((result.get("intent"), result.get("response")))
+        if prefix is None:
+            self.misses += 1
+            return codec.encode(result)
+        self.hits += 1
+        confidence = float(result["confidence"])
+        if codec.binary:
+            return prefix + msgpack.packb(confidence)
+        return prefix + repr(confidence) + "}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "codecs": list(CODECS),
+            "fast_json": orjson is not None,
+            "responses": len(self._prefixes["json"]),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
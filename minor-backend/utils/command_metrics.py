@@ -0,0 +1,69 @@
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from pymongo import monitoring
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """Per-operation MongoDB latency, fed by pymongo's command monitoring.
+
+    Operations are keyed by command and collection ("find users",
+    "insert interactions"). pymongo calls the listener from whichever thread
+    ran the command, so the counters are updated under a lock. Commands
+    slower than ``slow_ms`` are logged at WARNING. Durations are also
+    observed in ``histogram``, labelled by operation, when one is given.
+    """
+
+    def __init__(self, slow_ms: float = 0.0, histogram: Optional[Histogram] = None):
+        self.slow_ms = slow_ms
+        self.histogram = histogram
+        self._lock = threading.Lock()
+        # request_id -> operation name, for commands still in flight
+        self._operations: Dict[int, str] = {}
+        # operation -> [count, failures, total_ms, max_ms]
+        self._stats: Dict[str, list] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        target = event.command.get(event.command_name)
+        operation = f"{event.command_name} {target}" if isinstance(target, str) else event.command_name
+        with self._lock:
+            self._operations[event.request_id] = operation
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        elapsed_ms = event.duration_micros / 1000
+        with self._lock:
+            operation = self._operations.pop(event.request_id, event.command_name)
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = [0, 0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] += elapsed_ms
+            stats[3] = max(stats[3], elapsed_ms)
+        if self.histogram is not None:
+            self.histogram.observe(elapsed_ms / 1000, operation)
+        if self.slow_ms and elapsed_ms >= self.slow_ms:
+            logger.warning("Slow MongoDB %s: %.1fms", operation, elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                operation: {
+                    "count": count,
+                    "failures": failures,
+                    "mean_ms": total_ms / count,
+                    "max_ms": max_ms,
+                }
+                for operation, (count, failures, total_ms, max_ms) in sorted(self._stats.items())
+            }
@@ -0,0 +1,290 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+PING_MESSAGE = json.dumps({"type": "ping"})
+
+BROADCAST_CHANNEL = "ws.broadcast"
+SESSION_CHANNEL = "ws.session"
+PRESENCE_CHANNEL = "ws.presence"
+
+
+def _discard(index: Dict[str, Set[str]], key: str, connection_id: str) -> bool:
+    """Remove connection_id from index[key]; True if key has no connections left."""
+    ids = index.get(key)
+    if ids is None:
+        return False
+    ids.discard(connection_id)
+    if not ids:
+        del index[key]
+        return True
+    return False
+
+
+def session_key(user: Optional[str], session: Optional[str]) -> Optional[str]:
+    """Key of a user's ``?session=`` id, or None for an anonymous or session-less socket.
+
+    The session id comes from the client, so it is only trusted inside the
+    namespace of the token's subject: one user can't reach another's
+    session by sending its id.
+    """
+    if user is None or session is None:
+        return None
+    return json.dumps([user, session])
+
+
+class ConnectionInfo:
+    """Per-socket state kept by ConnectionManager."""
+
+    __slots__ = ("id", "websocket", "user", "session", "session_key", "connected_at", "last_seen", "last_ping")
+
+    def __init__(self, connection_id: str, websocket: WebSocket, user: Optional[str] = None,
+                 session: Optional[str] = None):
+        self.id = connection_id
+        self.websocket = websocket
+        self.user = user
+        self.session = session
+        self.session_key = session_key(user, session)
+        self.connected_at = self.last_seen = self.last_ping = time.monotonic()
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+
+class ConnectionManager:
+    """Registry of open WebSockets keyed by connection id.
+
+    Adding and removing a connection are dict/set operations, so they cost
+    the same with ten sockets or ten thousand. A background task closes
+    connections that have not sent anything for ``idle_timeout`` seconds
+    and, if ``heartbeat_interval`` is set, sends quiet ones a
+    ``{"type": "ping"}`` message. ``broadcast`` sends to every target
+    concurrently with a per-send timeout; clients that fail or are too slow
+    are dropped instead of holding up the rest.
+
+    With several server workers, ``attach`` a ``utils.pubsub.PubSub``:
+    ``cluster_broadcast`` and ``send_to_session`` then reach sockets held by
+    any worker, and ``locate_session`` tells which worker holds a session.
+    Sessions are those of signed-in users, keyed by ``session_key``.
+    """
+
+    def __init__(self, idle_timeout: float = 600.0, heartbeat_interval: float = 0.0,
+                 send_timeout: float = 5.0):
+        self.idle_timeout = idle_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.send_timeout = send_timeout
+        self._connections: Dict[str, ConnectionInfo] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._by_session: Dict[str, Set[str]] = {}
+        # Session key -> worker id, learned from presence messages of every worker
+        self.session_workers: Dict[str, str] = {}
+        self.pubsub = None
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+        self.peak = 0
+        self.total = 0
+        self.evicted_idle = 0
+        self.broadcasts = 0
+        self.broadcast_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def start(self):
+        if self.idle_timeout or self.heartbeat_interval:
+            self._task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def connect(self, websocket: WebSocket, user: Optional[str] = None,
+                      session: Optional[str] = None, subprotocol: Optional[str] = None) -> ConnectionInfo:
+        await websocket.accept(subprotocol=subprotocol)
+        info = ConnectionInfo(f"c{next(self._ids)}", websocket, user, session)
+        self._connections[info.id] = info
+        if user is not None:
+            self._by_user.setdefault(user, set()).add(info.id)
+        if info.session_key is not None:
+            self._by_session.setdefault(info.session_key, set()).add(info.id)
+            if self.pubsub is not None:
+                await self.pubsub.publish(PRESENCE_CHANNEL, {"session": info.session_key, "open": True})
+        self.total += 1
+        self.peak = max(self.peak, len(self._connections))
+        logger.debug("WebSocket %s connected (%d active)", info.id, len(self._connections))
+        return info
+
+    def disconnect(self, connection_id: str) -> Optional[ConnectionInfo]:
+        info = self._connections.pop(connection_id, None)
+        if info is None:
+            return None
+        if info.user is not None:
+            _discard(self._by_user, info.user, connection_id)
+        if info.session_key is not None and _discard(self._by_session, info.session_key, connection_id):
+            if self.pubsub is not None:
+                self._publish_later(PRESENCE_CHANNEL, {"session": info.session_key, "open": False})
+        logger.debug("WebSocket %s closed (%d active)", connection_id, len(self._connections))
+        return info
+
+    def get(self, connection_id: str) -> Optional[ConnectionInfo]:
+        return self._connections.get(connection_id)
+
+    def user_connections(self, user: str) -> Set[str]:
+        return set(self._by_user.get(user, ()))
+
+    def session_connections(self, user: str, session: str) -> Set[str]:
+        return set(self._by_session.get(session_key(user, session), ()))
+
+    def attach(self, pubsub):
+        """Route cluster broadcasts, session messages and presence through pubsub."""
+        self.pubsub = pubsub
+        pubsub.subscribe(BROADCAST_CHANNEL, self._on_broadcast)
+        pubsub.subscribe(SESSION_CHANNEL, self._on_session_message)
+        pubsub.subscribe(PRESENCE_CHANNEL, self._on_presence)
+
+    def _publish_later(self, channel: str, data: Dict[str, Any]):
+        async def publish():
+            try:
+                await self.pubsub.publish(channel, data)
+            except Exception as e:
+                logger.error(f"Publishing to {channel} failed: {e}")
+        asyncio.ensure_future(publish())
+
+    async def cluster_broadcast(self, message: str):
+        """Broadcast to every connection of every worker."""
+        if self.pubsub is None:
+            await self.broadcast(message)
+        else:
+            await self.pubsub.publish(BROADCAST_CHANNEL, {"message": message})
+
+    async def send_to_session(self, user: str, session: str, message: str) -> bool:
+        """Send to the user's session sockets here, or hand it to the worker holding them."""
+        key = session_key(user, session)
+        local = self._by_session.get(key)
+        if local:
+            await self.broadcast(message, list(local))
+            return True
+        if self.pubsub is not None and key in self.session_workers:
+            await self.pubsub.publish(SESSION_CHANNEL, {"session": key, "message": message})
+            return True
+        return False
+
+    def locate_session(self, user: str, session: str) -> Optional[str]:
+        """Worker id holding the user's session, if any worker has announced it."""
+        key = session_key(user, session)
+        if key in self._by_session:
+            return self.pubsub.origin if self.pubsub is not None else "local"
+        return self.session_workers.get(key)
+
+    async def _on_broadcast(self, event: Dict[str, Any]):
+        await self.broadcast(event["data"]["message"])
+
+    async def _on_session_message(self, event: Dict[str, Any]):
+        if event["origin"] == self.pubsub.origin:
+            return
+        local = self._by_session.get(event["data"]["session"])
+        if local:
+            await self.broadcast(event["data"]["message"], list(local))
+
+    async def _on_presence(self, event: Dict[str, Any]):
+        session = event["data"]["session"]
+        if event["data"]["open"]:
+            self.session_workers[session] = event["origin"]
+        elif self.session_workers.get(session) == event["origin"]:
+            del self.session_workers[session]
+
+    async def close(self, connection_id: str, code: int = 1000):
+        info = self.disconnect(connection_id)
+        if info is not None:
+            try:
+                await info.websocket.close(code=code)
+            except Exception:
+                pass
+
+    async def send(self, connection_id: str, message: str) -> bool:
+        """Send to one connection; a failed or timed-out send closes it."""
+        info = self._connections.get(connection_id)
+        if info is None:
+            return False
+        try:
+            await asyncio.wait_for(info.websocket.send_text(message), self.send_timeout)
+            return True
+        except Exception as e:
+            logger.debug("Dropping WebSocket %s after failed send: %r", connection_id, e)
+            await self.close(connection_id, code=1011)
+            return False
+
+    async def broadcast(self, message: str, connection_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Send message to the given connections (default: all) concurrently.
+
+        All sends share one ``send_timeout`` deadline; connections whose send
+        failed or is still pending at the deadline are closed.
+        """
+        ids = self._connections.keys() if connection_ids is None else connection_ids
+        sends = {}
+        for connection_id in ids:
+            info = self._connections.get(connection_id)
+            if info is not None:
+                sends[asyncio.ensure_future(info.websocket.send_text(message))] = connection_id
+        failed = []
+        if sends:
+            done, pending = await asyncio.wait(sends, timeout=self.send_timeout)
+            for task in pending:
+                task.cancel()
+            failed = [sends[task] for task in pending]
+            failed.extend(sends[task] for task in done if task.exception() is not None)
+            await asyncio.gather(*(self.close(connection_id, code=1011) for connection_id in failed))
+        self.broadcasts += 1
+        self.broadcast_failures += len(failed)
+        return {"targets": len(sends), "sent": len(sends) - len(failed), "failed": len(failed)}
+
+    async def sweep(self):
+        """Evict idle connections and ping quiet ones; runs periodically once started."""
+        now = time.monotonic()
+        idle, quiet = [], []
+        for info in self._connections.values():
+            silent_for = now - info.last_seen
+            if self.idle_timeout and silent_for >= self.idle_timeout:
+                idle.append(info.id)
+            elif self.heartbeat_interval and now - max(info.last_seen, info.last_ping) >= self.heartbeat_interval:
+                info.last_ping = now
+                quiet.append(info.id)
+        self.evicted_idle += len(idle)
+        await asyncio.gather(*(self.close(connection_id, code=1001) for connection_id in idle))
+        if quiet:
+            await self.broadcast(PING_MESSAGE, quiet)
+
+    async def _sweep_forever(self):
+        interval = min(t for t in (self.idle_timeout, self.heartbeat_interval) if t) / 2
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"WebSocket sweep failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._connections),
+            "users": len(self._by_user),
+            "sessions": len(self._by_session),
+            "cluster_sessions": len(self.session_workers),
+            "peak": self.peak,
+            "total": self.total,
+            "evicted_idle": self.evicted_idle,
+            "broadcasts": self.broadcasts,
+            "broadcast_failures": self.broadcast_failures,
+        }
@@ -0,0 +1,220 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.metrics import Histogram
+
+EXECUTOR_MODES = ("thread", "process")
+
+# Model instance owned by a process-pool worker
+_worker_model = None
+
+
+def _init_worker(model_factory: Callable[[], Any]):
+    global _worker_model
+    _worker_model = model_factory()
+
+
+def _worker_predict(text: str) -> Dict[str, Any]:
+    return _worker_model.predict(text)
+
+
+def _worker_predict_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    return _worker_model.predict_batch(texts)
+
+
+_WORKER_CALLS = {
+    "predict": _worker_predict,
+    "predict_batch": _worker_predict_batch,
+}
+
+
+class InferenceOverloaded(Exception):
+    """Raised when the inference queue stays full for longer than the timeout."""
+
+
+class InferenceExecutor:
+    """Runs model predictions off the event loop.
+
+    ``mode`` selects a thread pool (one shared model instance) or a process
+    pool (one model per worker, built by ``model_factory`` in the worker).
+    At most ``max_pending`` predictions may be queued or running; callers past
+    that wait up to ``queue_timeout`` seconds for a slot and then get
+    ``InferenceOverloaded``. Time spent in the pool is observed in
+    ``latency`` by method, without the wait for a slot.
+
+    ``start`` only creates the pool. The model itself is built and exercised
+    by ``warm_up``, which the server runs in the background after it starts
+    accepting connections; predictions wait for it to finish.
+    """
+
+    def __init__(
+        self,
+        model_factory: Callable[[], Any],
+        version: Optional[str] = None,
+        mode: str = "thread",
+        max_workers: int = 1,
+        max_pending: int = 64,
+        queue_timeout: float = 5.0,
+        latency: Optional[Histogram] = None,
+    ):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.model_factory = model_factory
+        self.version = version
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.latency = latency
+        self.model = None
+        self._pool = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._swap_lock: Optional[asyncio.Lock] = None
+        self.warm_up_seconds: Optional[float] = None
+        self.warm_up_error: Optional[str] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _create_process_pool(self, model_factory: Callable[[], Any]) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_factory,),
+        )
+
+    async def _warm_process_pool(self, pool: ProcessPoolExecutor, sample: str):
+        # One task per worker makes the pool spawn all of its processes
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(pool, _worker_predict, sample)
+            for _ in range(self.max_workers)
+        ])
+
+    def start(self):
+        if self.mode == "process":
+            self._pool = self._create_process_pool(self.model_factory)
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference",
+            )
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._ready = asyncio.Event()
+        self._swap_lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready is not None and self._ready.is_set()
+
+    async def warm_up(self, sample: str = "hello"):
+        """Build the model(s) and run one prediction so the first user doesn't pay for it."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        async with self._swap_lock:
+            try:
+                if self.mode == "process":
+                    await self._warm_process_pool(self._pool, sample)
+                else:
+                    model = await loop.run_in_executor(self._pool, self.model_factory)
+                    await loop.run_in_executor(self._pool, model.predict, sample)
+                    self.model = model
+            except Exception as e:
+                self.warm_up_error = str(e)
+                raise
+        self.warm_up_seconds = time.perf_counter() - started
+        self._ready.set()
+
+    async def swap(self, model_factory: Callable[[], Any], version: Optional[str] = None,
+                   sample: str = "hello"):
+        """Load and warm a new model in the background, then switch to it.
+
+        Predictions already dispatched keep running on the old model (or old
+        process pool); only new ones see the new version. If loading fails the
+        current model stays in place and the error is raised.
+        """
+        async with self._swap_lock:
+            loop = asyncio.get_running_loop()
+            if self.mode == "process":
+                new_pool = self._create_process_pool(model_factory)
+                try:
+                    await self._warm_process_pool(new_pool, sample)
+                except Exception:
+                    new_pool.shutdown(wait=False)
+                    raise
+                old_pool, self._pool = self._pool, new_pool
+                # Queued work on the old pool still runs before its workers exit
+                old_pool.shutdown(wait=False)
+            else:
+                model = await loop.run_in_executor(self._pool, model_factory)
+                await loop.run_in_executor(self._pool, model.predict, sample)
+                self.model = model
+            self.model_factory = model_factory
+            self.version = version
+            if not self._ready.is_set():
+                self.warm_up_error = None
+                self._ready.set()
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    async def predict(self, text: str) -> Dict[str, Any]:
+        """Run ``model.predict(text)`` in the pool and await the result."""
+        return await self._run("predict", text)
+
+    async def predict_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Run ``model.predict_batch(texts)`` as a single pool task."""
+        return await self._run("predict_batch", texts)
+
+    async def _run(self, method: str, arg: Any) -> Any:
+        if self._pool is None:
+            raise RuntimeError("Inference executor not started. Call start first.")
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise InferenceOverloaded("Model is still warming up")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise InferenceOverloaded("Inference queue is full")
+
+        self.pending += 1
+        try:
+            if self.mode == "process":
+                func = _WORKER_CALLS[method]
+            else:
+                func = getattr(self.model, method)
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            result = await loop.run_in_executor(self._pool, func, arg)
+            if self.latency is not None:
+                self.latency.observe(time.perf_counter() - started, method)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "ready": self.ready,
+            "version": self.version,
+            "warm_up_seconds": self.warm_up_seconds,
+            "warm_up_error": self.warm_up_error,
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
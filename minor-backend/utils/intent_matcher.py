@@ -0,0 +1,134 @@
+from typing import Dict, List, Any, Optional
+
+
+class AhoCorasick:
+    """Multi-pattern substring automaton.
+
+    Every pattern is given a rank (its position in the input); ``best_match``
+    returns the lowest-ranked pattern occurring anywhere in the text, so the
+    result is the same as testing ``pattern in text`` for each pattern in
+    order and stopping at the first hit.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Lowest pattern rank that ends at (or is a suffix of) each node
+        self._best: List[Optional[int]] = [None]
+
+        for rank, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                node = next_node
+            if self._best[node] is None:
+                self._best[node] = rank
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._best[node] = self._min_rank(self._best[node], self._best[0])
+        index = 0
+        while index < len(queue):
+            node = queue[index]
+            index += 1
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._best[child] = self._min_rank(self._best[child], self._best[fail])
+                queue.append(child)
+
+    @staticmethod
+    def _min_rank(a: Optional[int], b: Optional[int]) -> Optional[int]:
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return min(a, b)
+
+    def best_match(self, text: str) -> Optional[int]:
+        """Return the rank of the first pattern (in input order) found in text."""
+        goto = self._goto
+        fail = self._fail
+        best = self._best
+        result = best[0]
+        if result == 0:
+            return 0
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            rank = best[node]
+            if rank is not None and (result is None or rank < result):
+                result = rank
+                if result == 0:
+                    break
+        return result
+
+
+class IntentMatcher:
+    """Compiled form of the rule-based intent lookup.
+
+    Built once from the intent catalog. The substring pass runs an Aho-Corasick
+    automaton over the query and the word-overlap fallback uses an inverted
+    token -> intent index, so matching cost depends on the query length rather
+    than on the number of patterns in the catalog.
+    """
+
+    def __init__(self, intents: List[Dict[str, Any]], default_tag: str = "default"):
+        self.default_tag = default_tag
+
+        # Same ordering rules as a plain dict: first insertion fixes the
+        # position of a pattern, the last intent that uses it owns the tag.
+        pattern_to_tag: Dict[str, str] = {}
+        for intent in intents:
+            for pattern in intent["patterns"]:
+                pattern_to_tag[pattern.lower()] = intent["tag"]
+        self.pattern_to_tag = pattern_to_tag
+        self._pattern_tags = list(pattern_to_tag.values())
+        self._automaton = AhoCorasick(list(pattern_to_tag.keys()))
+
+        # Each word maps to the first intent that has a pattern containing it
+        self._intent_tags = [intent["tag"] for intent in intents]
+        self._token_to_intent: Dict[str, int] = {}
+        for position, intent in enumerate(intents):
+            for pattern in intent["patterns"]:
+                for word in pattern.lower().split():
+                    self._token_to_intent.setdefault(word, position)
+
+    def pattern_match(self, query: str) -> Optional[str]:
+        """Tag of the first catalog pattern contained in the query, if any."""
+        rank = self._automaton.best_match(query.lower())
+        return self._pattern_tags[rank] if rank is not None else None
+
+    def match(self, query: str) -> str:
+        """Return the intent tag for a query."""
+        query = query.lower()
+
+        rank = self._automaton.best_match(query)
+        if rank is not None:
+            return self._pattern_tags[rank]
+
+        token_to_intent = self._token_to_intent
+        position = None
+        for word in query.split():
+            candidate = token_to_intent.get(word)
+            if candidate is not None and (position is None or candidate < position):
+                position = candidate
+        if position is not None:
+            return self._intent_tags[position]
+
+        return self.default_tag
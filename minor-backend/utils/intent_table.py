@@ -0,0 +1,66 @@
+import hashlib
+import json
+import random
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class IntentTable:
+    """Immutable, array-indexed view of an intent catalog.
+
+    Class ids index straight into ``tags`` and ``responses``, and
+    ``tag_to_id`` maps back, so the per-request path is a couple of tuple
+    and dict lookups. Built once when a model is loaded or trained and
+    shared by every model implementation.
+    """
+
+    __slots__ = ("tags", "tag_to_id", "responses", "version")
+
+    def __init__(self, tags: Iterable[str], responses: Iterable[Iterable[str]]):
+        tags = tuple(tags)
+        responses = tuple(tuple(options) for options in responses)
+        if len(tags) != len(responses):
+            raise ValueError("tags and responses must have the same length")
+
+        content = json.dumps([tags, responses])
+        object.__setattr__(self, "tags", tags)
+        object.__setattr__(self, "tag_to_id", MappingProxyType({tag: i for i, tag in enumerate(tags)}))
+        object.__setattr__(self, "responses", responses)
+        object.__setattr__(self, "version", hashlib.sha256(content.encode("utf-8")).hexdigest()[:16])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("IntentTable is immutable")
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    @classmethod
+    def from_intents(cls, intents: List[Dict[str, Any]]) -> "IntentTable":
+        """Build from catalog entries (``insert_data.healthcare_data["intents"]``)."""
+        return cls(
+            [intent["tag"] for intent in intents],
+            [intent["responses"] for intent in intents],
+        )
+
+    @classmethod
+    def from_label_encoder(cls, label_encoder: Dict[str, int],
+                           response_lookup: Dict[str, str]) -> "IntentTable":
+        """Build from a trained model's label map, ordered by class id."""
+        tags = [tag for tag, _ in sorted(label_encoder.items(), key=lambda item: item[1])]
+        if [label_encoder[tag] for tag in tags] != list(range(len(tags))):
+            raise ValueError("label_encoder class ids must be 0..n-1")
+        return cls(tags, [(response_lookup[tag],) if tag in response_lookup else () for tag in tags])
+
+    def lookup(self, tag: str) -> Optional[int]:
+        return self.tag_to_id.get(tag)
+
+    def choose_response(self, intent_id: int) -> Optional[str]:
+        """Pick one of the intent's responses at random (None if it has none)."""
+        options = self.responses[intent_id]
+        if not options:
+            return None
+        return options[0] if len(options) == 1 else random.choice(options)
+
+    def first_response(self, intent_id: int) -> Optional[str]:
+        options = self.responses[intent_id]
+        return options[0] if options else None
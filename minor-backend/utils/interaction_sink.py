@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ("drop_oldest", "drop_newest")
+
+
+class InteractionSink:
+    """Buffers interaction records in memory and writes them in batches.
+
+    ``submit`` never waits: records go into a bounded ring buffer and a
+    background task hands them to ``write_batch`` (e.g. a Motor
+    ``insert_many``) once ``batch_size`` records are waiting or every
+    ``flush_interval`` seconds. When the buffer is full ``drop_policy``
+    decides whether the oldest buffered record or the new one is dropped.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        drop_policy: str = "drop_oldest",
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.write_batch = write_batch
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self._buffer: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and write whatever is still buffered."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    def submit(self, user_id: str, query: str, response: Dict[str, Any]) -> bool:
+        """Queue one interaction; returns False if it was dropped."""
+        self.submitted += 1
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            if self.drop_policy == "drop_newest":
+                return False
+            self._buffer.popleft()
+        self._buffer.append({
+            "user_id": user_id,
+            "query": query,
+            "response": response,
+            "timestamp": datetime.utcnow(),
+        })
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                count = min(self.batch_size, len(self._buffer))
+                batch = [self._buffer.popleft() for _ in range(count)]
+                try:
+                    await self.write_batch(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    # Keep memory bounded: a failed batch is counted and discarded
+                    self.failed += len(batch)
+                    logger.warning(f"Dropped {len(batch)} interaction records after write error: {e}")
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
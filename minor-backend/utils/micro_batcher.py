@@ -0,0 +1,148 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.inference_executor import InferenceOverloaded
+from utils.metrics import Histogram
+
+
+class MicroBatcher:
+    """Coalesces concurrent predictions into batches.
+
+    Requests from all connections are collected for up to ``max_wait_ms``
+    after the first one arrives, or until ``max_batch_size`` are waiting, and
+    are then handed to ``predict_batch`` as a single list. Each caller gets
+    back the result at its own position.
+
+    At most ``max_pending`` requests may be waiting for a batch or inside
+    one; callers past that wait up to ``queue_timeout`` seconds for a slot
+    and then get ``InferenceOverloaded``, as with the executor, which only
+    counts batches. Dispatched batch sizes are observed in ``batch_size``.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 64,
+        queue_timeout: float = 5.0,
+        batch_size: Optional[Histogram] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.batch_size = batch_size
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._in_flight = set()
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.max_observed = 0
+        self.size_counts: Dict[int, int] = {}
+        self.pending = 0
+        self.rejected = 0
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._collector is not None:
+            # A sentinel rather than cancel(), so a batch being gathered is still dispatched
+            self._queue.put_nowait(None)
+            await self._collector
+            self._collector = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def predict(self, text: str) -> Dict[str, Any]:
+        if self._collector is None:
+            raise RuntimeError("Micro-batcher not started. Call start first.")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise InferenceOverloaded("Batching queue is full")
+
+        self.pending += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((text, future))
+            return await future
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # Dispatch without waiting so the next batch can start filling
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.max_observed = max(self.max_observed, size)
+        self.size_counts[size] = self.size_counts.get(size, 0) + 1
+        if self.batch_size is not None:
+            self.batch_size.observe(size)
+
+        try:
+            results = await self.predict_batch([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_observed_batch_size": self.max_observed,
+            "batch_size_counts": dict(sorted(self.size_counts.items())),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
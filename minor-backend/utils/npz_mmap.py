@@ -0,0 +1,49 @@
+import struct
+import zipfile
+from typing import Dict
+
+import numpy as np
+
+# Fixed part of a zip local file header; the name and extra field follow it
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def load_npz_mmap(path: str) -> Dict[str, np.ndarray]:
+    """Open every numeric array of an uncompressed ``np.savez`` file as a read-only memmap.
+
+    ``np.load`` ignores ``mmap_mode`` for .npz archives and copies each
+    array into the process. ``np.savez`` stores members uncompressed, so
+    their data can be mapped in place instead: every process serving the
+    same file then shares one copy of the weights in the page cache.
+    Compressed members and non-numeric arrays (e.g. JSON strings) are read
+    normally.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info))
+                continue
+
+            handle.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(handle.read(_LOCAL_HEADER.size))
+            name_length, extra_length = header[-2], header[-1]
+            handle.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+            read_header = _HEADER_READERS.get(np.lib.format.read_magic(handle))
+            shape, fortran_order, dtype = read_header(handle) if read_header else (None, False, np.dtype(object))
+            if dtype.hasobject or dtype.kind not in "biuf":
+                arrays[name] = np.load(archive.open(info))
+                continue
+            mapped = np.memmap(
+                path, dtype=dtype, mode="r", offset=handle.tell(), shape=shape,
+                order="F" if fortran_order else "C",
+            )
+            # A plain ndarray view skips np.memmap's per-operation overhead; it keeps the mapping alive
+            arrays[name] = mapped.view(np.ndarray)
+    return arrays
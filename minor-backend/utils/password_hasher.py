@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+# CryptContext owned by a pool worker
+_worker_context: Optional[CryptContext] = None
+
+
+def create_crypt_context(rounds: int) -> CryptContext:
+    """bcrypt context under which any hash made with a different cost needs an update."""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def _init_worker(rounds: int):
+    global _worker_context
+    _worker_context = create_crypt_context(rounds)
+
+
+def _worker_hash(password: str) -> str:
+    return _worker_context.hash(password)
+
+
+def _worker_verify(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _worker_context.verify_and_update(password, hashed)
+
+
+class HasherOverloaded(Exception):
+    """Raised when the hashing queue stays full for longer than the timeout."""
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool instead of on the event loop.
+
+    A bcrypt call holds the GIL for its whole 100-300ms, so a thread would
+    still stall every WebSocket of the worker; a process does not. At most
+    ``max_pending`` hashes may be queued or running; callers past that wait
+    up to ``queue_timeout`` seconds for a slot and then get
+    ``HasherOverloaded``.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 1, max_pending: int = 32,
+                 queue_timeout: float = 5.0):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def start(self):
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.rounds,),
+        )
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_worker_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; also returns a new hash if ``hashed`` used another cost."""
+        valid, new_hash = await self._run(_worker_verify, password, hashed)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pool is None:
+            raise RuntimeError("Password hasher not started. Call start first.")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HasherOverloaded("Password hashing queue is full")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, func, *args)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+        }
@@ -0,0 +1,383 @@
+import json
+import os
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writer process is assumed
+    fcntl = None
+
+META_NAME = "meta.json"
+VECTORS_NAME = "vectors.i8"
+SCALES_NAME = "scales.f32"
+OFFSETS_NAME = "offsets.u64"
+PATTERNS_NAME = "patterns.jsonl"
+CENTROIDS_NAME = "centroids.f32"
+LISTS_NAME = "lists.i32"
+LOCK_NAME = ".lock"
+
+# Rows converted from int8 to float32 per matmul, bounding the temporary buffer
+SEARCH_BLOCK_ROWS = 16384
+
+
+class HashingEncoder:
+    """Stateless text encoder: signed feature hashing of character n-grams.
+
+    N-grams are taken inside word boundaries (like scikit-learn's ``char_wb``),
+    hashed with crc32 into ``dim`` buckets with a hash-derived sign and
+    L2-normalised. Nothing is fitted, so adding patterns never changes the
+    vectors already in an index.
+    """
+
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+
+    def ngrams(self, text: str) -> List[str]:
+        low, high = self.ngram_range
+        grams = []
+        for word in text.lower().split():
+            word = f" {word} "
+            for n in range(low, high + 1):
+                grams.extend(word[i:i + n] for i in range(max(len(word) - n + 1, 1)))
+        return grams
+
+    def encode(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.array([zlib.crc32(gram.encode("utf-8")) for gram in self.ngrams(text)], dtype=np.uint32)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; returns (int8 rows, float32 scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(data, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+class PatternIndex:
+    """Nearest-pattern retrieval over int8 vectors memory-mapped from disk.
+
+    The directory holds append-only raw arrays (vectors, scales, offsets into
+    patterns.jsonl) and ``meta.json``. ``add`` appends to every file and then
+    rewrites the row count in meta.json, so a crash mid-append leaves extra
+    bytes that the next ``add`` truncates instead of a corrupt index. Opening
+    an index only reads meta.json and maps the arrays, whatever its size.
+
+    Writers (``add``, ``seed``, ``train_ivf``) hold an exclusive lock on the
+    directory and start from the meta.json on disk, so server workers and
+    scripts can write to the same index. Readers never lock: they only map
+    bytes that meta.json has committed.
+
+    Search is a brute-force scan in blocks of ``SEARCH_BLOCK_ROWS`` unless
+    ``train_ivf`` has partitioned the vectors into ``nlist`` clusters, in
+    which case only the ``nprobe`` closest clusters are scanned. Every
+    training writes a new generation of the centroid and list files and
+    switches meta.json to it, so processes that still map the previous
+    generation keep reading consistent data.
+    """
+
+    def __init__(self, directory: str, dim: int = 256, ngram_range: Tuple[int, int] = (3, 5)):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, META_NAME)
+        if not os.path.exists(meta_path):
+            with self._lock():
+                if not os.path.exists(meta_path):
+                    _write_json_atomic(meta_path, {"dim": dim, "ngram_range": list(ngram_range), "count": 0, "nlist": 0})
+        with open(meta_path) as handle:
+            self.meta = json.load(handle)
+        self.encoder = HashingEncoder(self.meta["dim"], self.meta["ngram_range"])
+        self._open()
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _lock(self):
+        """Exclusive writer lock on the index directory, across processes."""
+        with open(os.path.join(self.directory, LOCK_NAME), "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _ivf_names(meta: Dict[str, Any]) -> Tuple[str, str]:
+        generation = meta.get("ivf_generation", 0)
+        if not generation:
+            # Indexes trained before generations were introduced
+            return CENTROIDS_NAME, LISTS_NAME
+        return f"centroids.{generation}.f32", f"lists.{generation}.i32"
+
+    def _map(self, name: str, dtype, shape):
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _open(self):
+        count, dim, nlist = self.meta["count"], self.meta["dim"], self.meta["nlist"]
+        self.vectors = self._map(VECTORS_NAME, np.int8, (count, dim))
+        self.scales = self._map(SCALES_NAME, np.float32, (count,))
+        self.offsets = self._map(OFFSETS_NAME, np.uint64, (count,))
+        centroids_name, lists_name = self._ivf_names(self.meta)
+        self.centroids = self._map(centroids_name, np.float32, (nlist, dim)) if nlist else None
+        self.lists = self._map(lists_name, np.int32, (count,)) if nlist else None
+        # Inverted lists are derived from self.lists on the first IVF search
+        self._list_order = None
+        self._list_bounds = None
+
+    def _append(self, name: str, data: bytes, committed_bytes: int) -> int:
+        with open(self._path(name), "ab") as handle:
+            handle.truncate(committed_bytes)
+            handle.seek(committed_bytes)
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        return committed_bytes + len(data)
+
+    def add(self, patterns: Iterable[Tuple[str, str]]):
+        """Append (text, tag) pairs; existing vectors are never re-encoded."""
+        patterns = list(patterns)
+        if not patterns:
+            return
+        with self._lock():
+            self.refresh()
+            self._add_locked(patterns)
+
+    def seed(self, patterns: Iterable[Tuple[str, str]]) -> bool:
+        """Add patterns only if the index is still empty; False if another process got there first."""
+        with self._lock():
+            self.refresh()
+            if self.meta["count"]:
+                return False
+            self._add_locked(list(patterns))
+            return True
+
+    def _add_locked(self, patterns: List[Tuple[str, str]]):
+        if not patterns:
+            return
+        count, dim = self.meta["count"], self.meta["dim"]
+        vectors, scales = quantize(self.encoder.encode(text for text, _ in patterns))
+
+        patterns_path = self._path(PATTERNS_NAME)
+        committed = int(self.offsets[-1]) if count else 0
+        if count:
+            with open(patterns_path, "rb") as handle:
+                handle.seek(committed)
+                committed += len(handle.readline())
+        lines = [json.dumps({"text": text, "tag": tag}).encode("utf-8") + b"\n" for text, tag in patterns]
+        offsets = np.cumsum([committed] + [len(line) for line in lines[:-1]]).astype(np.uint64)
+        self._append(PATTERNS_NAME, b"".join(lines), committed)
+
+        self._append(VECTORS_NAME, vectors.tobytes(), count * dim)
+        self._append(SCALES_NAME, scales.tobytes(), count * 4)
+        self._append(OFFSETS_NAME, offsets.tobytes(), count * 8)
+        if self.meta["nlist"]:
+            # New vectors join the nearest existing cluster; call train_ivf to rebalance
+            assignments = self._assign(vectors.astype(np.float32) * scales[:, None])
+            self._append(self._ivf_names(self.meta)[1], assignments.tobytes(), count * 4)
+
+        self.meta["count"] = count + len(patterns)
+        _write_json_atomic(self._path(META_NAME), self.meta)
+        self._open()
+
+    def _dequantize(self, start: int, stop: int) -> np.ndarray:
+        return self.vectors[start:stop].astype(np.float32) * self.scales[start:stop, None]
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ np.asarray(self.centroids).T, axis=1).astype(np.int32)
+
+    def train_ivf(self, nlist: int, iterations: int = 10, seed: int = 0):
+        """Partition the vectors into nlist clusters with spherical k-means."""
+        with self._lock():
+            self.refresh()
+            self._train_ivf_locked(nlist, iterations, seed)
+
+    def _train_ivf_locked(self, nlist: int, iterations: int, seed: int):
+        count = self.meta["count"]
+        if not 0 < nlist <= count:
+            raise ValueError(f"nlist must be between 1 and the index size ({count})")
+        vectors = np.concatenate([
+            self._dequantize(start, min(start + SEARCH_BLOCK_ROWS, count))
+            for start in range(0, count, SEARCH_BLOCK_ROWS)
+        ])
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(count, nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = vectors[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+        # New files under new names: running servers keep their mapping of the old ones
+        previous = self.meta.get("ivf_generation", 0)
+        meta = dict(self.meta, nlist=nlist, ivf_generation=previous + 1)
+        centroids_name, lists_name = self._ivf_names(meta)
+        self._append(centroids_name, centroids.astype(np.float32).tobytes(), 0)
+        self._append(lists_name, assignments.tobytes(), 0)
+        _write_json_atomic(self._path(META_NAME), meta)
+        self.meta = meta
+        self._open()
+        # Readers refresh from meta.json before they map files, so only the
+        # generation before the previous one can no longer be opened
+        if previous > 1:
+            for name in self._ivf_names({"ivf_generation": previous - 1}):
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+
+    def refresh(self) -> bool:
+        """Pick up rows another process added since this index was opened.
+
+        Reads meta.json; callers on a hot path should throttle it.
+        """
+        with open(self._path(META_NAME)) as handle:
+            meta = json.load(handle)
+        if meta == self.meta:
+            return False
+        self.meta = meta
+        self._open()
+        return True
+
+    def patterns(self, rows: Iterable[int]) -> List[Dict[str, str]]:
+        """Read the stored {text, tag} records of the given rows."""
+        records = []
+        with open(self._path(PATTERNS_NAME), "rb") as handle:
+            for row in rows:
+                handle.seek(int(self.offsets[row]))
+                records.append(json.loads(handle.readline()))
+        return records
+
+    def _scan(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return (n_queries, n_rows) scores against all rows or the given row ids."""
+        if rows is not None:
+            return (self.vectors[rows].astype(np.float32) * self.scales[rows, None]) @ queries.T
+        count = self.meta["count"]
+        scores = np.empty((count, len(queries)), dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, count)
+            block = self.vectors[start:stop].astype(np.float32)
+            scores[start:stop] = (block @ queries.T) * self.scales[start:stop, None]
+        return scores
+
+    def _probe_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self._list_order is None:
+            self._list_order = np.argsort(self.lists, kind="stable")
+            self._list_bounds = np.searchsorted(self.lists[self._list_order], np.arange(self.meta["nlist"] + 1))
+        clusters = np.argsort(-(np.asarray(self.centroids) @ query))[:nprobe]
+        return np.concatenate([
+            self._list_order[self._list_bounds[c]:self._list_bounds[c + 1]] for c in clusters
+        ])
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        if len(scores) > k:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def search_batch(self, texts: List[str], k: int = 5, nprobe: int = 1) -> List[List[Dict[str, Any]]]:
+        """Return the k nearest patterns (text, tag, score) for every query."""
+        if not self.meta["count"]:
+            return [[] for _ in texts]
+        queries = self.encoder.encode(texts)
+        if self.meta["nlist"]:
+            results = []
+            for query in queries:
+                rows = self._probe_rows(query, nprobe)
+                scores = self._scan(query[None, :], rows)[:, 0]
+                results.append([(int(rows[i]), float(scores[i])) for i in self._top_k(scores, k)])
+        else:
+            scores = self._scan(queries)
+            results = [
+                [(int(i), float(scores[i, column])) for i in self._top_k(scores[:, column], k)]
+                for column in range(len(texts))
+            ]
+        # Quantization error can push an exact match slightly above 1
+        return [
+            [dict(record, score=min(score, 1.0)) for record, (_, score) in zip(self.patterns(r for r, _ in hits), hits)]
+            for hits in results
+        ]
+
+    def search(self, text: str, k: int = 5, nprobe: int = 1) -> List[Dict[str, Any]]:
+        return self.search_batch([text], k, nprobe)[0]
+
+
+def index_generation(directory: str) -> str:
+    """Changes whenever the index in directory commits (patterns added, IVF retrained).
+
+    Every commit replaces meta.json by rename, so its inode and mtime are
+    enough; a stat is far cheaper than reading the file.
+    """
+    try:
+        meta = os.stat(os.path.join(directory, META_NAME))
+    except FileNotFoundError:
+        return "empty"
+    return f"{meta.st_ino}.{meta.st_mtime_ns}"
+
+
+class GenerationWatcher:
+    """``index_generation`` of a directory, stat-ed at most every ``interval`` seconds.
+
+    A new generation is reported only after it has been seen for a whole
+    interval. Readers refresh their index at most that often, so by then
+    any search started under the new generation reads the new index.
+    """
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self._checked_at = float("-inf")
+        self._current = None
+        self._pending: Optional[Tuple[str, float]] = None
+
+    def generation(self) -> str:
+        now = time.monotonic()
+        if self._current is not None and now - self._checked_at < self.interval:
+            return self._current
+        self._checked_at = now
+        generation = index_generation(self.directory)
+        if self._current is None or not self.interval:
+            self._current = generation
+        elif generation == self._current:
+            self._pending = None
+        elif self._pending is None or self._pending[0] != generation:
+            self._pending = (generation, now)
+        elif now - self._pending[1] >= self.interval:
+            self._current, self._pending = generation, None
+        return self._current
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def worker_id() -> str:
+    """Identifies this server process in published messages."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class PubSub(ABC):
+    """Fan-out of small JSON-able messages between server worker processes.
+
+    ``publish`` delivers a message to the handlers subscribed to its channel
+    in every worker, the publishing one included. Handlers receive
+    ``{"channel", "origin", "data"}`` where ``origin`` is the publisher's
+    ``worker_id``. Delivery is at most once and only to running workers.
+    """
+
+    def __init__(self):
+        self.origin = worker_id()
+        self._handlers: Dict[str, List[Handler]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.handler_errors = 0
+
+    def subscribe(self, channel: str, handler: Handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, data: Dict[str, Any]):
+        """Deliver data to the channel's subscribers in every worker."""
+
+    async def _dispatch(self, message: Dict[str, Any]):
+        for handler in self._handlers.get(message["channel"], ()):
+            try:
+                await handler(message)
+            except Exception as e:
+                self.handler_errors += 1
+                logger.error(f"Pub/sub handler for {message['channel']} failed: {e}")
+        self.delivered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "origin": self.origin,
+            "published": self.published,
+            "delivered": self.delivered,
+            "handler_errors": self.handler_errors,
+        }
+
+
+class LocalPubSub(PubSub):
+    """In-process stand-in: every handler lives in this process.
+
+    Right for a single worker and for tests; several LocalPubSub objects can
+    share one ``bus`` list to simulate several workers in one process.
+    """
+
+    def __init__(self, bus: Optional[List["LocalPubSub"]] = None):
+        super().__init__()
+        self.bus = bus if bus is not None else []
+        self.bus.append(self)
+
+    async def publish(self, channel: str, data: Dict[str, Any]):
+        self.published += 1
+        message = {"channel": channel, "origin": self.origin, "data": data}
+        for member in self.bus:
+            await member._dispatch(message)
+
+
+class MongoPubSub(PubSub):
+    """Pub/sub over a MongoDB capped collection.
+
+    Publishing inserts a document; every worker follows the collection with
+    a tailable, awaitable cursor starting at the newest document when it
+    starts. One cursor is kept open while it is alive; if it dies (e.g. the
+    collection wrapped around) it is closed and reopened a little before the
+    last seen timestamp, skipping ids already delivered.
+    """
+
+    def __init__(self, database, collection_name: str = "pubsub", size_bytes: int = 16 * 1024 * 1024,
+                 retry_seconds: float = 0.5, reopen_lookback: timedelta = timedelta(seconds=5)):
+        super().__init__()
+        self.database = database
+        self.collection_name = collection_name
+        self.size_bytes = size_bytes
+        self.retry_seconds = retry_seconds
+        self.reopen_lookback = reopen_lookback
+        self.collection = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_ts: Optional[datetime] = None
+        self._seen: deque = deque(maxlen=1000)
+        self._seen_ids: set = set()
+
+    async def start(self):
+        try:
+            await self.database.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+        self.collection = self.database[self.collection_name]
+        # A tailable cursor on an empty capped collection dies immediately, so
+        # start from a marker document (MongoDB keeps millisecond precision)
+        now = datetime.utcnow()
+        self._last_ts = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        marker = await self.collection.insert_one({"channel": None, "origin": self.origin, "ts": self._last_ts})
+        self._remember(marker.inserted_id)
+        self._task = asyncio.create_task(self._follow())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, channel: str, data: Dict[str, Any]):
+        self.published += 1
+        await self.collection.insert_one({
+            "channel": channel,
+            "origin": self.origin,
+            "data": data,
+            "ts": datetime.utcnow(),
+        })
+
+    def _remember(self, document_id):
+        if len(self._seen) == self._seen.maxlen:
+            self._seen_ids.discard(self._seen[0])
+        self._seen.append(document_id)
+        self._seen_ids.add(document_id)
+
+    async def _follow(self):
+        since = self._last_ts
+        while True:
+            cursor = self.collection.find(
+                {"ts": {"$gte": since}},
+                cursor_type=CursorType.TAILABLE_AWAIT,
+            )
+            try:
+                while cursor.alive:
+                    # Ends after an await-getMore that returned nothing; the
+                    # cursor stays open and the next pass waits on it again
+                    async for document in cursor:
+                        await self._deliver(document)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Pub/sub cursor failed, reopening: {e}")
+            finally:
+                await cursor.close()
+            # Reopen a little before the last seen timestamp: other workers'
+            # clocks differ, so their entries can be slightly older than ones
+            # already delivered. The seen ids drop the repeats.
+            since = self._last_ts - self.reopen_lookback
+            await asyncio.sleep(self.retry_seconds)
+
+    async def _deliver(self, document: Dict[str, Any]):
+        if document["_id"] in self._seen_ids:
+            return
+        self._remember(document["_id"])
+        self._last_ts = max(self._last_ts, document["ts"])
+        if document.get("channel") is not None:
+            await self._dispatch({
+                "channel": document["channel"],
+                "origin": document["origin"],
+                "data": document.get("data"),
+            })
@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+class KeyedRateLimiter:
+    """Token bucket per key, e.g. per username on /api/login.
+
+    Each key may make ``attempts`` attempts in a burst, refilled at
+    ``attempts`` per ``window_seconds``. Buckets are kept in least-recently
+    used order and at most ``max_keys`` of them are held; an evicted key
+    starts again with a full bucket. With no attempts or no window the
+    limiter is disabled and allows everything.
+    """
+
+    def __init__(self, attempts: int = 5, window_seconds: float = 60.0, max_keys: int = 100000):
+        self.attempts = attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.enabled = attempts > 0 and window_seconds > 0
+        self._rate = attempts / window_seconds if self.enabled else 0.0
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: str) -> float:
+        """Take one attempt for key; 0 if allowed, otherwise seconds until the next one."""
+        if not self.enabled:
+            self.allowed += 1
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(self.attempts), now))
+        tokens = min(self.attempts, tokens + (now - updated) * self._rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+            self.allowed += 1
+        else:
+            wait = (1 - tokens) / self._rate
+            self.limited += 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
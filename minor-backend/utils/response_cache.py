@@ -0,0 +1,108 @@
+import random
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Rough per-entry cost of the OrderedDict slot and the record tuple
+_ENTRY_OVERHEAD = 200
+
+
+class ResponseCache:
+    """LRU cache of classification results keyed by normalized query text.
+
+    Entries hold the intent, confidence and the tuple of possible responses,
+    not the response that was sent, so intents with several answers keep
+    being randomized on hits. Response tuples are expected to be shared with
+    the intent table and are not counted against ``max_bytes``.
+
+    Callers pass the current model/catalog version to ``ensure_version``;
+    a different version drops every entry.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds or None
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[str, Tuple[str, float, Tuple[str, ...], int, Optional[float]]]" = OrderedDict()
+        self.bytes_used = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return query.strip().lower()
+
+    def ensure_version(self, version: str):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self.version = version
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        key = self.normalize(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        intent, confidence, responses, size, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.bytes_used -= size
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        response = responses[0] if len(responses) == 1 else random.choice(responses)
+        return {"response": response, "intent": intent, "confidence": confidence}
+
+    def put(self, query: str, intent: str, confidence: float, responses: Tuple[str, ...]):
+        if self.max_entries <= 0:
+            return
+        key = self.normalize(query)
+        size = sys.getsizeof(key) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes_used -= old[3]
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._entries[key] = (intent, confidence, responses, size, expires_at)
+        self.bytes_used += size
+
+        while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes_used -= evicted[3]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Coroutine, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def split_sections(text: str, max_chars: int = 0) -> List[str]:
+    """Split a response at its blank lines, the way the catalog texts are sectioned.
+
+    Sections longer than ``max_chars`` are split again between lines, and
+    single lines longer than that are cut. Joining the chunks with "" gives
+    back the text.
+    """
+    chunks = []
+    sections = text.split("\n\n")
+    for index, section in enumerate(sections):
+        if index < len(sections) - 1:
+            section += "\n\n"
+        if not max_chars or len(section) <= max_chars:
+            chunks.append(section)
+            continue
+        current = ""
+        for line in section.splitlines(keepends=True):
+            if current and len(current) + len(line) > max_chars:
+                chunks.append(current)
+                current = ""
+            while len(line) > max_chars:
+                chunks.append(line[:max_chars])
+                line = line[max_chars:]
+            current += line
+        if current:
+            chunks.append(current)
+    return [chunk for chunk in chunks if chunk]
+
+
+class ResponseStreamer:
+    """Chunks replies for streaming over /ws and counts the streams.
+
+    Catalog responses are split once by ``add_catalog``; any other text is
+    split when it is streamed.
+    """
+
+    def __init__(self, max_chunk_chars: int = 512, max_active: int = 4):
+        self.max_chunk_chars = max_chunk_chars
+        self.max_active = max_active
+        self._chunks: Dict[str, Tuple[str, ...]] = {}
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def add_catalog(self, intents: Iterable[Dict[str, Any]]):
+        for intent in intents:
+            for response in intent["responses"]:
+                self._chunks[response] = tuple(split_sections(response, self.max_chunk_chars))
+
+    def chunks(self, text: str) -> Tuple[str, ...]:
+        chunks = self._chunks.get(text)
+        if chunks is None:
+            chunks = tuple(split_sections(text, self.max_chunk_chars))
+        return chunks
+
+    def connection(self) -> "ConnectionStreams":
+        return ConnectionStreams(self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_chunk_chars": self.max_chunk_chars,
+            "max_active": self.max_active,
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+class ConnectionStreams:
+    """The streams one connection has in flight, by stream id."""
+
+    def __init__(self, streamer: ResponseStreamer):
+        self.streamer = streamer
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> str:
+        return str(next(self._ids))
+
+    def start(self, stream_id: str, stream: Coroutine[Any, Any, None]) -> bool:
+        """Run a stream in the background; False if the id is in use or too many are running."""
+        if stream_id in self._tasks or len(self._tasks) >= self.streamer.max_active:
+            self.streamer.rejected += 1
+            stream.close()
+            return False
+        task = asyncio.ensure_future(stream)
+        self._tasks[stream_id] = task
+        task.add_done_callback(lambda done: self._finished(stream_id, done))
+        self.streamer.started += 1
+        return True
+
+    def cancel(self, stream_id: str) -> bool:
+        """Stop a stream; False if it already finished or never existed."""
+        task = self._tasks.pop(stream_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        self.streamer.cancelled += 1
+        return True
+
+    def cancel_all(self):
+        for stream_id in list(self._tasks):
+            self.cancel(stream_id)
+
+    def _finished(self, stream_id: str, task: asyncio.Task):
+        if self._tasks.get(stream_id) is task:
+            del self._tasks[stream_id]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.streamer.failed += 1
+            logger.error("Response stream %s failed: %s", stream_id, task.exception())
+        else:
+            self.streamer.completed += 1
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.intent_matcher import IntentMatcher
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z]+")
+
+# Words that point back at something said earlier in the conversation
+REFERENCE_WORDS = frozenset(["it", "its", "this", "that", "these", "those", "them", "they", "their"])
+
+
+class SessionContext:
+    """Recent turns of one chat session.
+
+    The windows are short tuples of intent tags shared with the catalog,
+    rebuilt on every turn: a deque would allocate a 64-slot block (~600
+    bytes) per window even when it holds a handful of items.
+    """
+
+    __slots__ = ("intents", "entities", "last_seen")
+
+    def __init__(self, intents: Tuple[str, ...] = (), entities: Tuple[str, ...] = ()):
+        self.intents = intents
+        self.entities = entities
+        self.last_seen = time.monotonic()
+
+    @property
+    def topic(self) -> Optional[str]:
+        """Most recent entity the conversation was about."""
+        return self.entities[-1] if self.entities else None
+
+    def to_document(self) -> Dict[str, Any]:
+        return {"intents": list(self.intents), "entities": list(self.entities)}
+
+
+class SessionContextStore:
+    """Bounded per-session sliding windows of recent intents and entities.
+
+    Sessions are kept in least-recently-used order, so expiring the ones idle
+    for ``ttl_seconds`` pops from the front and costs nothing for sessions
+    that are still live; past ``max_sessions`` the least recently used one
+    is evicted. With ``save``/``load`` callables a released or evicted
+    context is written out and read back when the session reconnects,
+    possibly to a different worker.
+    """
+
+    def __init__(self, window: int = 5, ttl_seconds: float = 1800.0, max_sessions: int = 100000,
+                 save: Optional[Callable[[str, Dict[str, Any]], Awaitable[Any]]] = None,
+                 load: Optional[Callable[[str], Awaitable[Optional[Dict[str, Any]]]]] = None):
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.save = save
+        self.load = load
+        self._contexts: "OrderedDict[str, SessionContext]" = OrderedDict()
+
+        self.expired = 0
+        self.evicted = 0
+        self.restored = 0
+        self.spilled = 0
+        self.spill_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def get(self, session: str) -> Optional[SessionContext]:
+        self.expire()
+        return self._contexts.get(session)
+
+    def record(self, session: str, intent: str, entities: Iterable[str] = ()) -> SessionContext:
+        """Append one turn to the session's windows."""
+        self.expire()
+        context = self._contexts.get(session)
+        if context is None:
+            context = self._contexts[session] = SessionContext()
+            if len(self._contexts) > self.max_sessions:
+                evicted_session, evicted = self._contexts.popitem(last=False)
+                self.evicted += 1
+                self._spill(evicted_session, evicted)
+        else:
+            self._contexts.move_to_end(session)
+
+        context.intents = (context.intents + (intent,))[-self.window:]
+        added = context.entities
+        for entity in entities:
+            if not added or entity != added[-1]:
+                added += (entity,)
+        if added is not context.entities:
+            context.entities = added[-self.window:]
+        context.last_seen = time.monotonic()
+        return context
+
+    def expire(self):
+        if not self.ttl_seconds:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        contexts = self._contexts
+        while contexts:
+            session, context = next(iter(contexts.items()))
+            if context.last_seen > deadline:
+                break
+            del contexts[session]
+            self.expired += 1
+
+    def discard(self, session: str):
+        self._contexts.pop(session, None)
+
+    def release(self, session: str):
+        """The session's connection closed: spill it so a reconnect can pick it up."""
+        context = self._contexts.get(session)
+        if context is not None:
+            self._spill(session, context)
+
+    async def restore(self, session: str) -> Optional[SessionContext]:
+        """Load a spilled context for a reconnecting session not held here."""
+        context = self.get(session)
+        if context is not None or self.load is None:
+            return context
+        try:
+            document = await self.load(session)
+        except Exception as e:
+            logger.warning(f"Loading context of session {session} failed: {e}")
+            return None
+        if not document or session in self._contexts:
+            return self._contexts.get(session)
+        # Interned so restored tags share the catalog's string objects
+        context = SessionContext(
+            tuple(sys.intern(tag) for tag in document.get("intents", ()))[-self.window:],
+            tuple(sys.intern(tag) for tag in document.get("entities", ()))[-self.window:],
+        )
+        self._contexts[session] = context
+        self.restored += 1
+        return context
+
+    def _spill(self, session: str, context: SessionContext):
+        if self.save is None or not context.intents:
+            return
+
+        async def save():
+            try:
+                await self.save(session, context.to_document())
+                self.spilled += 1
+            except Exception as e:
+                self.spill_errors += 1
+                logger.warning(f"Saving context of session {session} failed: {e}")
+        asyncio.ensure_future(save())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._contexts),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "restored": self.restored,
+            "spilled": self.spilled,
+            "spill_errors": self.spill_errors,
+        }
+
+
+class ContextResolver:
+    """Uses a session's recent topic to classify follow-up questions.
+
+    Entities are the catalog's topics: an intent owns the words of its tag
+    that its patterns use, and the words that appear in at least two of its
+    patterns and in no other intent's (``blood``, ``pressure`` for
+    hypertension). A query that refers back ("how to control it"), names no
+    entity itself and has no evidence for the intent it was classified as
+    (a whole catalog pattern or a word only that intent uses) is answered
+    as the session's topic.
+    """
+
+    def __init__(self, intents: List[Dict[str, Any]]):
+        self.matcher = IntentMatcher(intents)
+        owners: Dict[str, set] = {}
+        counts: Counter = Counter()
+        for intent in intents:
+            for pattern in intent["patterns"]:
+                for word in set(_WORD.findall(pattern.lower())):
+                    owners.setdefault(word, set()).add(intent["tag"])
+                    counts[intent["tag"], word] += 1
+
+        # Words used by a single intent are evidence for it
+        self.evidence: Dict[str, str] = {
+            word: next(iter(tags)) for word, tags in owners.items()
+            if len(tags) == 1 and word not in REFERENCE_WORDS
+        }
+        self.entity_terms: Dict[str, str] = {}
+        for word, tag in self.evidence.items():
+            if counts[tag, word] >= 2 and len(word) > 2:
+                self.entity_terms[word] = tag
+        for intent in intents:
+            for word in _WORD.findall(intent["tag"].lower()):
+                if owners.get(word) == {intent["tag"]}:
+                    self.entity_terms.setdefault(word, intent["tag"])
+        # Plain plurals of entity terms name the same entity
+        for word, tag in list(self.entity_terms.items()):
+            if not word.endswith("s"):
+                self.entity_terms.setdefault(word + "s", tag)
+        self.topics = frozenset(self.entity_terms.values())
+
+    def entities(self, query: str) -> List[str]:
+        """Topics named in the query, in order of appearance."""
+        found = []
+        for word in _WORD.findall(query.lower()):
+            tag = self.entity_terms.get(word)
+            if tag is not None and tag not in found:
+                found.append(tag)
+        return found
+
+    def resolve(self, query: str, intent: str, context: Optional[SessionContext]) -> Optional[str]:
+        """Intent to answer with instead of ``intent``, or None to keep it."""
+        if context is None or context.topic is None or intent == context.topic:
+            return None
+        words = _WORD.findall(query.lower())
+        if REFERENCE_WORDS.isdisjoint(words):
+            return None
+        if any(word in self.entity_terms for word in words):
+            return None
+        if any(self.evidence.get(word) == intent for word in words):
+            return None
+        if self.matcher.pattern_match(query) is not None:
+            return None
+        return context.topic